@@ -1,6 +1,11 @@
-from .models import ActionCall, ActionResult
+from .models import ActionCall, ActionResult, ActionSpec
 from .policy import ActionPolicy, PolicyConfig
 from .executor import ActionExecutor
-from .registry import build_registry, build_manager_registry
+from .memo import ResultCache
+from .sandbox import Sandbox, SandboxConfig
+from .kernel import PythonKernel
+from .session import PythonSession
+from .registry import build_registry, build_manager_registry, describe_actions, release_indexes
+from .schema import build_response_schema, object_schema, registry_response_schema, response_format
 
-__all__ = ["ActionCall", "ActionResult", "ActionPolicy", "PolicyConfig", "ActionExecutor", "build_registry", "build_manager_registry"]
\ No newline at end of file
+__all__ = ["ActionCall", "ActionResult", "ActionSpec", "ActionPolicy", "PolicyConfig", "ActionExecutor", "ResultCache", "PythonKernel", "PythonSession", "Sandbox", "SandboxConfig", "build_registry", "build_manager_registry", "describe_actions", "release_indexes", "build_response_schema", "object_schema", "registry_response_schema", "response_format"]
\ No newline at end of file
@@ -1,5 +1,10 @@
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
+from ..ignore import DEFAULT_IGNORE, IgnoreRules
+from ..line_index import MappedFile
 from ..models import ActionResult
 
 def read_file(path: str, encoding: str = "utf-8", max_bytes: Optional[int] = None, root_dir: Optional[str] = None) -> ActionResult:
@@ -10,11 +15,14 @@ def read_file(path: str, encoding: str = "utf-8", max_bytes: Optional[int] = Non
     try:
         if max_bytes is None:
             content = p.read_text(encoding=encoding, errors="replace")
-        else:
-            with p.open("rb") as f:
-                data = f.read(max_bytes)
-            content = data.decode(encoding, errors="replace")
-        return ActionResult(success=True, data={"path": str(p), "content": content})
+            return ActionResult(success=True, data={"path": str(p), "content": content})
+        with MappedFile(p) as mf:
+            data, truncated = mf.head(max_bytes, encoding)
+            result = {"path": str(p), "content": data.decode(encoding, errors="replace")}
+            if truncated:
+                lines = data.count(b"\n")
+                result["truncated"] = f"first {len(data)} of {mf.index.size} bytes ({lines} of {mf.index.line_count} lines)"
+        return ActionResult(success=True, data=result)
     except Exception as e:
         return ActionResult(success=False, error=str(e))
 
@@ -52,7 +60,82 @@ def edit_file(path: str, old: str, new: str, encoding: str = "utf-8", count: Opt
     except Exception as e:
         return ActionResult(success=False, error=str(e))
 
-def get_file_tree(start_path: str = ".", max_depth: int = 2, root_dir: Optional[str] = None) -> ActionResult:
+_TREE_CACHE_SIZE = 64
+_tree_lock = threading.Lock()
+_tree_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _walk(root: str, start: str, max_depth: int, rules: IgnoreRules, max_entries: int, seen: Dict[str, Optional[int]]) -> list:
+    def visit(path: str, depth: int, rules: IgnoreRules) -> list:
+        if depth > max_depth:
+            return []
+        seen[path] = _mtime(path)
+        gitignore = os.path.join(path, ".gitignore")
+        rel_dir = os.path.relpath(path, root).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir
+        rules, found = rules.with_gitignore(Path(gitignore), rel_dir)
+        if found:
+            seen[gitignore] = _mtime(gitignore)
+        entries = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    is_dir = entry.is_dir()
+                    rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    if not rules.ignored(rel, entry.name, is_dir):
+                        entries.append((not is_dir, entry.name, entry.path, is_dir and not entry.is_symlink()))
+        except (PermissionError, NotADirectoryError):
+            return []
+        entries.sort()
+        res = []
+        for is_file, name, child, recurse in entries[:max_entries]:
+            if is_file:
+                res.append({"name": name, "type": "file", "path": child})
+                continue
+            info = {"name": name, "type": "dir"}
+            children = visit(child, depth + 1, rules) if recurse else []
+            if children:
+                info["children"] = children
+            elif depth < max_depth:
+                info["children"] = []
+            res.append(info)
+        if len(entries) > max_entries:
+            res.append({"name": f"... {len(entries) - max_entries} more entries", "type": "more"})
+        return res
+
+    return visit(start, 1, rules)
+
+
+def _with_sizes(nodes: list) -> list:
+    out = []
+    for node in nodes:
+        node = dict(node)
+        if node["type"] == "file":
+            try:
+                node["size"] = os.stat(node["path"]).st_size
+            except OSError:
+                pass
+            del node["path"]
+        elif "children" in node:
+            node["children"] = _with_sizes(node["children"])
+        out.append(node)
+    return out
+
+
+def get_file_tree(
+    start_path: str = ".",
+    max_depth: int = 2,
+    root_dir: Optional[str] = None,
+    ignore: Optional[List[str]] = None,
+    max_entries: int = 100,
+) -> ActionResult:
     p = Path(start_path)
     if not p.is_absolute() and root_dir:
         p = Path(root_dir) / p
@@ -61,33 +144,34 @@ def get_file_tree(start_path: str = ".", max_depth: int = 2, root_dir: Optional[
     if not p.exists():
          return ActionResult(success=False, error=f"Path {p} does not exist")
 
-    def _tree(path: Path, depth: int) -> list:
-        if depth > max_depth:
-            return []
-        
-        res = []
-        try:
-            for child in sorted(path.iterdir(), key=lambda x: (not x.is_dir(), x.name)):
-                if child.name.startswith("."):
-                    continue
-                
-                info = {
-                    "name": child.name,
-                    "type": "dir" if child.is_dir() else "file"
-                }
-                if child.is_dir():
-                    children = _tree(child, depth + 1)
-                    if children:
-                        info["children"] = children
-                    elif depth < max_depth:
-                         info["children"] = []
-                res.append(info)
-        except PermissionError:
-            pass
-        return res
-
+    root = str(Path(root_dir).resolve()) if root_dir else str(p)
+    patterns = tuple(DEFAULT_IGNORE if ignore is None else ignore)
+    key = (str(p), max_depth, max_entries, patterns)
     try:
-        tree = _tree(p, 1)
-        return ActionResult(success=True, data={"tree": tree})
+        # The listing is reused while no visited directory (or .gitignore) changed; sizes are always fresh.
+        with _tree_lock:
+            cached = _tree_cache.get(key)
+        if cached is not None and all(_mtime(path) == mtime for path, mtime in cached[0].items()):
+            tree = cached[1]
+        else:
+            seen: Dict[str, Optional[int]] = {}
+            rules = IgnoreRules(patterns)
+            # .gitignore files between the workspace root and start_path still apply.
+            if root != str(p) and str(p).startswith(root + os.sep):
+                parts = Path(os.path.relpath(p, root)).parts
+                for i in range(len(parts)):
+                    base = "/".join(parts[:i])
+                    seen[str(Path(root, *parts[:i]))] = _mtime(str(Path(root, *parts[:i])))
+                    gitignore = Path(root, *parts[:i], ".gitignore")
+                    rules, found = rules.with_gitignore(gitignore, base)
+                    if found:
+                        seen[str(gitignore)] = _mtime(str(gitignore))
+            tree = _walk(root, str(p), max_depth, rules, max_entries, seen)
+            with _tree_lock:
+                _tree_cache[key] = (seen, tree)
+                _tree_cache.move_to_end(key)
+                while len(_tree_cache) > _TREE_CACHE_SIZE:
+                    _tree_cache.popitem(last=False)
+        return ActionResult(success=True, data={"tree": _with_sizes(tree)})
     except Exception as e:
-        return ActionResult(success=False, error=str(e))
\ No newline at end of file
+        return ActionResult(success=False, error=str(e))
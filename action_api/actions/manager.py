@@ -2,6 +2,7 @@ import ast
 import os
 from typing import Optional, List, Dict, Any
 from pathlib import Path
+from ..line_index import MappedFile
 from ..models import ActionResult
 
 def run_coder(
@@ -31,26 +32,96 @@ def finish_work(
 
 def get_all_symbols(
     file_path: str,
-    root_dir: str
+    root_dir: str,
+    index: Any = None,
 ) -> ActionResult:
     try:
         full_path = Path(root_dir) / file_path
         if not full_path.exists():
             return ActionResult(success=False, error=f"File not found: {file_path}")
-        
-        with open(full_path, "r", encoding="utf-8") as f:
-            tree = ast.parse(f.read())
-        
-        symbols = []
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-                symbols.append(f"{type(node).__name__}: {node.name} (Lines {node.lineno}-{node.end_lineno})")
-        
+
+        entry = None
+        if index is not None:
+            try:
+                entry = index.file_symbols(full_path.resolve().relative_to(index.root_dir).as_posix())
+            except ValueError:
+                entry = None
+        if entry is not None:
+            if entry.get("error"):
+                return ActionResult(success=False, error=f"Error parsing file: {entry['error']}")
+            symbols = [
+                f"{s['node']}: {s['name']} (Lines {s['line']}-{s['end_line']})"
+                for s in entry["symbols"] if s["kind"] != "signal"
+            ]
+        else:
+            # Not indexed (ignored directory or not a .py file): parse it directly.
+            with open(full_path, "r", encoding="utf-8") as f:
+                tree = ast.parse(f.read())
+            symbols = []
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    symbols.append(f"{type(node).__name__}: {node.name} (Lines {node.lineno}-{node.end_lineno})")
+
         result = "\n".join(symbols) if symbols else "No symbols found."
         return ActionResult(success=True, data={"symbols": result})
     except Exception as e:
         return ActionResult(success=False, error=f"Error parsing file: {str(e)}")
 
+def find_definition(
+    name: str,
+    index: Any,
+) -> ActionResult:
+    try:
+        matches = index.find_definition(name)
+        if not matches:
+            return ActionResult(success=False, error=f"No definition found for: {name}")
+        definitions = []
+        for m in matches:
+            span = f"{m['line']}-{m['end_line']}" if m.get("end_line") else str(m["line"])
+            where = f" from {m['module']}" if m["kind"] == "import" else ""
+            definitions.append(f"{m['path']}:{span} {m['kind']} {m['qualname']}{where}")
+        return ActionResult(success=True, data={"definitions": "\n".join(definitions)})
+    except Exception as e:
+        return ActionResult(success=False, error=f"Error querying index: {str(e)}")
+
+def find_references(
+    name: str,
+    index: Any,
+    limit: int = 200,
+) -> ActionResult:
+    try:
+        found = index.find_references(name, limit=limit)
+        if not found["total"]:
+            return ActionResult(success=True, data={"references": f"No references to {name}."})
+        refs = "\n".join(f"{r['path']}:{r['line']}" + (" (call)" if r["call"] else "") for r in found["references"])
+        data = {"references": refs}
+        if found["total"] > len(found["references"]):
+            data["shown"] = f"{len(found['references'])} of {found['total']}"
+        return ActionResult(success=True, data=data)
+    except Exception as e:
+        return ActionResult(success=False, error=f"Error querying index: {str(e)}")
+
+def project_outline(
+    index: Any,
+) -> ActionResult:
+    try:
+        lines = []
+        for entry in index.outline():
+            if entry["error"]:
+                lines.append(f"{entry['path']}: {entry['error']}")
+                continue
+            lines.append(entry["path"])
+            # Top-level classes and functions, plus the methods and signals of those classes.
+            for s in entry["symbols"]:
+                depth = s["qualname"].count(".")
+                if (s["kind"] in ("class", "function") and depth == 0) or (s["kind"] in ("method", "signal") and depth == 1):
+                    lines.append(f"{'    ' if depth else '  '}{s['kind']} {s['name']} ({s['line']}-{s['end_line']})")
+            for c in entry["connections"]:
+                lines.append(f"  {c['signal']}.{c['kind']}({c['slot']}) at {c['line']}")
+        return ActionResult(success=True, data={"outline": "\n".join(lines) or "No Python files."})
+    except Exception as e:
+        return ActionResult(success=False, error=f"Error querying index: {str(e)}")
+
 def open_file(
     file_path: str,
     root_dir: str,
@@ -62,16 +133,24 @@ def open_file(
         if not full_path.exists():
             return ActionResult(success=False, error=f"File not found: {file_path}")
         
-        with open(full_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        
-        if end_line is None:
-            end_line = len(lines)
-        
-        start_idx = max(0, start_line - 1)
-        end_idx = min(len(lines), end_line)
-        
-        content = "".join([f"{i+1}: {line}" for i, line in enumerate(lines[start_idx:end_idx], start=start_idx)])
+        with MappedFile(full_path) as mf:
+            data, first, last = mf.lines(start_line, end_line)
+            total = mf.index.line_count
+        if first > last:
+            data = {"content": ""}
+            if total:
+                data["lines"] = f"none, the file has {total} lines"
+            return ActionResult(success=True, data=data)
+        # Normalize to "\n" and split on that only, matching the index (str.splitlines also breaks on \x0b, \u2028, ...).
+        text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        lines = text.split("\n")
+        if text.endswith("\n"):
+            lines.pop()
+        content = "\n".join(f"{i}: {line}" for i, line in enumerate(lines, start=first))
+        if text.endswith("\n"):
+            content += "\n"
+        if first > 1 or last < total:
+            return ActionResult(success=True, data={"content": content, "lines": f"{first}-{last} of {total}"})
         return ActionResult(success=True, data={"content": content})
     except Exception as e:
         return ActionResult(success=False, error=f"Error reading file: {str(e)}")
@@ -0,0 +1,244 @@
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from ..models import ActionResult
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+# Diff lines end at "\n" only; str.splitlines() would also break on \f, \x1c, \u2028 and the like inside file content.
+_DIFF_LINE = re.compile(r"[^\n]*\n|[^\n]+")
+_umask: Optional[int] = None
+
+
+class Hunk:
+    def __init__(self, path: str, old: str, new: str, line: Optional[int] = None, replace_all: bool = False):
+        self.path = path
+        self.old = old
+        self.new = new
+        # 1-based start line in the original file (unified diff only); picks among repeated matches.
+        self.line = line
+        self.replace_all = replace_all
+        self.status = "pending"
+
+
+def _file_name(header: str) -> Optional[str]:
+    name = header.split("\t", 1)[0].strip()
+    if name == "/dev/null":
+        return None
+    if name.startswith(("a/", "b/")):
+        name = name[2:]
+    return name
+
+
+def parse_unified_diff(patch: str) -> Tuple[List[Hunk], List[str]]:
+    """Hunks of a unified diff as old/new text blocks, plus the paths it deletes.
+
+    Hunk line counts are not trusted (model-written diffs often get them
+    wrong): a hunk runs until the next @@ line or file header.
+    """
+    hunks: List[Hunk] = []
+    deleted: List[str] = []
+    lines = _DIFF_LINE.findall(patch)
+    old_path = new_path = None
+    i = 0
+
+    def file_header(k: int) -> bool:
+        return lines[k].startswith("--- ") and k + 1 < len(lines) and lines[k + 1].startswith("+++ ")
+
+    while i < len(lines):
+        line = lines[i]
+        if file_header(i):
+            old_path, new_path = _file_name(line[4:]), _file_name(lines[i + 1][4:])
+            if new_path is None and old_path is not None:
+                deleted.append(old_path)
+            i += 2
+            continue
+        if not line.startswith("@@"):
+            i += 1
+            continue
+        path = new_path or old_path
+        if path is None:
+            raise ValueError("hunk before a ---/+++ file header")
+        m = _HUNK_HEADER.match(line)
+        old_lines, new_lines = [], []
+        # Blocks the previous body line went to; a "\ No newline" marker applies only to those.
+        last: Tuple[List[str], ...] = ()
+        i += 1
+        while i < len(lines) and not lines[i].startswith("@@") and not file_header(i):
+            body = lines[i]
+            tag = body[:1]
+            if tag == "\\":
+                for block in last:
+                    if block and block[-1].endswith("\n"):
+                        block[-1] = block[-1][:-1]
+                last = ()
+            elif tag == "-":
+                old_lines.append(body[1:])
+                last = (old_lines,)
+            elif tag == "+":
+                new_lines.append(body[1:])
+                last = (new_lines,)
+            elif tag == " " or body.strip() == "":
+                text = body[1:] if tag == " " else "\n"
+                old_lines.append(text)
+                new_lines.append(text)
+                last = (old_lines, new_lines)
+            elif body.startswith("diff "):
+                break
+            i += 1
+        if path in deleted:
+            continue
+        if old_path is None:
+            hunks.append(Hunk(path, "", "".join(new_lines)))
+        else:
+            hunks.append(Hunk(path, "".join(old_lines), "".join(new_lines), line=int(m.group(1)) if m else None))
+    return hunks, deleted
+
+
+def _apply(text: str, hunk: Hunk, shift: int) -> str:
+    if not hunk.old:
+        if text:
+            raise ValueError("empty old text can only create a new file")
+        return hunk.new
+    count = text.count(hunk.old)
+    if count == 0:
+        raise ValueError("old text not found")
+    if hunk.replace_all:
+        return text.replace(hunk.old, hunk.new)
+    if count == 1:
+        start = text.index(hunk.old)
+    elif hunk.line is not None:
+        # Several matches: take the one closest to where the diff says the hunk starts.
+        want = hunk.line + shift
+        starts, pos = [], text.find(hunk.old)
+        while pos != -1:
+            starts.append(pos)
+            pos = text.find(hunk.old, pos + 1)
+        start = min(starts, key=lambda p: abs(text.count("\n", 0, p) + 1 - want))
+    else:
+        raise ValueError(f"old text matches {count} times, add context or set replace_all")
+    return text[:start] + hunk.new + text[start + len(hunk.old):]
+
+
+def _new_file_mode() -> int:
+    """Mode open() would give a new file: 0o666 minus the process umask."""
+    global _umask
+    if _umask is None:
+        try:
+            with open("/proc/self/status") as f:
+                _umask = next(int(line.split()[1], 8) for line in f if line.startswith("Umask:"))
+        except (OSError, StopIteration, ValueError):
+            # No procfs: the umask can only be read by setting it, so do that once.
+            _umask = os.umask(0o022)
+            os.umask(_umask)
+    return 0o666 & ~_umask
+
+
+def _stage(target: Path, text: str, encoding: str, mode: Optional[int] = None) -> str:
+    """Write text to a temp file beside target, ready to be renamed over it.
+
+    mkstemp creates the file as 0600, so it gets target's mode (or the
+    mode a plain new file would get) before the rename.
+    """
+    if mode is None:
+        mode = target.stat().st_mode & 0o7777 if target.exists() else _new_file_mode()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{target.name}.", suffix=".patch", dir=target.parent)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as f:
+            f.write(text)
+        os.chmod(tmp, mode)
+    except Exception:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+
+def apply_patch(
+    patch: Optional[str] = None,
+    hunks: Optional[List[Dict]] = None,
+    encoding: str = "utf-8",
+    root_dir: Optional[str] = None,
+) -> ActionResult:
+    def resolve(path: str) -> Path:
+        p = Path(path)
+        if not p.is_absolute() and root_dir:
+            p = Path(root_dir) / p
+        return p.resolve()
+
+    try:
+        if patch:
+            parsed, deleted = parse_unified_diff(patch)
+        else:
+            parsed = [Hunk(h["path"], h.get("old", ""), h["new"], replace_all=h.get("replace_all", False)) for h in hunks or []]
+            deleted = []
+    except Exception as e:
+        return ActionResult(success=False, error=f"Cannot parse patch: {e}")
+    if not parsed and not deleted:
+        return ActionResult(success=False, error="Patch contains no hunks")
+
+    # Apply every hunk to in-memory copies first; nothing touches the disk unless all of them fit.
+    originals: Dict[Path, Optional[str]] = {}
+    updated: Dict[Path, str] = {}
+    shifts: Dict[Path, int] = {}
+    report = []
+    for hunk in parsed:
+        target = resolve(hunk.path)
+        try:
+            if target not in originals:
+                originals[target] = target.read_text(encoding=encoding) if target.exists() else None
+                updated[target] = originals[target] or ""
+                shifts[target] = 0
+            updated[target] = _apply(updated[target], hunk, shifts[target])
+            shifts[target] += hunk.new.count("\n") - hunk.old.count("\n")
+            report.append({"path": hunk.path, "status": "ok"})
+        except Exception as e:
+            report.append({"path": hunk.path, "status": f"failed: {e}"})
+    removals = []
+    for path in deleted:
+        target = resolve(path)
+        if target.is_file():
+            originals[target] = target.read_text(encoding=encoding)
+            removals.append(target)
+            report.append({"path": path, "status": "ok (delete)"})
+        else:
+            report.append({"path": path, "status": "failed: file not found"})
+    if any(row["status"].startswith("failed") for row in report):
+        return ActionResult(success=False, error="Patch not applied, no files were changed", data={"hunks": report})
+
+    # Stage new contents next to their targets, then swap them in with rename.
+    modes = {t: t.stat().st_mode & 0o7777 for t, text in originals.items() if text is not None}
+    staged: List[Tuple[str, Path]] = []
+    try:
+        for target, text in updated.items():
+            staged.append((_stage(target, text, encoding), target))
+    except Exception as e:
+        for tmp, _ in staged:
+            os.unlink(tmp)
+        return ActionResult(success=False, error=f"Patch not applied: {e}", data={"hunks": report})
+
+    done: List[Path] = []
+    try:
+        for tmp, target in staged:
+            os.replace(tmp, target)
+            done.append(target)
+        for target in removals:
+            target.unlink()
+            done.append(target)
+    except Exception as e:
+        # Restore what was already swapped in so the workspace is never left half-patched.
+        # Originals go back through the same temp file and rename, so a reader never sees a partial file.
+        for target in done:
+            if originals[target] is None:
+                target.unlink(missing_ok=True)
+            else:
+                os.replace(_stage(target, originals[target], encoding, modes[target]), target)
+        for tmp, _ in staged:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        return ActionResult(success=False, error=f"Patch rolled back: {e}", data={"hunks": report})
+
+    files = {str(t): ("created" if originals[t] is None else "updated") for t in updated}
+    files.update({str(t): "deleted" for t in removals})
+    return ActionResult(success=True, data={"files": files, "hunks": report})
@@ -1,51 +1,27 @@
-import sys
-import io
-from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Any, Optional
 from ..models import ActionResult
 
-_GLOBAL_VARS: Dict[str, Any] = {}
-
-def run_ipython(code: str, reset: bool = False, root_dir: Optional[str] = None) -> ActionResult:
-    global _GLOBAL_VARS
+def run_ipython(code: str, kernel: Any, reset: bool = False, timeout_sec: Optional[int] = None, max_output_chars: Optional[int] = None) -> ActionResult:
     if reset:
-        _GLOBAL_VARS.clear()
-    
-    if root_dir:
-        root_path = str(Path(root_dir).resolve())
-        if root_path not in sys.path:
-            sys.path.insert(0, root_path)
-
-    old_stdout = sys.stdout
-    old_stderr = sys.stderr
-    captured_stdout = io.StringIO()
-    captured_stderr = io.StringIO()
-    
-    sys.stdout = captured_stdout
-    sys.stderr = captured_stderr
-    
+        kernel.restart()
+    budget = max_output_chars or 200000
     try:
-        exec(code, _GLOBAL_VARS)
-        success = True
-        error = None
+        r = kernel.execute(code, timeout_sec=timeout_sec, head_bytes=budget // 4, tail_bytes=budget - budget // 4)
     except Exception as e:
-        success = False
-        error = str(e)
-        import traceback
-        traceback.print_exc()
-    finally:
-        sys.stdout = old_stdout
-        sys.stderr = old_stderr
-        
-    stdout = captured_stdout.getvalue()
-    stderr = captured_stderr.getvalue()
-    
+        return ActionResult(success=False, error=f"Error starting Python kernel: {str(e)}")
+
     data = {
-        "stdout": stdout,
-        "stderr": stderr,
+        "stdout": r.stdout.text(),
+        "stderr": r.stderr.text(),
     }
-    
-    if success:
+    for name, capture in (("stdout", r.stdout), ("stderr", r.stderr)):
+        if capture.truncated:
+            data[f"{name}_total"] = capture.summary()
+
+    if r.restarted and not r.timed_out:
+        data["kernel"] = "restarted, earlier state was lost"
+
+    if r.ok:
         return ActionResult(success=True, data=data)
     else:
-        return ActionResult(success=False, data=data, error=error)
+        return ActionResult(success=False, data=data, error=r.error)
@@ -0,0 +1,22 @@
+from typing import Any, Optional
+from ..models import ActionResult
+
+def search_code(
+    query: str,
+    index: Any,
+    regex: bool = False,
+    case_sensitive: bool = True,
+    glob: Optional[str] = None,
+    context: int = 0,
+    max_results: int = 50,
+) -> ActionResult:
+    try:
+        found = index.search(query, regex=regex, case_sensitive=case_sensitive, glob=glob, context=context, max_results=max_results)
+        if not found["total"]:
+            return ActionResult(success=True, data={"matches": f"No matches for {query!r}."})
+        data = {"matches": found["matches"], "summary": f"{found['total']} matches in {found['files']} files"}
+        if found["total"] > found["shown"]:
+            data["summary"] += f", showing first {found['shown']}"
+        return ActionResult(success=True, data=data)
+    except Exception as e:
+        return ActionResult(success=False, error=f"Error searching code: {str(e)}")
@@ -1,23 +1,35 @@
-import subprocess
+import signal
 from pathlib import Path
-from typing import Dict, Optional, Union, List
+from typing import Any, Dict, Optional, Union, List
 from ..models import ActionResult
+from ..process import run_streaming
 
-def run_command(cmd: Union[str, List[str]], timeout_sec: Optional[int] = None, cwd: Optional[str] = None, shell: bool = False, env: Optional[Dict[str, str]] = None, max_output_chars: Optional[int] = None, root_dir: Optional[str] = None) -> ActionResult:
+def run_command(cmd: Union[str, List[str]], timeout_sec: Optional[int] = None, cwd: Optional[str] = None, shell: bool = False, env: Optional[Dict[str, str]] = None, max_output_chars: Optional[int] = None, root_dir: Optional[str] = None, sandbox: Any = None, session: Any = None) -> ActionResult:
     args = cmd
     if cwd is None and root_dir:
         cwd = str(Path(root_dir).resolve())
+    # Errors from pip/pytest land at the end, so most of the budget goes to the tail.
+    budget = max_output_chars or 200000
+    # A PythonSession runs `python ...` commands in its warm worker and hands everything else to run_streaming.
+    runner = session.run if session is not None else run_streaming
     try:
-        r = subprocess.run(args, cwd=cwd, env=env, shell=shell, capture_output=True, text=True, timeout=timeout_sec)
-        out = r.stdout or ""
-        err = r.stderr or ""
-        if max_output_chars is not None:
-            out = out[:max_output_chars]
-            err = err[:max_output_chars]
-        ok = r.returncode == 0
-        data = {"return_code": r.returncode, "stdout": out, "stderr": err}
-        if ok:
-            return ActionResult(success=True, data=data)
-        return ActionResult(success=False, data=data, error="Non-zero exit code")
+        r = runner(args, cwd=cwd, env=env, shell=shell, timeout_sec=timeout_sec, head_bytes=budget // 4, tail_bytes=budget - budget // 4, sandbox=sandbox)
     except Exception as e:
-        return ActionResult(success=False, error=str(e))
\ No newline at end of file
+        return ActionResult(success=False, error=str(e))
+    data = {"return_code": r.return_code, "stdout": r.stdout.text(), "stderr": r.stderr.text()}
+    for name, capture in (("stdout", r.stdout), ("stderr", r.stderr)):
+        if capture.truncated:
+            data[f"{name}_total"] = capture.summary()
+    if r.timed_out:
+        del data["return_code"]
+        return ActionResult(success=False, data=data, error=f"Command timed out after {timeout_sec}s (process group killed)")
+    if r.return_code == 0:
+        return ActionResult(success=True, data=data)
+    if r.return_code < 0:
+        # SIGXCPU/SIGXFSZ/SIGKILL here usually mean a sandbox limit was hit.
+        try:
+            name = signal.Signals(-r.return_code).name
+        except ValueError:
+            name = str(-r.return_code)
+        return ActionResult(success=False, data=data, error=f"Killed by signal {name}")
+    return ActionResult(success=False, data=data, error="Non-zero exit code")
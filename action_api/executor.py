@@ -1,30 +1,178 @@
+import threading
 import time
-from typing import Callable, Dict
-from .models import ActionCall, ActionResult
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from .memo import ResultCache, fingerprint
+from .models import ActionCall, ActionResult, ActionSpec
+
+
+def _ms(t0: float) -> int:
+    return int((time.perf_counter() - t0) * 1000)
+
+
+class Footprint(NamedTuple):
+    read_only: bool
+    # None means the call may touch anything and is ordered against every other call.
+    paths: Optional[Tuple[Path, ...]]
+
+
+def _overlaps(a: Path, b: Path) -> bool:
+    return a == b or a in b.parents or b in a.parents
+
+
+def conflicts(a: Footprint, b: Footprint) -> bool:
+    if a.paths is None or b.paths is None:
+        return True
+    if a.read_only and b.read_only:
+        return False
+    return any(_overlaps(x, y) for x in a.paths for y in b.paths)
+
 
 class ActionExecutor:
-    def __init__(self, policy, registry: Dict[str, Callable]):
+    def __init__(
+        self,
+        policy,
+        registry: Dict[str, ActionSpec],
+        max_workers: int = 8,
+        metrics=None,
+        labels: Optional[Dict[str, str]] = None,
+        memo: Optional[ResultCache] = None,
+        on_write: Optional[Callable[[Optional[Tuple[Path, ...]]], None]] = None,
+    ):
         self.policy = policy
         self.registry = registry
+        self.max_workers = max_workers
+        # Anything with observe_action(name, params, result, elapsed_ms, cache_hit, **labels), e.g. metrics.MetricsRegistry.
+        self.metrics = metrics
+        self.labels = labels or {}
+        # Share one ResultCache between executors working on the same root_dir.
+        self.memo = memo
+        # Called with the paths each non-read-only call may have changed (None: anything), e.g. CheckpointStore.mark_changed.
+        self.on_write = on_write
+        self._pool = None
+        self._pool_lock = threading.Lock()
 
-    def execute(self, call: ActionCall) -> ActionResult:
+    def _prepare(self, call: ActionCall) -> Tuple[ActionSpec, Dict[str, Any]]:
+        spec = self.registry.get(call.name)
+        if spec is None:
+            raise ValueError(f"Unknown action: {call.name}")
+        return spec, self.policy.check(call, spec)
+
+    def _invoke(self, spec: ActionSpec, params: Dict[str, Any]) -> ActionResult:
         t0 = time.perf_counter()
+        memo_key = None
+        if self.memo is not None and spec.read_only:
+            footprint = self.footprint(spec, params)
+            if footprint.paths is not None:
+                # Fingerprint before running, so a file changing mid-read cannot be cached as current.
+                memo_key, fp = ResultCache.key(spec.name, params), fingerprint(footprint.paths)
+                cached = self.memo.get(memo_key, fp)
+                if cached is not None:
+                    cached.duration_ms = _ms(t0)
+                    self._observe(spec.name, params, cached, t0, cache_hit=True)
+                    return cached
         try:
-            self.policy.check(call)
+            result = spec.fn(**params)
+            if isinstance(result, ActionResult):
+                result.duration_ms = _ms(t0)
+            else:
+                result = ActionResult(success=True, data={"result": result}, duration_ms=_ms(t0))
         except Exception as e:
-            dt = int((time.perf_counter() - t0) * 1000)
-            return ActionResult(success=False, error=str(e), duration_ms=dt)
-        fn = self.registry.get(call.name)
-        if not fn:
-            dt = int((time.perf_counter() - t0) * 1000)
-            return ActionResult(success=False, error=f"Unknown action {call.name}", duration_ms=dt)
+            result = ActionResult(success=False, error=str(e), duration_ms=_ms(t0))
+        if memo_key is not None:
+            if result.success:
+                self.memo.put(memo_key, fp, footprint.paths, result)
+        elif not spec.read_only and (self.memo is not None or self.on_write is not None):
+            paths = self.footprint(spec, params).paths
+            if self.memo is not None:
+                self.memo.invalidate(paths)
+            if self.on_write is not None:
+                self.on_write(paths)
+        self._observe(spec.name, params, result, t0, cache_hit=False if memo_key is not None else None)
+        return result
+
+    def _rejected(self, call: ActionCall, error: Exception, t0: float) -> ActionResult:
+        result = ActionResult(success=False, error=str(error), duration_ms=_ms(t0))
+        self._observe(call.name, call.params, result, t0)
+        return result
+
+    def _observe(
+        self, name: str, params: Dict[str, Any], result: ActionResult, t0: float, cache_hit: Optional[bool] = None
+    ):
+        if self.metrics is not None:
+            elapsed = (time.perf_counter() - t0) * 1000.0
+            self.metrics.observe_action(name, params, result, elapsed, cache_hit=cache_hit, **self.labels)
+
+    def execute(self, call: ActionCall) -> ActionResult:
+        t0 = time.perf_counter()
         try:
-            result = fn(**call.params)
-            if isinstance(result, ActionResult):
-                result.duration_ms = int((time.perf_counter() - t0) * 1000)
-                return result
-            dt = int((time.perf_counter() - t0) * 1000)
-            return ActionResult(success=True, data={"result": result}, duration_ms=dt)
+            spec, params = self._prepare(call)
         except Exception as e:
-            dt = int((time.perf_counter() - t0) * 1000)
-            return ActionResult(success=False, error=str(e), duration_ms=dt)
\ No newline at end of file
+            return self._rejected(call, e, t0)
+        return self._invoke(spec, params)
+
+    def is_read_only(self, call: ActionCall) -> bool:
+        spec = self.registry.get(call.name)
+        return spec is not None and spec.read_only
+
+    def footprint(self, spec: ActionSpec, params: Dict[str, Any]) -> Footprint:
+        if spec.exclusive:
+            return Footprint(spec.read_only, None)
+        paths = [self.policy.resolve_path(p) for p in spec.touches(params)] if spec.touches else []
+        for name in spec.path_fields:
+            value = params.get(name, spec.params.model_fields[name].default)
+            if value is not None:
+                paths.append(self.policy.resolve_path(value))
+        if not paths and not spec.read_only:
+            return Footprint(False, None)
+        return Footprint(spec.read_only, tuple(paths))
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="action")
+            return self._pool
+
+    def _run_after(self, deps: List[Future], spec: ActionSpec, params: Dict[str, Any], submitted: float) -> ActionResult:
+        # Dependencies were submitted earlier, so with a FIFO pool they are already
+        # running or finished by the time this worker picks the call up.
+        wait(deps)
+        queued = _ms(submitted)
+        result = self._invoke(spec, params)
+        result.queue_ms = queued
+        return result
+
+    def execute_many(self, calls: List[ActionCall]) -> List[ActionResult]:
+        """Run a batch on the worker pool; results come back in submission order.
+
+        Reads and calls on disjoint paths overlap. A call waits for every earlier
+        call it conflicts with: a write to the same path, its parent or a child,
+        or an exclusive action (commands, python, agent control), which is
+        ordered against everything.
+        """
+        if len(calls) <= 1:
+            return [self.execute(call) for call in calls]
+
+        results: List[Optional[ActionResult]] = [None] * len(calls)
+        futures: List[Optional[Future]] = [None] * len(calls)
+        footprints: List[Optional[Footprint]] = [None] * len(calls)
+        pool = self._get_pool()
+        for i, call in enumerate(calls):
+            t0 = time.perf_counter()
+            try:
+                spec, params = self._prepare(call)
+                footprints[i] = self.footprint(spec, params)
+            except Exception as e:
+                results[i] = self._rejected(call, e, t0)
+                continue
+            deps = [
+                futures[j] for j in range(i)
+                if futures[j] is not None and conflicts(footprints[i], footprints[j])
+            ]
+            futures[i] = pool.submit(self._run_after, deps, spec, params, time.perf_counter())
+
+        for i, future in enumerate(futures):
+            if future is not None:
+                results[i] = future.result()
+        return results
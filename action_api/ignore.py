@@ -0,0 +1,98 @@
+import fnmatch
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+# PyInstaller output, bytecode caches, virtualenvs and dotfiles never belong in a prompt.
+DEFAULT_IGNORE = [".*", "__pycache__", "*.pyc", "build/", "dist/", "*.egg-info/", "venv/", "node_modules/"]
+
+
+def _glob_to_regex(pattern: str) -> str:
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                out.append(pattern[i:j + 1].replace("[!", "[^"))
+                i = j + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class Rule:
+    def __init__(self, pattern: str, base: str = ""):
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        # A slash anywhere but the end anchors the pattern to the .gitignore's directory.
+        self.anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        self.base = base
+        if self.anchored:
+            self._regex = re.compile(_glob_to_regex(pattern) + r"\Z")
+        else:
+            self._pattern = pattern
+
+    def matches(self, rel: str, name: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel.startswith(self.base + "/"):
+                return False
+            rel = rel[len(self.base) + 1:]
+        if self.anchored:
+            return bool(self._regex.match(rel))
+        return fnmatch.fnmatchcase(name, self._pattern)
+
+
+class IgnoreRules:
+    """gitignore-style matching on paths relative to the tree root; the last matching rule wins."""
+
+    def __init__(self, patterns: Iterable[str] = (), rules: Optional[List[Rule]] = None):
+        self.rules = list(rules or []) + [Rule(p) for p in patterns]
+
+    @staticmethod
+    def parse(text: str, base: str = "") -> List[Rule]:
+        rules = []
+        for line in text.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("\\"):
+                line = line[1:]
+            rules.append(Rule(line, base))
+        return rules
+
+    def with_gitignore(self, path: Path, base: str) -> Tuple["IgnoreRules", bool]:
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return self, False
+        return IgnoreRules(rules=self.rules + self.parse(text, base)), True
+
+    def ignored(self, rel: str, name: str, is_dir: bool) -> bool:
+        result = False
+        for rule in self.rules:
+            if rule.matches(rel, name, is_dir):
+                result = not rule.negate
+        return result
@@ -0,0 +1,185 @@
+import json
+import os
+import select
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from .process import CHUNK, Capture
+
+try:
+    import resource
+except ImportError:  # Windows: no memory cap
+    resource = None
+
+WORKER = Path(__file__).with_name("kernel_worker.py")
+START_TIMEOUT_SEC = 30.0
+INTERRUPT_GRACE_SEC = 3.0
+
+
+class KernelResult:
+    def __init__(self, ok: bool, error: Optional[str], stdout: Capture, stderr: Capture, timed_out: bool = False, restarted: bool = False):
+        self.ok = ok
+        self.error = error
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.restarted = restarted
+
+
+class PythonKernel:
+    """A per-run Python process whose namespace persists between run_ipython calls.
+
+    Cells are sent over a dedicated request pipe and answered on a reply
+    pipe; the kernel's stdout/stderr are drained into bounded Captures while
+    the cell runs. A cell that outlives its timeout gets SIGINT (so the
+    namespace survives); a kernel that does not answer after that, or that
+    dies, is killed and started fresh on the next call.
+    """
+
+    def __init__(self, root_dir: str, sandbox: Any = None, memory_mb: Optional[int] = 2048, interpreter: str = "python"):
+        self.root_dir = str(Path(root_dir).resolve())
+        self.sandbox = sandbox
+        self.memory_mb = memory_mb
+        self.interpreter = interpreter
+        self.proc: Optional[subprocess.Popen] = None
+        self.starts = 0
+        self._requests = None
+        self._replies_fd: Optional[int] = None
+        self._buf = b""
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def _start(self):
+        req_r, req_w = os.pipe()
+        rep_r, rep_w = os.pipe()
+        try:
+            self.proc = subprocess.Popen(
+                [self.interpreter, "-u", str(WORKER), str(req_r), str(rep_w), self.root_dir],
+                cwd=self.root_dir,
+                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                pass_fds=(req_r, rep_w),
+                start_new_session=True,
+            )
+        finally:
+            os.close(req_r)
+            os.close(rep_w)
+        self._requests = os.fdopen(req_w, "w", encoding="utf-8")
+        self._replies_fd = rep_r
+        self._buf = b""
+        if self.sandbox is not None:
+            self.sandbox.confine(self.proc.pid)
+        if resource is not None and self.memory_mb:
+            try:
+                _, hard = resource.prlimit(self.proc.pid, resource.RLIMIT_DATA)
+                limit = self.memory_mb * 1024 * 1024
+                if hard != resource.RLIM_INFINITY:
+                    limit = min(limit, hard)
+                resource.prlimit(self.proc.pid, resource.RLIMIT_DATA, (limit, limit))
+            except (OSError, ValueError):
+                pass
+        hello = self._wait(time.monotonic() + START_TIMEOUT_SEC, None, None)
+        if not hello or not hello.get("ready"):
+            self._kill()
+            raise RuntimeError("Python kernel failed to start")
+        self.starts += 1
+
+    def _wait(self, deadline: Optional[float], out: Optional[Capture], err: Optional[Capture]) -> Optional[dict]:
+        """Drain output until a reply line arrives; None on deadline or if the kernel exits."""
+        streams = {self.proc.stdout.fileno(): out, self.proc.stderr.fileno(): err}
+        with selectors.DefaultSelector() as sel:
+            sel.register(self._replies_fd, selectors.EVENT_READ)
+            for fd in streams:
+                sel.register(fd, selectors.EVENT_READ)
+            while b"\n" not in self._buf:
+                wait = None if deadline is None else deadline - time.monotonic()
+                if wait is not None and wait <= 0:
+                    return None
+                for key, _ in sel.select(timeout=wait):
+                    chunk = os.read(key.fd, CHUNK)
+                    if key.fd == self._replies_fd:
+                        if not chunk:
+                            # Reply pipe closed: the kernel is exiting; let poll() see it.
+                            try:
+                                self.proc.wait(timeout=1)
+                            except subprocess.TimeoutExpired:
+                                pass
+                            return None
+                        self._buf += chunk
+                    elif not chunk:
+                        sel.unregister(key.fd)
+                    elif streams[key.fd] is not None:
+                        streams[key.fd].write(chunk)
+        # The kernel flushes its output before replying, so whatever is left is already in the pipes.
+        for fd, capture in streams.items():
+            while capture is not None and select.select([fd], [], [], 0)[0]:
+                chunk = os.read(fd, CHUNK)
+                if not chunk:
+                    break
+                capture.write(chunk)
+        line, self._buf = self._buf.split(b"\n", 1)
+        return json.loads(line)
+
+    def _kill(self):
+        if self.proc is None:
+            return
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.proc.wait()
+        for f in (self._requests, self.proc.stdout, self.proc.stderr):
+            if f is not None:
+                f.close()
+        os.close(self._replies_fd)
+        self.proc = None
+        self._requests = None
+        self._replies_fd = None
+
+    def execute(self, code: str, timeout_sec: Optional[float] = None, head_bytes: int = 16384, tail_bytes: int = 65536) -> KernelResult:
+        out, err = Capture(head_bytes, tail_bytes), Capture(head_bytes, tail_bytes)
+        with self._lock:
+            restarted = False
+            if not self.alive:
+                restarted = self.proc is not None
+                self._kill()
+                self._start()
+            self._seq += 1
+            try:
+                self._requests.write(json.dumps({"id": self._seq, "code": code}) + "\n")
+                self._requests.flush()
+            except OSError:
+                self._kill()
+                return KernelResult(False, "Python kernel died; it restarts with the next call", out, err, restarted=True)
+            t0 = time.monotonic()
+            reply = self._wait(None if timeout_sec is None else t0 + timeout_sec, out, err)
+            if reply is not None:
+                return KernelResult(reply["ok"], reply.get("error"), out, err, restarted=restarted)
+            if not self.alive:
+                self._kill()
+                return KernelResult(False, "Python kernel died (memory limit or crash); its state is lost and it restarts with the next call", out, err, restarted=True)
+            # Timed out: interrupt the cell and keep the namespace if the kernel answers.
+            try:
+                os.kill(self.proc.pid, signal.SIGINT)
+            except ProcessLookupError:
+                pass
+            reply = self._wait(time.monotonic() + INTERRUPT_GRACE_SEC, out, err)
+            if reply is not None:
+                return KernelResult(False, f"Execution timed out after {timeout_sec}s and was interrupted; state is kept", out, err, timed_out=True)
+            self._kill()
+            return KernelResult(False, f"Execution timed out after {timeout_sec}s; the kernel was restarted and its state is lost", out, err, timed_out=True, restarted=True)
+
+    def restart(self):
+        with self._lock:
+            self._kill()
+
+    def close(self):
+        self.restart()
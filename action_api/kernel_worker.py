@@ -0,0 +1,56 @@
+"""Kernel process for action_api.kernel.PythonKernel (stdlib only, runs as a script).
+
+Usage: kernel_worker.py REQUEST_FD REPLY_FD ROOT_DIR
+
+Executes one JSON request ({"id", "code"}) per line from REQUEST_FD in a
+namespace that persists across requests, and answers one JSON line on
+REPLY_FD. stdout/stderr are the host's capture pipes; stdin is /dev/null.
+"""
+import json
+import os
+import signal
+import sys
+import traceback
+
+sys.path.pop(0)
+
+
+def main():
+    requests = os.fdopen(int(sys.argv[1]), "r", encoding="utf-8")
+    replies = os.fdopen(int(sys.argv[2]), "w", encoding="utf-8")
+    root = sys.argv[3]
+    os.chdir(root)
+    sys.path.insert(0, root)
+    # The host interrupts a timed-out cell with SIGINT; only user code should see it.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    replies.write(json.dumps({"ready": True, "pid": os.getpid()}) + "\n")
+    replies.flush()
+    for line in requests:
+        if not line.strip():
+            continue
+        req = json.loads(line)
+        reply = {"id": req["id"], "ok": True}
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        try:
+            exec(compile(req["code"], "<cell>", "exec"), namespace)
+        except KeyboardInterrupt:
+            reply.update(ok=False, error="interrupted")
+            traceback.print_exception(*sys.exc_info()[:2], sys.exc_info()[2].tb_next)
+        except BaseException as e:
+            # Skip this function's frame so tracebacks start at the cell.
+            reply.update(ok=False, error=str(e) or type(e).__name__)
+            traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        finally:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        replies.write(json.dumps(reply) + "\n")
+        replies.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import bisect
+import mmap
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+MAX_INDEXES = 256
+
+
+# Universal newlines, as text-mode open() reads them: "\r\n", "\n" or a lone "\r" (old Mac files).
+_LINE_END = re.compile(rb"\r\n?|\n")
+
+
+class LineIndex:
+    """Byte offsets of line starts; offsets[-1] is the file size."""
+
+    def __init__(self, data, fp: tuple):
+        self.fp = fp
+        self.size = len(data)
+        offsets = array("Q", [0])
+        if data.find(b"\r") == -1:
+            find = data.find
+            pos = find(b"\n")
+            while pos != -1:
+                offsets.append(pos + 1)
+                pos = find(b"\n", pos + 1)
+        else:
+            offsets.extend(m.end() for m in _LINE_END.finditer(data))
+        if offsets[-1] != self.size:
+            offsets.append(self.size)
+        self.offsets = offsets
+
+    @property
+    def line_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def span(self, start_line: int, end_line: Optional[int]) -> Tuple[int, int, int, int]:
+        """Byte span of 1-based inclusive lines, clamped; returns (start, end, first, last)."""
+        n = self.line_count
+        first = min(max(1, start_line), n + 1)
+        last = n if end_line is None else min(max(end_line, first - 1), n)
+        return self.offsets[first - 1], self.offsets[last], first, last
+
+    def prefix(self, max_bytes: int) -> int:
+        """Largest line boundary <= max_bytes (0 if the first line alone is longer)."""
+        return self.offsets[bisect.bisect_right(self.offsets, max_bytes) - 1]
+
+
+_lock = threading.Lock()
+_indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+
+
+def _fingerprint(st: os.stat_result) -> tuple:
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _utf8_boundary(data: bytes, end: int) -> int:
+    # Step back over continuation bytes so a cut never splits a character.
+    while end > 0 and (data[end] & 0xC0) == 0x80:
+        end -= 1
+    return end
+
+
+class MappedFile:
+    """An mmap of one file plus its cached line index. Use as a context manager."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        self._f = open(self.path, "rb")
+        try:
+            st = os.fstat(self._f.fileno())
+            self.data = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else b""
+            self.index = self._index(_fingerprint(st))
+        except Exception:
+            self._f.close()
+            raise
+
+    def _index(self, fp: tuple) -> LineIndex:
+        with _lock:
+            index = _indexes.get(self.path)
+            if index is not None and index.fp == fp and index.size == len(self.data):
+                _indexes.move_to_end(self.path)
+                return index
+        index = LineIndex(self.data, fp)
+        with _lock:
+            _indexes[self.path] = index
+            _indexes.move_to_end(self.path)
+            while len(_indexes) > MAX_INDEXES:
+                _indexes.popitem(last=False)
+        return index
+
+    def lines(self, start_line: int = 1, end_line: Optional[int] = None) -> Tuple[bytes, int, int]:
+        start, end, first, last = self.index.span(start_line, end_line)
+        return self.data[start:end], first, last
+
+    def head(self, max_bytes: int, encoding: str = "utf-8") -> Tuple[bytes, bool]:
+        """At most max_bytes from the start, cut at a line (or at least character) boundary."""
+        if max_bytes >= self.index.size:
+            return self.data[:], False
+        end = self.index.prefix(max_bytes)
+        if end == 0:
+            end = max_bytes
+            if encoding.lower().replace("_", "-") in ("utf-8", "utf8"):
+                end = _utf8_boundary(self.data, end)
+        return self.data[:end], True
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._f.close()
+
+    def __enter__(self) -> "MappedFile":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
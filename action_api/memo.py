@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from .models import ActionResult
+
+
+def _size(value) -> int:
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(k)) + _size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_size(v) for v in value)
+    return 8
+
+
+def _overlaps(a: Path, b: Path) -> bool:
+    return a == b or a in b.parents or b in a.parents
+
+
+def fingerprint(paths: Tuple[Path, ...]) -> tuple:
+    """(inode, size, mtime_ns) per path; a missing path fingerprints as None."""
+    out = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except OSError:
+            out.append(None)
+            continue
+        out.append((st.st_ino, st.st_size, st.st_mtime_ns))
+    return tuple(out)
+
+
+class ResultCache:
+    """LRU cache of successful read-only action results for one workspace.
+
+    Entries are validated against the stat fingerprint of the paths they read,
+    and dropped as soon as the executor writes to one of those paths (or to a
+    parent/child of them). Actions with unbounded side effects clear it.
+    Directory fingerprints only see direct entries, so tree results rely on
+    that write invalidation for deeper changes.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_entries: int = 4096):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(name: str, params: Dict[str, Any]) -> str:
+        return name + "\0" + json.dumps(params, sort_keys=True, default=str)
+
+    def get(self, key: str, fp: tuple) -> Optional[ActionResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != fp:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result = entry[2]
+        return result.model_copy(update={"data": dict(result.data) if result.data else result.data})
+
+    def put(self, key: str, fp: tuple, paths: Tuple[Path, ...], result: ActionResult):
+        size = len(key) + _size(result.data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (fp, paths, result, size)
+            self._bytes += size
+            while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, paths: Optional[Tuple[Path, ...]]):
+        """Drop entries touching any of `paths`; None drops everything."""
+        with self._lock:
+            if paths is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+                return
+            stale = [
+                key for key, (_, entry_paths, _, _) in self._entries.items()
+                if any(_overlaps(a, b) for a in paths for b in entry_paths)
+            ]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[3]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Any, Dict, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Any, Callable, Dict, List, Optional, Type
+from .params import is_rooted
 
 class ActionCall(BaseModel):
     name: str
@@ -10,4 +11,25 @@ class ActionResult(BaseModel):
     data: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     logs: str = ""
-    duration_ms: int = 0
\ No newline at end of file
+    duration_ms: int = 0
+    queue_ms: int = 0
+
+class ActionSpec(BaseModel):
+    """Declarative description of one action: handler, parameter model and scheduling metadata."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    name: str
+    fn: Callable[..., Any]
+    params: Type[BaseModel]
+    read_only: bool = False
+    # Exclusive actions may touch any file, so they never overlap with other calls.
+    exclusive: bool = False
+    # Paths a call reads or writes beyond its path fields: nested in its params, or implied by the action.
+    touches: Optional[Callable[[Dict[str, Any]], List[str]]] = None
+    description: str = ""
+    example: Dict[str, Any] = Field(default_factory=dict)
+
+    @property
+    def path_fields(self) -> List[str]:
+        return [name for name, field in self.params.model_fields.items() if is_rooted(field)]
@@ -0,0 +1,204 @@
+import re
+import typing
+from typing import Annotated, Dict, List, Optional, Union
+from pydantic import AfterValidator, BaseModel, ConfigDict, ValidationInfo, field_validator, model_validator
+from pydantic.fields import FieldInfo
+
+
+def _policy(info: ValidationInfo):
+    return (info.context or {}).get("policy")
+
+
+def _resolve_rooted(value: str, info: ValidationInfo) -> str:
+    policy = _policy(info)
+    return str(policy.resolve_path(value)) if policy else value
+
+
+ROOTED = AfterValidator(_resolve_rooted)
+
+# A path the model passes in; resolved against root_dir and rejected if it escapes it.
+RootedPath = Annotated[str, ROOTED]
+
+
+def is_rooted(field: FieldInfo) -> bool:
+    if ROOTED in field.metadata:
+        return True
+    # Optional[RootedPath] keeps the marker on the inner Annotated type.
+    return any(ROOTED in getattr(arg, "__metadata__", ()) for arg in typing.get_args(field.annotation))
+
+
+def _non_empty(value):
+    if not value:
+        raise ValueError("must not be empty")
+    return value
+
+
+class ActionParams(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+
+class ReadFileParams(ActionParams):
+    path: RootedPath
+    encoding: str = "utf-8"
+    max_bytes: Optional[int] = None
+
+    @field_validator("max_bytes")
+    @classmethod
+    def _max_bytes(cls, value, info: ValidationInfo):
+        policy = _policy(info)
+        if value and policy and value > policy.config.max_read_bytes:
+            raise ValueError("max_bytes exceeds limit")
+        return value
+
+
+class CreateFileParams(ActionParams):
+    path: RootedPath
+    content: str
+    encoding: str = "utf-8"
+    overwrite: bool = True
+
+    @field_validator("content")
+    @classmethod
+    def _content(cls, value, info: ValidationInfo):
+        policy = _policy(info)
+        encoding = info.data.get("encoding", "utf-8")
+        if policy and len(value.encode(encoding, errors="replace")) > policy.config.max_write_bytes:
+            raise ValueError("Content too large")
+        return value
+
+
+class EditFileParams(ActionParams):
+    path: RootedPath
+    old: str
+    new: str
+    encoding: str = "utf-8"
+    count: Optional[int] = None
+
+
+class PatchHunk(ActionParams):
+    path: RootedPath
+    old: str = ""
+    new: str
+    replace_all: bool = False
+
+
+class PatchParams(ActionParams):
+    patch: Optional[str] = None
+    hunks: Optional[List[PatchHunk]] = None
+    encoding: str = "utf-8"
+
+    @model_validator(mode="after")
+    def _one_form(self, info: ValidationInfo):
+        if bool(self.patch) == bool(self.hunks):
+            raise ValueError("pass either patch (unified diff) or hunks")
+        policy = _policy(info)
+        if policy is None:
+            return self
+        size = len(self.patch) if self.patch else sum(len(h.new) for h in self.hunks)
+        if size > policy.config.max_write_bytes:
+            raise ValueError("Patch too large")
+        for path in patch_paths(self.model_dump()):
+            policy.resolve_path(path)
+        return self
+
+
+def patch_paths(params: dict) -> List[str]:
+    """Files an apply_patch call writes, from either form of its params."""
+    if params.get("patch"):
+        from .actions.patch import parse_unified_diff
+        hunks, deleted = parse_unified_diff(params["patch"])
+        return list(dict.fromkeys([h.path for h in hunks] + deleted))
+    return list(dict.fromkeys(h["path"] for h in params.get("hunks") or []))
+
+
+class FileTreeParams(ActionParams):
+    start_path: RootedPath = "."
+    max_depth: int = 2
+
+
+class CommandParams(ActionParams):
+    cmd: Union[str, List[str]]
+    timeout_sec: Optional[int] = None
+    cwd: Optional[RootedPath] = None
+    shell: bool = False
+    env: Optional[Dict[str, str]] = None
+
+    @field_validator("cmd")
+    @classmethod
+    def _cmd(cls, value, info: ValidationInfo):
+        policy = _policy(info)
+        return policy.validate_command(value) if policy else _non_empty(value)
+
+    @field_validator("timeout_sec")
+    @classmethod
+    def _timeout(cls, value, info: ValidationInfo):
+        policy = _policy(info)
+        if value and policy and value > policy.config.command_timeout_sec:
+            raise ValueError("Timeout exceeds limit")
+        return value
+
+    @field_validator("shell")
+    @classmethod
+    def _shell(cls, value, info: ValidationInfo):
+        policy = _policy(info)
+        if value and policy and not policy.config.allow_shell:
+            raise ValueError("Shell commands are not allowed")
+        return value
+
+
+class IPythonParams(ActionParams):
+    code: Annotated[str, AfterValidator(_non_empty)]
+    reset: bool = False
+    timeout_sec: Optional[int] = None
+
+    @field_validator("timeout_sec")
+    @classmethod
+    def _timeout(cls, value, info: ValidationInfo):
+        policy = _policy(info)
+        if value and policy and value > policy.config.command_timeout_sec:
+            raise ValueError("Timeout exceeds limit")
+        return value
+
+
+class NoParams(ActionParams):
+    pass
+
+
+class RunCoderParams(ActionParams):
+    instruction: Annotated[str, AfterValidator(_non_empty)]
+
+
+class SymbolsParams(ActionParams):
+    file_path: RootedPath
+
+
+class SymbolQueryParams(ActionParams):
+    name: Annotated[str, AfterValidator(_non_empty)]
+
+
+class SearchParams(ActionParams):
+    query: Annotated[str, AfterValidator(_non_empty)]
+    regex: bool = False
+    case_sensitive: bool = True
+    glob: Optional[str] = None
+    context: int = 0
+    max_results: int = 50
+
+    @model_validator(mode="after")
+    def _check(self):
+        if self.regex:
+            try:
+                re.compile(self.query)
+            except re.error as e:
+                raise ValueError(f"Invalid regex: {e}")
+        if not 0 <= self.context <= 10:
+            raise ValueError("context must be between 0 and 10")
+        if not 1 <= self.max_results <= 500:
+            raise ValueError("max_results must be between 1 and 500")
+        return self
+
+
+class OpenFileParams(ActionParams):
+    file_path: RootedPath
+    start_line: int = 1
+    end_line: Optional[int] = None
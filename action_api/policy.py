@@ -1,8 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from typing import List, Optional, Union, Dict, Any
 from pathlib import Path
 from shlex import split as shlex_split
-from .models import ActionCall
+from .ignore import DEFAULT_IGNORE
+from .sandbox import SandboxConfig, command_name
+from .models import ActionCall, ActionSpec
 
 
 class PolicyConfig(BaseModel):
@@ -13,6 +15,11 @@ class PolicyConfig(BaseModel):
     max_write_bytes: int = 1048576
     allow_shell: bool = False
     max_output_chars: int = 200000
+    ignore_patterns: List[str] = DEFAULT_IGNORE
+    tree_max_entries: int = 100
+    # Where the symbol index is persisted (usually the run directory); None keeps it in memory.
+    index_dir: Optional[Path] = None
+    sandbox: SandboxConfig = SandboxConfig()
 
 
 class ActionPolicy:
@@ -20,7 +27,7 @@ class ActionPolicy:
         self.config = config
         self.config.root_dir = Path(self.config.root_dir).expanduser().resolve()
 
-    def _resolve_path(self, path: Union[str, Path]) -> Path:
+    def resolve_path(self, path: Union[str, Path]) -> Path:
         p = Path(path)
         if not p.is_absolute():
             p = self.config.root_dir / p
@@ -31,93 +38,42 @@ class ActionPolicy:
             raise ValueError("Path outside root_dir")
         return p
 
-    def _validate_command(self, cmd: Union[str, List[str]], shell: Optional[bool]) -> List[str]:
+    def validate_command(self, cmd: Union[str, List[str]]) -> List[str]:
         if isinstance(cmd, str):
             args = shlex_split(cmd)
         else:
             args = cmd
         if not args:
             raise ValueError("Empty command")
+        allowed = self.config.allowed_commands
+        if allowed:
+            name = command_name(args)
+            program = command_name(args[:1])
+            if name not in allowed and program not in allowed:
+                raise ValueError(f"Command not allowed: {program}. Allowed: {', '.join(allowed)}")
         return args
 
-    def check(self, call: ActionCall) -> None:
-        n = call.name
-        p = call.params
+    def check(self, call: ActionCall, spec: ActionSpec) -> Dict[str, Any]:
+        """Validate call params against the action's model; returns the normalized params.
 
-        if n == "read_file":
-            if not p.get("path"):
-                raise ValueError("Missing path")
-            p["path"] = str(self._resolve_path(p["path"]))
-            max_bytes = p.get("max_bytes")
-            if max_bytes and int(max_bytes) > self.config.max_read_bytes:
-                raise ValueError("max_bytes exceeds limit")
-
-        elif n == "create_file":
-            if not p.get("path"):
-                raise ValueError("Missing path")
-            p["path"] = str(self._resolve_path(p["path"]))
-            content = p.get("content", "")
-            size = len(str(content).encode(p.get("encoding", "utf-8")))
-            if size > self.config.max_write_bytes:
-                raise ValueError("Content too large")
-
-        elif n == "edit_file":
-            if not p.get("path"):
-                raise ValueError("Missing path")
-            p["path"] = str(self._resolve_path(p["path"]))
-            if "old" not in p or "new" not in p:
-                raise ValueError("Missing old or new")
-
-        elif n == "run_command":
-            if not p.get("cmd"):
-                raise ValueError("Missing cmd")
-            shell = p.get("shell", False)
-            p["cmd"] = self._validate_command(p["cmd"], shell)
-            timeout = p.get("timeout_sec")
-            if timeout and int(timeout) > self.config.command_timeout_sec:
-                raise ValueError("Timeout exceeds limit")
-            if p.get("cwd"):
-                p["cwd"] = str(self._resolve_path(p["cwd"]))
-
-        elif n == "get_file_tree":
-            start_path = p.get("start_path", ".")
-            p["start_path"] = str(self._resolve_path(start_path))
-
-        elif n == "run_ipython":
-            if not p.get("code"):
-                raise ValueError("Missing code")
-
-        elif n == "finish_task":
-            pass
-
-        elif n == "run_coder":
-            if not p.get("instruction"):
-                raise ValueError("Missing instruction")
-
-        elif n == "finish_work":
-            pass
-
-        elif n == "get_project_tree":
-            start_path = p.get("start_path", ".")
-            p["start_path"] = str(self._resolve_path(start_path))
-
-        elif n == "get_all_symbols":
-            if not p.get("file_path"):
-                raise ValueError("Missing file_path")
-            p["file_path"] = str(self._resolve_path(p["file_path"]))
-
-        elif n == "open_file":
-            if not p.get("file_path"):
-                raise ValueError("Missing file_path")
-            p["file_path"] = str(self._resolve_path(p["file_path"]))
-
-        elif n == "terminal_command":
-             if not p.get("cmd"):
-                raise ValueError("Missing cmd")
-             shell = p.get("shell", False)
-             p["cmd"] = self._validate_command(p["cmd"], shell)
-             if p.get("cwd"):
-                p["cwd"] = str(self._resolve_path(p["cwd"]))
-
-        else:
-            raise ValueError(f"Unknown action: {n}")
\ No newline at end of file
+        Only the params the model actually sent are returned, so handler defaults
+        (and keywords bound at registry build time) stay in effect.
+        """
+        try:
+            model = spec.params.model_validate(call.params, context={"policy": self})
+        except ValidationError as e:
+            raise ValueError(format_validation_error(e)) from None
+        return model.model_dump(exclude_unset=True)
+
+
+def format_validation_error(error: ValidationError) -> str:
+    parts = []
+    for err in error.errors():
+        loc = ".".join(str(x) for x in err["loc"])
+        msg = err["msg"].removeprefix("Value error, ")
+        if err["type"] == "missing":
+            msg = "Missing " + loc
+        elif loc:
+            msg = f"{loc}: {msg}"
+        parts.append(msg)
+    return "; ".join(parts)
@@ -0,0 +1,168 @@
+import os
+import selectors
+import signal
+import subprocess
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Union
+
+CHUNK = 65536
+# After the command itself exits, how long background children may keep its pipes open.
+PIPE_GRACE_SEC = 1.0
+KILL_GRACE_SEC = 2.0
+
+
+class Capture:
+    """First head_bytes and last tail_bytes of a stream; memory stays bounded however much is written."""
+
+    def __init__(self, head_bytes: int, tail_bytes: int):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+        self.total_lines = 0
+
+    def write(self, chunk: bytes):
+        self.total_bytes += len(chunk)
+        self.total_lines += chunk.count(b"\n")
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if not chunk or not self.tail_bytes:
+            return
+        self.tail += chunk
+        # Trim lazily so a stream of small writes does not shift the buffer every time.
+        if len(self.tail) > 2 * self.tail_bytes:
+            del self.tail[:len(self.tail) - self.tail_bytes]
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > len(self.head) + min(len(self.tail), self.tail_bytes)
+
+    def text(self, encoding: str = "utf-8") -> str:
+        head, tail = bytes(self.head), bytes(self.tail[-self.tail_bytes:] if self.tail_bytes else b"")
+        if not self.truncated:
+            return (head + tail).decode(encoding, errors="replace").replace("\r\n", "\n")
+        # Cut both sides at line boundaries so neither shows half a line.
+        cut = head.rfind(b"\n")
+        if cut != -1:
+            head = head[:cut + 1]
+        cut = tail.find(b"\n")
+        if cut != -1:
+            tail = tail[cut + 1:]
+        dropped_bytes = self.total_bytes - len(head) - len(tail)
+        dropped_lines = self.total_lines - head.count(b"\n") - tail.count(b"\n")
+        marker = f"[... {dropped_bytes} bytes, {dropped_lines} lines dropped ...]\n"
+        return (head.decode(encoding, errors="replace") + marker + tail.decode(encoding, errors="replace")).replace("\r\n", "\n")
+
+    def summary(self) -> Dict[str, int]:
+        return {"bytes": self.total_bytes, "lines": self.total_lines}
+
+
+class ProcessResult:
+    def __init__(self, return_code: Optional[int], stdout: Capture, stderr: Capture, timed_out: bool, duration_sec: float, queue_ms: float = 0.0):
+        self.return_code = return_code
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.duration_sec = duration_sec
+        self.queue_ms = queue_ms
+
+
+def _kill_group(proc: subprocess.Popen):
+    """SIGTERM the whole process group, then SIGKILL whatever is left after a grace period."""
+    for sig, grace in ((signal.SIGTERM, KILL_GRACE_SEC), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            return
+        if grace is None:
+            break
+        try:
+            proc.wait(timeout=grace)
+            # The leader is gone; make sure its children go with it.
+            os.killpg(proc.pid, signal.SIGKILL)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+        except (ProcessLookupError, PermissionError):
+            return
+
+
+def run_streaming(
+    args: Union[str, List[str]],
+    cwd: Optional[str] = None,
+    env: Optional[Dict[str, str]] = None,
+    shell: bool = False,
+    timeout_sec: Optional[float] = None,
+    head_bytes: int = 16384,
+    tail_bytes: int = 65536,
+    sandbox: Any = None,
+) -> ProcessResult:
+    """Run a command in its own process group, draining stdout/stderr into bounded captures.
+
+    On timeout the whole group is killed, so shells, pip and test runners
+    cannot leave children behind. With a sandbox.Sandbox, heavy commands
+    first wait for a host-wide slot (the timeout starts once admitted) and
+    the process is confined before it execs (sandbox.Sandbox.wrap). Raises like
+    subprocess.Popen if the command cannot be started.
+    """
+    with sandbox.admit(args) if sandbox is not None else nullcontext(0.0) as queue_ms:
+        result = _run(args, cwd, env, shell, timeout_sec, head_bytes, tail_bytes, sandbox)
+    result.queue_ms = queue_ms
+    return result
+
+
+def _run(args, cwd, env, shell, timeout_sec, head_bytes, tail_bytes, sandbox) -> ProcessResult:
+    t0 = time.monotonic()
+    deadline = t0 + timeout_sec if timeout_sec else None
+    launch = sandbox.wrap(args, shell, env) if sandbox is not None else None
+    proc = subprocess.Popen(
+        launch or args, cwd=cwd, env=env, shell=shell and launch is None,
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    if sandbox is not None and launch is None:
+        sandbox.confine(proc.pid)
+    out, err = Capture(head_bytes, tail_bytes), Capture(head_bytes, tail_bytes)
+    captures = {proc.stdout.fileno(): out, proc.stderr.fileno(): err}
+    sel = selectors.DefaultSelector()
+    for fd in captures:
+        sel.register(fd, selectors.EVENT_READ)
+    timed_out = False
+    exited_at = None
+    try:
+        while sel.get_map():
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                timed_out = True
+                break
+            if exited_at is None and proc.poll() is not None:
+                exited_at = now
+            if exited_at is not None and now - exited_at >= PIPE_GRACE_SEC:
+                break
+            wait = 0.1
+            if deadline is not None:
+                wait = min(wait, deadline - now)
+            for key, _ in sel.select(timeout=max(wait, 0)):
+                chunk = os.read(key.fd, CHUNK)
+                if chunk:
+                    captures[key.fd].write(chunk)
+                else:
+                    sel.unregister(key.fd)
+        if not timed_out:
+            # EOF on both pipes can arrive just before the command actually exits.
+            try:
+                proc.wait(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                timed_out = True
+    finally:
+        sel.close()
+        # Also reaps anything the command left running in the background.
+        _kill_group(proc)
+        proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+    return ProcessResult(None if timed_out else proc.returncode, out, err, timed_out, time.monotonic() - t0)
@@ -1,36 +1,278 @@
+import json
 from functools import partial
-from typing import Dict, Callable
+from typing import Dict, List, Optional
+from .models import ActionResult, ActionSpec
+from .params import (
+    CommandParams, CreateFileParams, EditFileParams, FileTreeParams, IPythonParams, NoParams,
+    OpenFileParams, PatchParams, ReadFileParams, RunCoderParams, SearchParams, SymbolQueryParams,
+    SymbolsParams, patch_paths,
+)
 from .policy import ActionPolicy
+from .sandbox import Sandbox
+from .kernel import PythonKernel
+from .session import PythonSession
+from .search_index import SearchIndex, get_search_index, release_search_index
+from .symbol_index import SymbolIndex, get_symbol_index, release_symbol_index
 from .actions.file import read_file, create_file, edit_file, get_file_tree
+from .actions.patch import apply_patch
+from .actions.search import search_code
 from .actions.terminal import run_command
 from .actions.python import run_ipython
 from .actions.control import finish_task
 
-from .actions.manager import run_coder, finish_work, get_all_symbols, open_file
+from .actions.manager import (
+    run_coder, finish_work, get_all_symbols, open_file, find_definition, find_references, project_outline,
+)
 
-def build_registry(policy: ActionPolicy) -> Dict[str, Callable]:
+def _tree(policy: ActionPolicy):
+    return partial(
+        get_file_tree,
+        root_dir=str(policy.config.root_dir),
+        ignore=policy.config.ignore_patterns,
+        max_entries=policy.config.tree_max_entries,
+    )
+
+def _symbol_index(policy: ActionPolicy) -> SymbolIndex:
+    return get_symbol_index(policy.config.root_dir, policy.config.index_dir, policy.config.ignore_patterns)
+
+def _whole_project(params) -> List[str]:
+    # Index queries read every indexed file, so they are ordered against any write in root_dir.
+    return ["."]
+
+def _search_index(policy: ActionPolicy) -> SearchIndex:
+    return get_search_index(policy.config.root_dir, policy.config.ignore_patterns)
+
+def release_indexes(root_dir: str):
+    """Free the in-memory symbol and search indexes of a workspace once its run is over."""
+    release_symbol_index(root_dir)
+    release_search_index(root_dir)
+
+def _reindexing(fn, *indexes):
+    """Wrap a write action so the files it changed go straight into the indexes."""
+    def run(**params):
+        result = fn(**params)
+        if isinstance(result, ActionResult) and result.success and result.data:
+            paths = result.data.get("files") or [result.data.get("path", "")]
+            for index in indexes:
+                index.update(paths)
+        return result
+    return run
+
+def _invalidating(fn, *indexes):
+    """Wrap an action that may write anywhere (commands, Python code) so the indexes walk the workspace again."""
+    def run(**params):
+        try:
+            return fn(**params)
+        finally:
+            for index in indexes:
+                index.invalidate()
+    return run
+
+def _search(index: SearchIndex, description: str) -> ActionSpec:
+    return ActionSpec(
+        name="search_code",
+        fn=partial(search_code, index=index),
+        params=SearchParams,
+        read_only=True,
+        touches=_whole_project,
+        description=description,
+        example={"query": "def on_save", "regex": False, "glob": "*.py", "context": 2},
+    )
+
+def _command_description(policy: ActionPolicy, description: str) -> str:
+    """Spell out what validate_command accepts so the model does not spend turns on rejected commands."""
+    allowed = policy.config.allowed_commands
+    if allowed:
+        description += f" Allowed programs: {', '.join(allowed)} (python -m MODULE counts as MODULE)."
+    if not policy.config.allow_shell:
+        description += " The command runs without a shell: no pipes, redirection or &&."
+    return description
+
+def _index(specs: List[ActionSpec]) -> Dict[str, ActionSpec]:
+    return {spec.name: spec for spec in specs}
+
+def build_registry(
+    policy: ActionPolicy,
+    sandbox: Optional[Sandbox] = None,
+    session: Optional[PythonSession] = None,
+    kernel: Optional[PythonKernel] = None,
+) -> Dict[str, ActionSpec]:
     root = str(policy.config.root_dir)
-    return {
-        "read_file": partial(read_file, root_dir=root, max_bytes=policy.config.max_read_bytes),
-        "create_file": partial(create_file, root_dir=root),
-        "edit_file": partial(edit_file, root_dir=root),
-        "get_file_tree": partial(get_file_tree, root_dir=root),
-        "run_command": partial(run_command, root_dir=root, max_output_chars=policy.config.max_output_chars),
-        "run_ipython": partial(run_ipython, root_dir=root),
-        "finish_task": finish_task,
-    }
+    search = _search_index(policy)
+    symbols = _symbol_index(policy)
+    # The kernel process only starts on the first run_ipython call.
+    kernel = kernel or PythonKernel(root, sandbox=sandbox)
+    return _index([
+        ActionSpec(
+            name="read_file",
+            fn=partial(read_file, root_dir=root, max_bytes=policy.config.max_read_bytes),
+            params=ReadFileParams,
+            read_only=True,
+            example={"path": "file.py"},
+        ),
+        ActionSpec(
+            name="create_file",
+            fn=_reindexing(partial(create_file, root_dir=root), search, symbols),
+            params=CreateFileParams,
+            example={"path": "file.py", "content": "code"},
+        ),
+        ActionSpec(
+            name="edit_file",
+            fn=_reindexing(partial(edit_file, root_dir=root), search, symbols),
+            params=EditFileParams,
+            example={"path": "file.py", "old": "old text", "new": "new text"},
+        ),
+        ActionSpec(
+            name="apply_patch",
+            fn=_reindexing(partial(apply_patch, root_dir=root), search, symbols),
+            params=PatchParams,
+            touches=patch_paths,
+            description="several edits across files in one call, applied all-or-nothing (each old must match exactly once); a unified diff can be passed instead as {\"patch\": \"...\"}",
+            example={"hunks": [{"path": "file.py", "old": "old text", "new": "new text"}, {"path": "other.py", "old": "x", "new": "y"}]},
+        ),
+        ActionSpec(
+            name="get_file_tree",
+            fn=_tree(policy),
+            params=FileTreeParams,
+            read_only=True,
+            description="show file structure",
+            example={"start_path": ".", "max_depth": 2},
+        ),
+        _search(search, "search the project for a literal string (or a regex with \"regex\": true), line by line; optional case_sensitive, glob, context lines and max_results"),
+        ActionSpec(
+            name="run_command",
+            fn=_invalidating(
+                partial(run_command, root_dir=root, max_output_chars=policy.config.max_output_chars, sandbox=sandbox, session=session),
+                search, symbols,
+            ),
+            params=CommandParams,
+            exclusive=True,
+            description=_command_description(policy, "Run a terminal command."),
+            example={"cmd": ["command", "args"]},
+        ),
+        ActionSpec(
+            name="run_ipython",
+            fn=_invalidating(
+                partial(
+                    run_ipython,
+                    kernel=kernel,
+                    timeout_sec=policy.config.command_timeout_sec,
+                    max_output_chars=policy.config.max_output_chars,
+                ),
+                search, symbols,
+            ),
+            params=IPythonParams,
+            exclusive=True,
+            description="execute python code in interactive environment (state is preserved)",
+            example={"code": "print('hello')"},
+        ),
+        ActionSpec(
+            name="finish_task",
+            fn=finish_task,
+            params=NoParams,
+            exclusive=True,
+            description="finish task execution and run tests",
+        ),
+    ])
 
 def build_manager_registry(
     policy: ActionPolicy,
     coder_agent: object,
-    code_executor: object
-) -> Dict[str, Callable]:
+    code_executor: object,
+    sandbox: Optional[Sandbox] = None,
+    session: Optional[PythonSession] = None,
+) -> Dict[str, ActionSpec]:
     root = str(policy.config.root_dir)
-    return {
-        "run_coder": partial(run_coder, coder_agent=coder_agent),
-        "finish_work": partial(finish_work, code_executor=code_executor),
-        "get_project_tree": partial(get_file_tree, root_dir=root),
-        "get_all_symbols": partial(get_all_symbols, root_dir=root),
-        "open_file": partial(open_file, root_dir=root),
-        "terminal_command": partial(run_command, root_dir=root, max_output_chars=policy.config.max_output_chars),
-    }
\ No newline at end of file
+    symbols = _symbol_index(policy)
+    search = _search_index(policy)
+    return _index([
+        ActionSpec(
+            name="run_coder",
+            fn=partial(run_coder, coder_agent=coder_agent),
+            params=RunCoderParams,
+            exclusive=True,
+            description="Send instructions to the Coder Agent. First call should include the RPD. Subsequent calls should include feedback or new tasks.",
+            example={"instruction": "text"},
+        ),
+        ActionSpec(
+            name="finish_work",
+            fn=partial(finish_work, code_executor=code_executor),
+            params=NoParams,
+            exclusive=True,
+            description="Call this ONLY when the project is fully completed and verified. This will trigger the final build.",
+        ),
+        ActionSpec(
+            name="get_project_tree",
+            fn=_tree(policy),
+            params=FileTreeParams,
+            read_only=True,
+            description="Get the file structure of the project.",
+        ),
+        ActionSpec(
+            name="get_all_symbols",
+            fn=partial(get_all_symbols, root_dir=root, index=symbols),
+            params=SymbolsParams,
+            read_only=True,
+            description="Get a list of classes and functions in a file with line numbers.",
+            example={"file_path": "path/to/file.py"},
+        ),
+        ActionSpec(
+            name="open_file",
+            fn=partial(open_file, root_dir=root),
+            params=OpenFileParams,
+            read_only=True,
+            description="Read file content. Parameters start_line and end_line are optional - use them to read only specific lines (e.g., start_line: 10, end_line: 50). If omitted, reads entire file.",
+            example={"file_path": "path/to/file.py", "start_line": 1, "end_line": 100},
+        ),
+        ActionSpec(
+            name="find_definition",
+            fn=partial(find_definition, index=symbols),
+            params=SymbolQueryParams,
+            read_only=True,
+            touches=_whole_project,
+            description="Find where a class, function, method or Qt signal is defined (or imported) across the project. Accepts a bare or dotted name.",
+            example={"name": "MainWindow.on_save"},
+        ),
+        ActionSpec(
+            name="find_references",
+            fn=partial(find_references, index=symbols),
+            params=SymbolQueryParams,
+            read_only=True,
+            touches=_whole_project,
+            description="List every file:line that uses a name (calls are marked). Prefer this over grep.",
+            example={"name": "on_save"},
+        ),
+        _search(
+            search,
+            "Search the project for a literal string (or a regex with \"regex\": true), line by line. Optional: case_sensitive, glob (e.g. \"*.py\"), context lines, max_results. Use this instead of grep.",
+        ),
+        ActionSpec(
+            name="project_outline",
+            fn=partial(project_outline, index=symbols),
+            params=NoParams,
+            read_only=True,
+            touches=_whole_project,
+            description="Get classes, methods, functions and signal/slot connections of every Python file in the project.",
+        ),
+        ActionSpec(
+            name="terminal_command",
+            fn=_invalidating(
+                partial(run_command, root_dir=root, max_output_chars=policy.config.max_output_chars, sandbox=sandbox, session=session),
+                search, symbols,
+            ),
+            params=CommandParams,
+            exclusive=True,
+            description=_command_description(policy, "Run a terminal command (use sparingly; use search_code instead of grep)."),
+            example={"cmd": ["command", "args"]},
+        ),
+    ])
+
+def describe_actions(registry: Dict[str, ActionSpec]) -> str:
+    """The "Available actions" list for a system prompt, one line per action."""
+    lines = []
+    for spec in registry.values():
+        line = f"- {spec.name}: {json.dumps(spec.example, ensure_ascii=False)}"
+        if spec.description:
+            line += f" - {spec.description}"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,277 @@
+import errno
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # Windows: no rlimits or flock, commands run unconfined
+    fcntl = resource = None
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+# Leaf group the server moves into so its own cgroup can delegate controllers to run groups.
+SERVER_CGROUP = "aegis-server"
+
+# Runs in the child: set the limits and join the cgroup, then become the command.
+_LAUNCHER = """
+import os, resource, sys
+limits, procs, argv = sys.argv[1], sys.argv[2], sys.argv[3:]
+for item in filter(None, limits.split(",")):
+    which, soft, hard = map(int, item.split(":"))
+    resource.setrlimit(which, (soft, hard))
+if procs:
+    try:
+        with open(procs, "w") as f:
+            f.write("0")
+    except OSError:
+        pass
+try:
+    os.execvp(argv[0], argv)
+except OSError as e:
+    sys.stderr.write(f"{argv[0]}: {e.strerror}\\n")
+    os._exit(127)
+"""
+
+
+class SandboxConfig(BaseModel):
+    # Per-process rlimits (None leaves the inherited limit alone).
+    cpu_sec: Optional[int] = 900
+    memory_mb: Optional[int] = 4096
+    max_file_mb: Optional[int] = 1024
+    # Per-run cgroup v2 limits, applied to every process the run starts.
+    use_cgroup: bool = True
+    cgroup_parent: Optional[Path] = None
+    cgroup_memory_mb: Optional[int] = 6144
+    max_processes: Optional[int] = 512
+    cpu_cores: Optional[float] = None
+    # Host-wide cap on concurrent heavy jobs (shared by every AEGIS process via lock files).
+    heavy_commands: List[str] = ["pip", "pip3", "PyInstaller", "pyinstaller"]
+    max_heavy_jobs: int = 2
+    lock_dir: Path = Path(tempfile.gettempdir()) / "aegis-jobs"
+
+
+def command_name(args: Union[str, List[str]]) -> str:
+    """Program a command runs: "python3.11 -m pip" -> "pip", "/usr/bin/python3" -> "python"."""
+    argv = args.split() if isinstance(args, str) else list(args)
+    if not argv:
+        return ""
+    name = re.sub(r"(\.exe)?$", "", os.path.basename(argv[0]), flags=re.IGNORECASE)
+    name = re.sub(r"(?<=[a-zA-Z])[\d.]+$", "", name)
+    if name == "python" and len(argv) > 2 and argv[1] == "-m":
+        return argv[2]
+    return name
+
+
+class JobSlots:
+    """Counting semaphore across processes: a slot is an flock on one of max_jobs files."""
+
+    def __init__(self, max_jobs: int, lock_dir: Path):
+        self.max_jobs = max(1, max_jobs)
+        self.lock_dir = Path(lock_dir)
+
+    def acquire(self, poll_sec: float = 0.05):
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        while True:
+            for i in range(self.max_jobs):
+                f = open(self.lock_dir / f"slot-{i}.lock", "a")
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return f
+                except BlockingIOError:
+                    f.close()
+            time.sleep(poll_sec)
+
+    @staticmethod
+    def release(handle):
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+
+class CgroupSlice:
+    """A cgroup v2 child group for one run; processes are moved in right after they start."""
+
+    def __init__(self, name: str, config: SandboxConfig):
+        if not (CGROUP_ROOT / "cgroup.controllers").exists():
+            raise OSError("cgroup v2 is not mounted")
+        parent = config.cgroup_parent or self._own_cgroup()
+        controllers = {"memory": config.cgroup_memory_mb, "pids": config.max_processes, "cpu": config.cpu_cores}
+        wanted = [c for c, limit in controllers.items() if limit]
+        enabled = (parent / "cgroup.subtree_control").read_text().split()
+        missing = [c for c in wanted if c not in enabled]
+        if missing:
+            control = " ".join(f"+{c}" for c in missing)
+            try:
+                (parent / "cgroup.subtree_control").write_text(control)
+            except OSError as e:
+                # A group that still holds processes cannot hand controllers down (EBUSY).
+                if e.errno != errno.EBUSY or config.cgroup_parent is not None:
+                    raise
+                self._vacate(parent)
+                (parent / "cgroup.subtree_control").write_text(control)
+        self.path = parent / re.sub(r"[^\w.-]", "_", f"aegis-{name}")
+        self.path.mkdir(exist_ok=True)
+        if config.cgroup_memory_mb:
+            (self.path / "memory.max").write_text(str(config.cgroup_memory_mb * 1024 * 1024))
+        if config.max_processes:
+            (self.path / "pids.max").write_text(str(config.max_processes))
+        if config.cpu_cores:
+            period = 100000
+            (self.path / "cpu.max").write_text(f"{int(config.cpu_cores * period)} {period}")
+
+    @staticmethod
+    def _own_cgroup() -> Path:
+        for line in Path("/proc/self/cgroup").read_text().splitlines():
+            if line.startswith("0::"):
+                path = CGROUP_ROOT / line[3:].lstrip("/")
+                # Already moved out of the way by an earlier run.
+                return path.parent if path.name == SERVER_CGROUP else path
+        raise OSError("process is not in a cgroup v2 hierarchy")
+
+    @staticmethod
+    def _vacate(parent: Path):
+        """Move every process in parent (this server included) into a leaf group beside the run groups."""
+        leaf = parent / SERVER_CGROUP
+        leaf.mkdir(exist_ok=True)
+        for pid in (parent / "cgroup.procs").read_text().split():
+            try:
+                (leaf / "cgroup.procs").write_text(pid)
+            except ProcessLookupError:
+                pass
+
+    def add(self, pid: int):
+        (self.path / "cgroup.procs").write_text(str(pid))
+
+    def close(self):
+        try:
+            self.path.rmdir()
+        except OSError:
+            pass
+
+
+class Sandbox:
+    """Confines the subprocesses of one run: rlimits, an optional cgroup and heavy-job admission.
+
+    Commands are started through wrap(), a small launcher that applies the
+    limits and joins the cgroup in the child before exec, so nothing they fork
+    escapes (a preexec_fn would do the same but is unsafe in the threaded
+    executor). The session and kernel workers are confined with prlimit and
+    cgroup.procs right after they start; they fork nothing until their first
+    request. Without cgroup v2 (or without permission to delegate it) the run
+    falls back to rlimits only; cgroup_error says why.
+    """
+
+    def __init__(self, config: Optional[SandboxConfig] = None, name: str = "run", metrics: Any = None, labels: Optional[Dict[str, str]] = None):
+        self.config = config or SandboxConfig()
+        self.metrics = metrics
+        self.labels = labels or {}
+        self.heavy = {c.lower() for c in self.config.heavy_commands}
+        self.slots = JobSlots(self.config.max_heavy_jobs, self.config.lock_dir) if fcntl else None
+        self.cgroup = None
+        self.cgroup_error = None
+        if self.config.use_cgroup and resource is not None:
+            try:
+                self.cgroup = CgroupSlice(name, self.config)
+            except OSError as e:
+                self.cgroup_error = str(e)
+
+    def is_heavy(self, args: Union[str, List[str]]) -> bool:
+        return command_name(args).lower() in self.heavy
+
+    @contextmanager
+    def admit(self, args: Union[str, List[str]]):
+        """Hold a host-wide heavy-job slot for the duration of the block; yields the queue wait in ms."""
+        if self.slots is None or not self.is_heavy(args):
+            yield 0.0
+            return
+        t0 = time.perf_counter()
+        handle = self.slots.acquire()
+        wait_ms = (time.perf_counter() - t0) * 1000
+        if self.metrics is not None:
+            self.metrics.observe("queue", command_name(args), wait_ms, **self.labels)
+        try:
+            yield wait_ms
+        finally:
+            JobSlots.release(handle)
+
+    def _rlimits(self) -> Dict[int, int]:
+        """Soft limits; the CPU limit gets a little headroom in its hard limit so SIGXCPU arrives first."""
+        c = self.config
+        limits = {}
+        if c.cpu_sec:
+            limits[resource.RLIMIT_CPU] = c.cpu_sec
+        if c.memory_mb:
+            # RLIMIT_DATA rather than RLIMIT_AS: Qt and PyInstaller reserve far more address space than they use.
+            limits[resource.RLIMIT_DATA] = c.memory_mb * 1024 * 1024
+        if c.max_file_mb:
+            limits[resource.RLIMIT_FSIZE] = c.max_file_mb * 1024 * 1024
+        limits[resource.RLIMIT_CORE] = 0
+        return limits
+
+    def _limits(self, hard_of: Callable[[int], int]) -> Dict[int, Tuple[int, int]]:
+        """(soft, hard) per rlimit, never above the hard limit the process already has."""
+        limits = {}
+        for which, value in self._rlimits().items():
+            hard = hard_of(which)
+            if hard != resource.RLIM_INFINITY:
+                value = min(value, hard)
+            new_hard = value + 10 if which == resource.RLIMIT_CPU and value else value
+            if hard != resource.RLIM_INFINITY:
+                new_hard = min(new_hard, hard)
+            limits[which] = (value, new_hard)
+        return limits
+
+    def wrap(self, args: Union[str, List[str]], shell: bool = False, env: Optional[Dict[str, str]] = None) -> Optional[List[str]]:
+        """argv that confines the command before it execs, or None where that is not supported.
+
+        Raises FileNotFoundError for an unknown program, as Popen would.
+        """
+        if resource is None or not sys.executable:
+            return None
+        if shell:
+            argv = ["/bin/sh", "-c", *([args] if isinstance(args, str) else args)]
+        else:
+            argv = [args] if isinstance(args, str) else list(args)
+            if os.sep not in argv[0] and shutil.which(argv[0], path=(env or os.environ).get("PATH")) is None:
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), argv[0])
+        # The child inherits this process's hard limits, so they are read here.
+        limits = self._limits(lambda which: resource.getrlimit(which)[1])
+        spec = ",".join(f"{which}:{soft}:{hard}" for which, (soft, hard) in limits.items())
+        procs = str(self.cgroup.path / "cgroup.procs") if self.cgroup is not None else ""
+        return [sys.executable, "-I", "-S", "-c", _LAUNCHER, spec, procs, *argv]
+
+    def confine(self, pid: int):
+        if resource is None:
+            return
+        try:
+            for which, limit in self._limits(lambda which: resource.prlimit(pid, which)[1]).items():
+                resource.prlimit(pid, which, limit)
+        except (OSError, ValueError):
+            # The process may already have exited.
+            return
+        if self.cgroup is not None:
+            try:
+                self.cgroup.add(pid)
+            except OSError:
+                pass
+
+    def close(self):
+        if self.cgroup is not None:
+            self.cgroup.close()
+
+    def describe(self) -> str:
+        c = self.config
+        parts = [f"cpu {c.cpu_sec}s", f"data {c.memory_mb}MB", f"file {c.max_file_mb}MB", f"{c.max_heavy_jobs} heavy jobs"]
+        if self.cgroup is not None:
+            parts.append(f"cgroup {self.cgroup.path}")
+        elif self.cgroup_error:
+            parts.append(f"no cgroup ({self.cgroup_error})")
+        return ", ".join(parts)
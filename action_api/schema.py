@@ -0,0 +1,88 @@
+import typing
+from typing import Any, Dict, List, Optional, Type, Union
+from pydantic import BaseModel
+from .models import ActionSpec
+
+_SCALARS = {str: "string", int: "integer", float: "number", bool: "boolean"}
+# json_schema response formats need an object at the root, so the reply variants sit under this key.
+RESPONSE_KEY = "reply"
+
+
+def _type_schema(tp: Any) -> Dict[str, Any]:
+    if tp in _SCALARS:
+        return {"type": _SCALARS[tp]}
+    origin = typing.get_origin(tp)
+    args = [a for a in typing.get_args(tp) if a is not type(None)]
+    if origin is Union:
+        if len(args) == 1:
+            return _type_schema(args[0])
+        return {"anyOf": [_type_schema(a) for a in args]}
+    if origin in (list, List):
+        return {"type": "array", "items": _type_schema(args[0]) if args else {}}
+    if origin in (dict, Dict) or tp is dict:
+        return {"type": "object"}
+    if isinstance(tp, type) and issubclass(tp, BaseModel):
+        return params_schema(tp)
+    return {}
+
+
+def params_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    properties: Dict[str, Any] = {}
+    required: List[str] = []
+    for name, field in model.model_fields.items():
+        properties[name] = _type_schema(field.annotation)
+        if field.is_required():
+            required.append(name)
+    schema: Dict[str, Any] = {"type": "object", "properties": properties}
+    if required:
+        schema["required"] = required
+    return schema
+
+
+def build_response_schema(actions: Dict[str, Dict[str, Any]], allow_multiple: bool = True) -> Dict[str, Any]:
+    """Schema of an agent reply: a thought plus one action, or a list of actions.
+
+    `actions` maps action name to the JSON schema of its params. The reply is
+    wrapped as {RESPONSE_KEY: reply}; parse_action unwraps it.
+    """
+    items = [
+        {
+            "type": "object",
+            "properties": {"action": {"type": "string", "enum": [name]}, "params": schema},
+            "required": ["action", "params"],
+        }
+        for name, schema in sorted(actions.items())
+    ]
+    variants = [
+        {
+            "type": "object",
+            "properties": {"thought": {"type": "string"}, **item["properties"]},
+            "required": ["thought", "action", "params"],
+        }
+        for item in items
+    ]
+    if allow_multiple:
+        variants.append({
+            "type": "object",
+            "properties": {
+                "thought": {"type": "string"},
+                "actions": {"type": "array", "items": {"anyOf": items}, "minItems": 1},
+            },
+            "required": ["thought", "actions"],
+        })
+    return object_schema({RESPONSE_KEY: {"anyOf": variants}}, [RESPONSE_KEY])
+
+
+def registry_response_schema(registry: Dict[str, ActionSpec], allow_multiple: bool = True) -> Dict[str, Any]:
+    return build_response_schema({name: params_schema(spec.params) for name, spec in registry.items()}, allow_multiple)
+
+
+def response_format(schema: Dict[str, Any], name: str = "agent_action") -> Dict[str, Any]:
+    return {"type": "json_schema", "json_schema": {"name": name, "schema": schema}}
+
+
+def object_schema(properties: Dict[str, Dict[str, Any]], required: Optional[List[str]] = None) -> Dict[str, Any]:
+    schema: Dict[str, Any] = {"type": "object", "properties": properties}
+    if required:
+        schema["required"] = required
+    return schema
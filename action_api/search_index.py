@@ -0,0 +1,260 @@
+import fnmatch
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from .ignore import DEFAULT_IGNORE, IgnoreRules
+
+MAX_FILE_BYTES = 1024 * 1024
+# Longest a query trusts update()/invalidate() alone before walking the workspace again.
+MAX_AGE_SEC = 30.0
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _literal_runs(items, runs: List[str]):
+    """Literal substrings every match of the parsed pattern must contain."""
+    run = []
+    for op, arg in items:
+        name = str(op)
+        if name == "LITERAL":
+            run.append(chr(arg))
+            continue
+        if run:
+            runs.append("".join(run))
+            run = []
+        if name == "SUBPATTERN":
+            _literal_runs(arg[-1], runs)
+        elif name in ("MAX_REPEAT", "MIN_REPEAT") and arg[0] >= 1:
+            _literal_runs(arg[2], runs)
+    if run:
+        runs.append("".join(run))
+
+
+def required_literals(pattern: str, flags: int = 0) -> List[str]:
+    runs: List[str] = []
+    try:
+        _literal_runs(sre_parse.parse(pattern, flags), runs)
+    except Exception:
+        return []
+    return [r for r in runs if len(r) >= 3]
+
+
+class _File:
+    __slots__ = ("stamp", "lines", "grams")
+
+    def __init__(self, stamp: tuple, text: str):
+        self.stamp = stamp
+        self.lines = text.splitlines()
+        # Trigrams are taken from the lower-cased text so one index serves case-insensitive queries too.
+        self.grams = trigrams(text.lower())
+
+
+class SearchIndex:
+    """In-memory trigram index of the text files in a workspace.
+
+    Files are re-read only when their size or mtime changes. Write actions
+    push their paths in via update(); actions that may change anything
+    (commands) call invalidate(), and only then, or once max_age_sec has
+    passed, does a query walk the workspace again. Queries intersect the posting lists of the trigrams the pattern requires
+    and run the regex only on the files that survive.
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        ignore: Optional[List[str]] = None,
+        max_file_bytes: int = MAX_FILE_BYTES,
+        max_age_sec: float = MAX_AGE_SEC,
+    ):
+        self.root_dir = Path(root_dir).resolve()
+        self.rules = IgnoreRules(DEFAULT_IGNORE if ignore is None else ignore)
+        self.max_file_bytes = max_file_bytes
+        self.max_age_sec = max_age_sec
+        self.files: Dict[str, _File] = {}
+        self.postings: Dict[str, Set[str]] = {}
+        self._walked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _walk(self) -> Dict[str, os.stat_result]:
+        found = {}
+        stack = [(str(self.root_dir), "")]
+        while stack:
+            path, rel_dir = stack.pop()
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if self.rules.ignored(rel, entry.name, is_dir):
+                            continue
+                        if is_dir:
+                            stack.append((entry.path, rel))
+                        elif entry.is_file(follow_symlinks=False):
+                            found[rel] = entry.stat()
+            except OSError:
+                continue
+        return found
+
+    def _drop(self, rel: str):
+        old = self.files.pop(rel, None)
+        if old is None:
+            return
+        for gram in old.grams:
+            paths = self.postings.get(gram)
+            if paths is not None:
+                paths.discard(rel)
+                if not paths:
+                    del self.postings[gram]
+
+    def _load(self, rel: str, st: os.stat_result):
+        stamp = (st.st_size, st.st_mtime_ns)
+        current = self.files.get(rel)
+        if current is not None and current.stamp == stamp:
+            return False
+        self._drop(rel)
+        if st.st_size > self.max_file_bytes:
+            return True
+        try:
+            raw = (self.root_dir / rel).read_bytes()
+        except OSError:
+            return True
+        if b"\0" in raw[:8192]:
+            return True
+        entry = _File(stamp, raw.decode("utf-8", errors="replace"))
+        self.files[rel] = entry
+        for gram in entry.grams:
+            self.postings.setdefault(gram, set()).add(rel)
+        return True
+
+    def refresh(self) -> int:
+        """Pick up files changed outside the write actions; returns how many were (re)loaded or dropped."""
+        with self._lock:
+            self._walked_at = time.monotonic()
+            current = self._walk()
+            changed = 0
+            for rel in [r for r in self.files if r not in current]:
+                self._drop(rel)
+                changed += 1
+            for rel, st in current.items():
+                changed += self._load(rel, st)
+            return changed
+
+    def invalidate(self):
+        """Something may have changed anywhere: the next query walks the workspace."""
+        self._walked_at = None
+
+    def ensure_fresh(self):
+        walked_at = self._walked_at
+        if walked_at is None or time.monotonic() - walked_at > self.max_age_sec:
+            self.refresh()
+
+    def update(self, paths: Iterable[str]):
+        with self._lock:
+            for path in paths:
+                try:
+                    rel = Path(path).resolve().relative_to(self.root_dir).as_posix()
+                except ValueError:
+                    continue
+                if self.rules.ignored(rel, rel.rsplit("/", 1)[-1], False):
+                    continue
+                try:
+                    st = os.stat(self.root_dir / rel)
+                except OSError:
+                    self._drop(rel)
+                    continue
+                self._load(rel, st)
+
+    def candidates(self, literals: List[str]) -> List[str]:
+        found: Optional[Set[str]] = None
+        for literal in literals:
+            for gram in trigrams(literal.lower()):
+                paths = self.postings.get(gram, set())
+                found = set(paths) if found is None else found & paths
+                if not found:
+                    return []
+        return sorted(self.files if found is None else found)
+
+    def search(
+        self,
+        query: str,
+        regex: bool = False,
+        case_sensitive: bool = True,
+        glob: Optional[str] = None,
+        context: int = 0,
+        max_results: int = 50,
+    ) -> dict:
+        self.ensure_fresh()
+        flags = 0 if case_sensitive else re.IGNORECASE
+        pattern = re.compile(query if regex else re.escape(query), flags)
+        literals = required_literals(query, flags) if regex else [query]
+        with self._lock:
+            paths = self.candidates([lit for lit in literals if len(lit) >= 3])
+            if glob:
+                paths = [p for p in paths if fnmatch.fnmatch(p, glob) or fnmatch.fnmatch(p.rsplit("/", 1)[-1], glob)]
+            snapshot = [(p, self.files[p].lines) for p in paths]
+        blocks, total, shown, files_matched = [], 0, 0, 0
+        for rel, lines in snapshot:
+            hits = [i for i, line in enumerate(lines) if pattern.search(line)]
+            if not hits:
+                continue
+            files_matched += 1
+            total += len(hits)
+            if shown < max_results:
+                blocks.append({"path": rel, "lines": lines, "hits": hits[:max_results - shown]})
+                shown += len(blocks[-1]["hits"])
+        return {
+            "matches": _format(blocks, context),
+            "shown": shown,
+            "total": total,
+            "files": files_matched,
+            "scanned": len(snapshot),
+            "indexed": len(self.files),
+        }
+
+
+def _format(blocks: List[dict], context: int) -> str:
+    """grep -n style: "path:line:text" for hits, "path-line-text" for context, "--" between groups."""
+    out = []
+    for block in blocks:
+        rel, lines, hits = block["path"], block["lines"], block["hits"]
+        hit_set = set(hits)
+        end = -1
+        for i in hits:
+            lo, hi = max(0, i - context), min(len(lines) - 1, i + context)
+            if context and out and (end < 0 or lo > end + 1):
+                out.append("--")
+            for j in range(max(lo, end + 1), hi + 1):
+                sep = ":" if j in hit_set else "-"
+                out.append(f"{rel}{sep}{j + 1}{sep}{lines[j]}")
+            end = max(end, hi)
+    return "\n".join(out)
+
+
+_indexes: Dict[str, SearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(root_dir: str, ignore: Optional[List[str]] = None) -> SearchIndex:
+    """One shared index per workspace, so both agents' writes keep it current."""
+    key = str(Path(root_dir).resolve())
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = SearchIndex(root_dir, ignore)
+        return index
+
+
+def release_search_index(root_dir: str):
+    with _indexes_lock:
+        _indexes.pop(str(Path(root_dir).resolve()), None)
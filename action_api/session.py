@@ -0,0 +1,204 @@
+import json
+import os
+import selectors
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .process import CHUNK, Capture, ProcessResult, run_streaming
+
+WORKER = Path(__file__).with_name("session_worker.py")
+START_TIMEOUT_SEC = 30.0
+# Extra time the worker gets to kill a timed-out command and answer before the whole session is killed.
+REPLY_GRACE_SEC = 5.0
+
+
+class SessionDied(RuntimeError):
+    pass
+
+
+def _python_command(args: List[str]) -> Optional[Tuple[str, str, List[str]]]:
+    """(mode, target, argv) for `python -c CODE`, `python -m MOD` and `python SCRIPT`; None otherwise."""
+    rest = list(args[1:])
+    while rest and rest[0] in ("-u", "-B"):
+        rest.pop(0)
+    if not rest:
+        return None
+    if rest[0] in ("-c", "-m"):
+        if len(rest) < 2:
+            return None
+        return rest[0][1], rest[1], rest[2:]
+    if rest[0].startswith("-"):
+        return None
+    return "script", rest[0], rest[1:]
+
+
+class PythonSession:
+    """A long-lived, per-run Python worker that runs `python ...` commands without interpreter startup.
+
+    Commands are sent over the worker's stdin/stdout as JSON lines. The
+    worker forks once per command and redirects the child's output to files
+    that are drained into bounded Captures, as with run_streaming. If the
+    worker dies or stops answering, it is killed, the command fails, and
+    the next command starts a fresh worker. Commands for any other program
+    fall back to run_streaming.
+    """
+
+    def __init__(self, cwd: str, sandbox: Any = None, interpreter: str = "python"):
+        self.cwd = str(Path(cwd).resolve())
+        self.sandbox = sandbox
+        self.interpreter = interpreter
+        self.proc: Optional[subprocess.Popen] = None
+        self.executable: Optional[str] = None
+        self.tmp_dir: Optional[str] = None
+        self.starts = 0
+        self.commands = 0
+        self._seq = 0
+        self._child: Optional[int] = None
+        self._buf = b""
+        self._lock = threading.Lock()
+
+    def handles(self, args: Union[str, List[str]], shell: bool = False) -> bool:
+        if shell or isinstance(args, str) or not args or _python_command(args) is None:
+            return False
+        found = shutil.which(args[0])
+        target = shutil.which(self.interpreter)
+        return bool(found and target and os.path.realpath(found) == os.path.realpath(target))
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def _start(self):
+        self.tmp_dir = self.tmp_dir or tempfile.mkdtemp(prefix="aegis-session-")
+        self.proc = subprocess.Popen(
+            [self.interpreter, "-u", str(WORKER)],
+            cwd=self.cwd,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        if self.sandbox is not None:
+            self.sandbox.confine(self.proc.pid)
+        self._buf = b""
+        hello = self._read_line(time.monotonic() + START_TIMEOUT_SEC)
+        if hello is None or not hello.get("ready"):
+            self._kill()
+            raise SessionDied("Python session failed to start")
+        self.executable = hello.get("executable")
+        self.starts += 1
+
+    def _read_line(self, deadline: Optional[float]) -> Optional[dict]:
+        fd = self.proc.stdout.fileno()
+        with selectors.DefaultSelector() as sel:
+            sel.register(fd, selectors.EVENT_READ)
+            while b"\n" not in self._buf:
+                wait = None if deadline is None else deadline - time.monotonic()
+                if wait is not None and wait <= 0:
+                    return None
+                if not sel.select(timeout=wait):
+                    continue
+                chunk = os.read(fd, CHUNK)
+                if not chunk:
+                    raise SessionDied("Python session exited")
+                self._buf += chunk
+        line, self._buf = self._buf.split(b"\n", 1)
+        return json.loads(line)
+
+    def _kill(self):
+        if self.proc is None:
+            return
+        for pgid in (self._child, self.proc.pid):
+            if pgid is None:
+                continue
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        self._child = None
+        self.proc.wait()
+        for stream in (self.proc.stdin, self.proc.stdout):
+            stream.close()
+        self.proc = None
+
+    def _drain(self, path: str, capture: Capture):
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK), b""):
+                    capture.write(chunk)
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def run(
+        self,
+        args: List[str],
+        cwd: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+        shell: bool = False,
+        timeout_sec: Optional[float] = None,
+        head_bytes: int = 16384,
+        tail_bytes: int = 65536,
+        sandbox: Any = None,
+    ) -> ProcessResult:
+        """Same contract as process.run_streaming; raises SessionDied if the worker is lost mid-command."""
+        sandbox = sandbox or self.sandbox
+        if not self.handles(args, shell):
+            return run_streaming(args, cwd=cwd, env=env, shell=shell, timeout_sec=timeout_sec,
+                                 head_bytes=head_bytes, tail_bytes=tail_bytes, sandbox=sandbox)
+        mode, target, argv = _python_command(args)
+        with sandbox.admit(args) if sandbox is not None else nullcontext(0.0) as queue_ms, self._lock:
+            if not self.alive:
+                if self.proc is not None:
+                    self._kill()
+                self._start()
+            self._seq += 1
+            base = os.path.join(self.tmp_dir, f"cmd-{self._seq}")
+            req = {
+                "id": self._seq, "mode": mode, "target": target, "args": argv,
+                "cwd": str(Path(cwd).resolve()) if cwd else self.cwd, "env": env,
+                "timeout": timeout_sec, "stdout": base + ".out", "stderr": base + ".err",
+            }
+            t0 = time.monotonic()
+            out, err = Capture(head_bytes, tail_bytes), Capture(head_bytes, tail_bytes)
+            try:
+                self.proc.stdin.write((json.dumps(req) + "\n").encode())
+                self.proc.stdin.flush()
+                started = self._read_line(t0 + START_TIMEOUT_SEC)
+                if started is None:
+                    raise SessionDied("Python session stopped responding")
+                self._child = started["started"]
+                deadline = None if timeout_sec is None else t0 + timeout_sec + REPLY_GRACE_SEC
+                reply = self._read_line(deadline)
+                if reply is not None:
+                    self._child = None
+            except (SessionDied, OSError) as e:
+                self._kill()
+                self._drain(req["stdout"], out)
+                self._drain(req["stderr"], err)
+                raise SessionDied(f"{e} during the command; a fresh session starts with the next one") from None
+            if reply is None:
+                # The worker could not even kill the command in time: drop the whole session.
+                self._kill()
+                self._drain(req["stdout"], out)
+                self._drain(req["stderr"], err)
+                return ProcessResult(None, out, err, True, time.monotonic() - t0, queue_ms)
+            self.commands += 1
+            self._drain(req["stdout"], out)
+            self._drain(req["stderr"], err)
+            return ProcessResult(
+                None if reply["timed_out"] else reply["exit_code"],
+                out, err, reply["timed_out"], time.monotonic() - t0, queue_ms,
+            )
+
+    def close(self):
+        with self._lock:
+            self._kill()
+            if self.tmp_dir:
+                shutil.rmtree(self.tmp_dir, ignore_errors=True)
+                self.tmp_dir = None
@@ -0,0 +1,157 @@
+"""Warm Python worker for action_api.session.PythonSession (stdlib only, runs as a script).
+
+Reads one JSON request per line on stdin and answers one JSON line on
+stdout. Each command runs in a forked child, so it starts with this
+process's already-initialized interpreter and preloaded modules but cannot
+change its state.
+"""
+import importlib
+import io
+import json
+import os
+import runpy
+import select
+import signal
+import sys
+import time
+import traceback
+
+# The script's own directory must not shadow the workspace's modules.
+sys.path.pop(0)
+
+PRELOAD = ("py_compile", "compileall", "unittest", "pip._internal.cli.main")
+KILL_GRACE_SEC = 2.0
+
+
+def _preload():
+    for name in PRELOAD:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+def _exit_code(exc: SystemExit) -> int:
+    code = exc.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _child(req: dict):
+    os.setsid()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    for fd, path in ((1, req["stdout"]), (2, req["stderr"])):
+        out = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.dup2(out, fd)
+        os.close(out)
+    sys.stdin = io.TextIOWrapper(io.FileIO(0, "r", closefd=False))
+    sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False), write_through=True)
+    sys.stderr = io.TextIOWrapper(io.FileIO(2, "w", closefd=False), write_through=True)
+    code = 0
+    try:
+        os.chdir(req["cwd"])
+        if req.get("env") is not None:
+            os.environ.clear()
+            os.environ.update(req["env"])
+        mode, target, args = req["mode"], req["target"], req["args"]
+        if mode == "c":
+            sys.argv = ["-c"] + args
+            sys.path.insert(0, "")
+            exec(compile(target, "<string>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+        elif mode == "m":
+            sys.argv = [target] + args
+            sys.path.insert(0, os.getcwd())
+            runpy.run_module(target, run_name="__main__", alter_sys=True)
+        else:
+            sys.argv = [target] + args
+            sys.path.insert(0, os.path.dirname(os.path.abspath(target)))
+            runpy.run_path(target, run_name="__main__")
+    except SystemExit as e:
+        code = _exit_code(e)
+    except BaseException as e:
+        # Skip this function's frame so tracebacks look like the ones `python` prints.
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        code = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(code)
+
+
+def _wait(pid: int, timeout):
+    """waitpid with a timeout; returns the exit code, or None on timeout."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pidfd = os.pidfd_open(pid) if hasattr(os, "pidfd_open") else None
+    try:
+        while True:
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                return os.waitstatus_to_exitcode(status)
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            if pidfd is not None:
+                select.select([pidfd], [], [], remaining)
+            else:
+                time.sleep(0.002 if remaining is None else min(0.002, remaining))
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+def _kill(pid: int) -> int:
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(pid, sig)
+        except ProcessLookupError:
+            break
+        code = _wait(pid, KILL_GRACE_SEC if sig == signal.SIGTERM else None)
+        if code is not None:
+            return code
+    return os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+
+
+def main():
+    _preload()
+    out = sys.stdout
+    out.write(json.dumps({"ready": True, "executable": sys.executable, "pid": os.getpid()}) + "\n")
+    out.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        req = json.loads(line)
+        t0 = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            _child(req)
+        # Lets the host kill the command's session too if this worker dies or hangs.
+        out.write(json.dumps({"id": req["id"], "started": pid}) + "\n")
+        out.flush()
+        code = _wait(pid, req.get("timeout"))
+        timed_out = code is None
+        if timed_out:
+            code = _kill(pid)
+        else:
+            # Reap anything the command left running in its session.
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        out.write(json.dumps({
+            "id": req["id"],
+            "exit_code": code,
+            "timed_out": timed_out,
+            "duration_sec": time.monotonic() - t0,
+        }) + "\n")
+        out.flush()
+
+
+if __name__ == "__main__":
+    main()
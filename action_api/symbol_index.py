@@ -0,0 +1,349 @@
+import ast
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .ignore import DEFAULT_IGNORE, IgnoreRules
+
+INDEX_VERSION = 1
+MAX_AGE_SEC = 30.0
+SIGNAL_FACTORIES = {"Signal", "pyqtSignal", "SignalInstance"}
+
+
+def _dotted(node: ast.AST) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        base = _dotted(node.value)
+        return f"{base}.{node.attr}" if base else node.attr
+    if isinstance(node, ast.Call):
+        return _dotted(node.func) + "()"
+    return ""
+
+
+class _Extractor(ast.NodeVisitor):
+    def __init__(self):
+        self.scope: List[str] = []
+        self.class_depth: List[bool] = []
+        self.symbols: List[dict] = []
+        self.imports: List[dict] = []
+        self.calls: List[list] = []
+        self.refs: List[list] = []
+        self.connections: List[dict] = []
+
+    def _define(self, node, kind: str):
+        qualname = ".".join(self.scope + [node.name])
+        self.symbols.append({
+            "name": node.name,
+            "qualname": qualname,
+            "kind": kind,
+            "node": type(node).__name__,
+            "line": node.lineno,
+            "end_line": node.end_lineno,
+        })
+        return qualname
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self._define(node, "class")
+        for base in node.bases:
+            self.visit(base)
+        for deco in node.decorator_list:
+            self.visit(deco)
+        self.scope.append(node.name)
+        self.class_depth.append(True)
+        for stmt in node.body:
+            self.visit(stmt)
+        self.scope.pop()
+        self.class_depth.pop()
+
+    def _function(self, node):
+        in_class = bool(self.class_depth and self.class_depth[-1])
+        self._define(node, "method" if in_class else "function")
+        for deco in node.decorator_list:
+            self.visit(deco)
+        self.visit(node.args)
+        self.scope.append(node.name)
+        self.class_depth.append(False)
+        for stmt in node.body:
+            self.visit(stmt)
+        self.scope.pop()
+        self.class_depth.pop()
+
+    visit_FunctionDef = _function
+    visit_AsyncFunctionDef = _function
+
+    def visit_Assign(self, node: ast.Assign):
+        # Class-level "clicked = Signal(int)" declares a Qt signal.
+        if self.class_depth and self.class_depth[-1] and isinstance(node.value, ast.Call):
+            if _dotted(node.value.func).split(".")[-1] in SIGNAL_FACTORIES:
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        self.symbols.append({
+                            "name": target.id,
+                            "qualname": ".".join(self.scope + [target.id]),
+                            "kind": "signal",
+                            "node": "Signal",
+                            "line": node.lineno,
+                            "end_line": node.end_lineno,
+                        })
+        self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            self.imports.append({"module": alias.name, "name": None, "alias": alias.asname, "line": node.lineno})
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        module = "." * node.level + (node.module or "")
+        for alias in node.names:
+            self.imports.append({"module": module, "name": alias.name, "alias": alias.asname, "line": node.lineno})
+            self.refs.append([alias.name, node.lineno])
+
+    def visit_Call(self, node: ast.Call):
+        callee = _dotted(node.func)
+        scope = ".".join(self.scope)
+        if callee:
+            self.calls.append([callee.split(".")[-1], callee, node.lineno, scope])
+        if isinstance(node.func, ast.Attribute) and node.func.attr in ("connect", "disconnect") and node.args:
+            self.connections.append({
+                "signal": _dotted(node.func.value),
+                "slot": _dotted(node.args[0]) or ast.unparse(node.args[0])[:80],
+                "kind": node.func.attr,
+                "line": node.lineno,
+                "scope": scope,
+            })
+        self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name):
+        self.refs.append([node.id, node.lineno])
+
+    def visit_Attribute(self, node: ast.Attribute):
+        self.refs.append([node.attr, node.lineno])
+        self.generic_visit(node)
+
+
+def extract(source: str) -> dict:
+    tree = ast.parse(source)
+    ex = _Extractor()
+    ex.visit(tree)
+    return {
+        "symbols": ex.symbols,
+        "imports": ex.imports,
+        "calls": ex.calls,
+        "refs": ex.refs,
+        "connections": ex.connections,
+    }
+
+
+class SymbolIndex:
+    """Incremental index of the Python files in a workspace.
+
+    Each file entry is keyed by the sha1 of its content; stat data only
+    decides whether a file needs re-hashing. Like SearchIndex, writes come in
+    through update() and the workspace is walked again only after
+    invalidate() or once max_age_sec has passed. The index is persisted as
+    JSON (by default in the run directory) so a resumed run starts warm.
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        index_path: Optional[str] = None,
+        ignore: Optional[List[str]] = None,
+        max_age_sec: float = MAX_AGE_SEC,
+    ):
+        self.root_dir = Path(root_dir).resolve()
+        self.index_path = Path(index_path) if index_path else None
+        self.rules = IgnoreRules(DEFAULT_IGNORE if ignore is None else ignore)
+        self.max_age_sec = max_age_sec
+        self.files: Dict[str, dict] = {}
+        self._walked_at: Optional[float] = None
+        self._invalidations = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if self.index_path is None or not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION:
+            self.files = data.get("files", {})
+
+    def _save(self):
+        if self.index_path is None:
+            return
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_name(f".{self.index_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "files": self.files}, f, ensure_ascii=False)
+        os.replace(tmp, self.index_path)
+
+    def _python_files(self) -> Dict[str, os.stat_result]:
+        found = {}
+        stack = [(str(self.root_dir), "")]
+        while stack:
+            path, rel_dir = stack.pop()
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if self.rules.ignored(rel, entry.name, is_dir):
+                            continue
+                        if is_dir:
+                            stack.append((entry.path, rel))
+                        elif entry.name.endswith(".py"):
+                            found[rel] = entry.stat()
+            except OSError:
+                continue
+        return found
+
+    def refresh(self) -> dict:
+        """Bring the index up to date; returns counts of parsed/unchanged/removed files."""
+        with self._lock:
+            started, invalidations = time.monotonic(), self._invalidations
+            stats = {"parsed": 0, "unchanged": 0, "removed": 0}
+            current = self._python_files()
+            for rel in list(self.files):
+                if rel not in current:
+                    del self.files[rel]
+                    stats["removed"] += 1
+            for rel, st in current.items():
+                stats[self._index_file(rel, st)] += 1
+            if stats["parsed"] or stats["removed"]:
+                self._save()
+            # Only a finished walk counts, and not if invalidate() came in while it ran.
+            if self._invalidations == invalidations:
+                self._walked_at = started
+            return stats
+
+    def _index_file(self, rel: str, st: os.stat_result) -> str:
+        entry = self.files.get(rel)
+        stamp = [st.st_size, st.st_mtime_ns]
+        if entry is not None and entry.get("stat") == stamp:
+            return "unchanged"
+        try:
+            raw = (self.root_dir / rel).read_bytes()
+        except OSError:
+            return "unchanged"
+        digest = hashlib.sha1(raw).hexdigest()
+        if entry is not None and entry.get("hash") == digest:
+            entry["stat"] = stamp
+            return "unchanged"
+        try:
+            data = extract(raw.decode("utf-8", errors="replace"))
+        except SyntaxError as e:
+            data = {"error": f"SyntaxError: {e.msg} (line {e.lineno})"}
+        self.files[rel] = {"hash": digest, "stat": stamp, **data}
+        return "parsed"
+
+    def invalidate(self):
+        """Something may have changed anywhere: the next query walks the workspace."""
+        self._invalidations += 1
+        self._walked_at = None
+
+    def ensure_fresh(self):
+        walked_at = self._walked_at
+        if walked_at is None or time.monotonic() - walked_at > self.max_age_sec:
+            self.refresh()
+
+    def _entries(self) -> List[tuple]:
+        # Queries may run in parallel with each other and with update().
+        with self._lock:
+            return sorted(self.files.items())
+
+    def update(self, paths: Iterable[str]):
+        """Re-index just these files (written, created or deleted by an action)."""
+        with self._lock:
+            changed = False
+            for path in paths:
+                try:
+                    rel = Path(path).resolve().relative_to(self.root_dir).as_posix()
+                except ValueError:
+                    continue
+                if not rel.endswith(".py") or self.rules.ignored(rel, rel.rsplit("/", 1)[-1], False):
+                    continue
+                try:
+                    st = os.stat(self.root_dir / rel)
+                except OSError:
+                    changed = self.files.pop(rel, None) is not None or changed
+                    continue
+                changed = self._index_file(rel, st) == "parsed" or changed
+            if changed:
+                self._save()
+
+    def file_symbols(self, rel: str) -> Optional[dict]:
+        self.ensure_fresh()
+        # One file is cheap to stat, so it is always current.
+        self.update([self.root_dir / rel])
+        with self._lock:
+            return self.files.get(rel)
+
+    def find_definition(self, name: str) -> List[dict]:
+        self.ensure_fresh()
+        out = []
+        for rel, entry in self._entries():
+            for sym in entry.get("symbols", []):
+                if sym["name"] == name or sym["qualname"] == name or sym["qualname"].endswith("." + name):
+                    out.append({"path": rel, **sym})
+            for imp in entry.get("imports", []):
+                if name in (imp["name"], imp["alias"]) or (imp["name"] is None and name == imp["module"]):
+                    out.append({"path": rel, "kind": "import", "qualname": name, "line": imp["line"], "module": imp["module"]})
+        return out
+
+    def find_references(self, name: str, limit: int = 200) -> dict:
+        self.ensure_fresh()
+        short = name.rsplit(".", 1)[-1]
+        refs, total = [], 0
+        for rel, entry in self._entries():
+            defined = {s["line"] for s in entry.get("symbols", []) if s["name"] == short}
+            lines = sorted({line for ref, line in entry.get("refs", []) if ref == short and line not in defined})
+            calls = {line for callee, _, line, _ in entry.get("calls", []) if callee == short}
+            for line in lines:
+                total += 1
+                if len(refs) < limit:
+                    refs.append({"path": rel, "line": line, "call": line in calls})
+        return {"references": refs, "total": total}
+
+    def outline(self) -> List[dict]:
+        self.ensure_fresh()
+        out = []
+        for rel, entry in self._entries():
+            out.append({
+                "path": rel,
+                "error": entry.get("error"),
+                "symbols": entry.get("symbols", []),
+                "imports": sorted({imp["module"] for imp in entry.get("imports", [])}),
+                "connections": entry.get("connections", []),
+            })
+        return out
+
+
+_indexes: Dict[tuple, SymbolIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_symbol_index(root_dir: str, index_dir: Optional[str] = None, ignore: Optional[List[str]] = None) -> SymbolIndex:
+    """One shared index per (workspace, index location)."""
+    key = (str(Path(root_dir).resolve()), str(index_dir) if index_dir else None)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index_path = Path(index_dir) / "symbol_index.json" if index_dir else None
+            index = _indexes[key] = SymbolIndex(root_dir, index_path, ignore)
+        return index
+
+
+def release_symbol_index(root_dir: str):
+    """Drop the shared indexes of a workspace (the persisted file stays)."""
+    root = str(Path(root_dir).resolve())
+    with _indexes_lock:
+        for key in [k for k in _indexes if k[0] == root]:
+            del _indexes[key]
@@ -0,0 +1,172 @@
+import argparse
+import functools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from action_api import ActionExecutor
+from code_executor import CodeExecutor
+from llm_stub_server import ScriptedLLMServer, build_scripts
+from log_manager import LogManager
+from manager_agent import ManagerAgent
+from react_agent import ReActAgent
+
+PHASES = ("llm", "parse", "action", "logging", "test_app")
+
+
+class PhaseTimer:
+    """Accumulates exclusive (self) time per phase; nested phases are subtracted from their parent."""
+
+    def __init__(self):
+        self.totals: dict[str, float] = defaultdict(float)
+        self.counts: dict[str, int] = defaultdict(int)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._patches = []
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def wrap(self, owner, name: str, phase: str):
+        original = getattr(owner, name)
+        timer = self
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            stack = timer._stack()
+            frame = [0.0]
+            stack.append(frame)
+            t0 = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - t0
+                stack.pop()
+                if stack:
+                    stack[-1][0] += elapsed
+                with timer._lock:
+                    timer.totals[phase] += elapsed - frame[0]
+                    timer.counts[phase] += 1
+
+        setattr(owner, name, timed)
+        self._patches.append((owner, name, original))
+
+    def install(self):
+        self.wrap(ReActAgent, "_next_response", "llm")
+        self.wrap(ManagerAgent, "_next_response", "llm")
+        self.wrap(ReActAgent, "_parse_response", "parse")
+        self.wrap(ManagerAgent, "_parse_response", "parse")
+        self.wrap(ActionExecutor, "_invoke", "action")
+        for name in ("append_chat", "append_image", "start_chat", "save_metadata", "info", "debug", "warning", "error"):
+            self.wrap(LogManager, name, "logging")
+        self.wrap(CodeExecutor, "test_app", "test_app")
+
+    def uninstall(self):
+        for owner, name, original in reversed(self._patches):
+            setattr(owner, name, original)
+        self._patches.clear()
+
+
+def run_benchmark(
+    scripts: dict[str, list[str]],
+    runs: int = 1,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    base_dir: str = None,
+) -> dict:
+    from main import run_task
+
+    server = ScriptedLLMServer(scripts, latency_ms=latency_ms, jitter_ms=jitter_ms).start()
+    os.environ["AEGIS_LLM_BASE_URL"] = server.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    base_dir = base_dir or tempfile.mkdtemp(prefix="aegis_bench_")
+
+    timer = PhaseTimer()
+    timer.install()
+    wall = 0.0
+    try:
+        for i in range(runs):
+            lm = LogManager(base_dir=base_dir, retention_days=1, logger_name=f"aegis_bench_{i}")
+            lm.logger.propagate = False
+            for h in list(lm.logger.handlers):
+                if not hasattr(h, "baseFilename"):
+                    lm.logger.removeHandler(h)
+            t0 = time.perf_counter()
+            run_task("Offline benchmark task", str(lm.code_dir), lm)
+            wall += time.perf_counter() - t0
+    finally:
+        timer.uninstall()
+        server.stop()
+
+    iterations = max(1, timer.counts["llm"])
+    accounted = sum(timer.totals[p] for p in PHASES)
+    report = {
+        "runs": runs,
+        "iterations": timer.counts["llm"],
+        "llm_requests": server.requests,
+        "wall_s": wall,
+        "harness_s": wall - timer.totals["llm"],
+        "phases": {
+            p: {
+                "total_s": timer.totals[p],
+                "calls": timer.counts[p],
+                "per_iteration_ms": timer.totals[p] * 1000.0 / iterations,
+            }
+            for p in PHASES
+        },
+        "other_s": max(0.0, wall - accounted),
+        "base_dir": base_dir,
+    }
+    report["harness_per_iteration_ms"] = report["harness_s"] * 1000.0 / iterations
+    return report
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"Runs: {report['runs']}  iterations: {report['iterations']}  llm requests: {report['llm_requests']}",
+        f"Wall: {report['wall_s']:.3f}s  harness (wall - llm): {report['harness_s']:.3f}s "
+        f"({report['harness_per_iteration_ms']:.2f} ms/iteration)",
+        "",
+        f"{'phase':<10} | {'total s':>9} | {'calls':>6} | {'ms/iter':>9}",
+        "-" * 44,
+    ]
+    for phase, row in report["phases"].items():
+        lines.append(f"{phase:<10} | {row['total_s']:>9.3f} | {row['calls']:>6} | {row['per_iteration_ms']:>9.2f}")
+    lines.append(f"{'other':<10} | {report['other_s']:>9.3f} |")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the agent harness")
+    parser.add_argument("--script", help="JSON file mapping agent name to a list of assistant replies")
+    parser.add_argument("--coder-dataset", help="replay a recorded coder conversation, e.g. genered_datasets/coder_dataset.json")
+    parser.add_argument("--manager-dataset", help="replay a recorded manager conversation")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--base-dir", help="where run directories are created (default: a temp dir)")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--max-harness-ms", type=float, help="exit non-zero if harness ms/iteration exceeds this")
+    args = parser.parse_args()
+
+    scripts = build_scripts(args.script, args.coder_dataset, args.manager_dataset)
+    report = run_benchmark(scripts, args.runs, args.latency_ms, args.jitter_ms, args.base_dir)
+    print(format_report(report))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_harness_ms is not None and report["harness_per_iteration_ms"] > args.max_harness_ms:
+        print(f"Harness overhead {report['harness_per_iteration_ms']:.2f} ms/iteration exceeds {args.max_harness_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+SNAPSHOT_IGNORE = {"build", "dist", "__pycache__"}
+
+
+def atomic_write_json(path: Path, data) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _skipped_dir(parts: tuple) -> bool:
+    return any(part in SNAPSHOT_IGNORE or part.startswith(".") for part in parts)
+
+
+def workspace_manifest(root: Path) -> dict:
+    """Cheap fingerprint of the workspace: size and mtime of every file."""
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SNAPSHOT_IGNORE and not d.startswith("."))
+        for name in sorted(filenames):
+            p = Path(dirpath) / name
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            manifest[str(p.relative_to(root))] = [st.st_size, st.st_mtime_ns]
+    return manifest
+
+
+def manifest_digest(manifest: dict) -> str:
+    return hashlib.sha1(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class WorkspaceManifest:
+    """workspace_manifest kept up to date incrementally.
+
+    Callers report what changed with mark(); only those paths are stat'ed
+    again. mark(None) (a change anywhere, e.g. a shell command) makes the
+    next current() walk the whole tree. The digest is reused while nothing
+    is marked.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._files: dict = {}
+        self._digest: Optional[str] = None
+        self._dirty: Optional[set] = None  # None: full walk needed
+        self._lock = threading.Lock()
+
+    def mark(self, paths: Optional[Iterable] = None):
+        with self._lock:
+            if paths is None or self._dirty is None:
+                self._dirty = None
+            else:
+                self._dirty.update(Path(p) for p in paths)
+            self._digest = None
+
+    def _rescan(self, path: Path):
+        try:
+            rel = path.resolve().relative_to(self.root)
+        except ValueError:
+            return
+        if not rel.parts:
+            self._files = workspace_manifest(self.root)
+            return
+        key = str(rel)
+        prefix = key + os.sep
+        for name in [n for n in self._files if n == key or n.startswith(prefix)]:
+            del self._files[name]
+        if path.is_dir():
+            if not _skipped_dir(rel.parts):
+                self._files.update({str(rel / name): v for name, v in workspace_manifest(path).items()})
+            return
+        try:
+            st = path.stat()
+        except OSError:
+            return
+        if not _skipped_dir(rel.parts[:-1]):
+            self._files[key] = [st.st_size, st.st_mtime_ns]
+
+    def current(self) -> tuple[dict, str]:
+        """(manifest, digest) of the workspace as of now."""
+        with self._lock:
+            if self._dirty is None:
+                self._files = workspace_manifest(self.root)
+            else:
+                for path in self._dirty:
+                    self._rescan(path)
+            self._dirty = set()
+            if self._digest is None:
+                self._digest = manifest_digest(self._files)
+            return self._files, self._digest
+
+
+class CheckpointStore:
+    """Atomic per-agent checkpoints inside a run directory.
+
+    Each agent state is one JSON file under <run_dir>/checkpoints, written
+    once per turn before the LLM request. The reply of that turn is saved on
+    its own (save_reply) so that it is not rewritten with the whole history;
+    load() folds it back in as an "awaiting" state. Workspace snapshots are
+    stored as manifests named by their digest and referenced from the agent
+    state.
+    """
+
+    def __init__(self, run_dir: str, workspace: Optional[str] = None):
+        self.run_dir = Path(run_dir).resolve()
+        self.dir = self.run_dir / "checkpoints"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.workspace = Path(workspace).resolve() if workspace else self.run_dir / "code"
+        self.manifest = WorkspaceManifest(self.workspace)
+        self._snapshots: set = set()
+        self._lock = threading.Lock()
+
+    def _path(self, agent_name: str) -> Path:
+        return self.dir / f"{agent_name}.json"
+
+    def _reply_path(self, agent_name: str) -> Path:
+        return self.dir / f"{agent_name}.reply.json"
+
+    def mark_changed(self, paths: Optional[Iterable] = None):
+        """Report workspace paths that were written (None: anything may have changed)."""
+        self.manifest.mark(paths)
+
+    def snapshot_workspace(self) -> str:
+        manifest, digest = self.manifest.current()
+        if digest not in self._snapshots:
+            path = self.dir / f"workspace_{digest[:16]}.json"
+            if not path.exists():
+                atomic_write_json(path, manifest)
+            self._snapshots.add(digest)
+        return digest
+
+    def load_snapshot(self, digest: str) -> Optional[dict]:
+        path = self.dir / f"workspace_{digest[:16]}.json"
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def workspace_drift(self, digest: str) -> list[str]:
+        """Paths whose size/mtime differ from the referenced snapshot."""
+        saved = self.load_snapshot(digest)
+        if saved is None:
+            return []
+        current = workspace_manifest(self.workspace)
+        return sorted(p for p in set(saved) | set(current) if saved.get(p) != current.get(p))
+
+    def save(self, agent_name: str, state: dict) -> None:
+        with self._lock:
+            state = {**state, "workspace_snapshot": self.snapshot_workspace(), "saved_at": time.time()}
+            atomic_write_json(self._path(agent_name), state)
+            self._reply_path(agent_name).unlink(missing_ok=True)
+
+    def save_reply(self, agent_name: str, iteration: int, reply: str) -> None:
+        """Record the LLM reply of the turn saved last, so a resumed run acts on it instead of asking again."""
+        with self._lock:
+            atomic_write_json(self._reply_path(agent_name), {"iteration": iteration, "reply": reply, "saved_at": time.time()})
+
+    def load(self, agent_name: str) -> Optional[dict]:
+        path = self._path(agent_name)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        reply_path = self._reply_path(agent_name)
+        if state.get("active") and reply_path.exists():
+            with open(reply_path, "r", encoding="utf-8") as f:
+                reply = json.load(f)
+            if reply.get("iteration") == state.get("iteration"):
+                state["messages"].append({"role": "assistant", "content": reply["reply"]})
+                state["awaiting"] = True
+                state["saved_at"] = reply["saved_at"]
+        return state
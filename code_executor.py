@@ -1,13 +1,16 @@
 import os
-import subprocess
-import time
 from pathlib import Path
+from typing import Optional
+
+from action_api.process import run_streaming
+from action_api.sandbox import Sandbox
 
 
 class CodeExecutor:
-    def __init__(self, workspace_path: str):
+    def __init__(self, workspace_path: str, sandbox: Optional[Sandbox] = None):
         self.workspace = Path(workspace_path).resolve()
         self.workspace.mkdir(parents=True, exist_ok=True)
+        self.sandbox = sandbox
 
     def test_app(self, script_name: str = "app.py") -> tuple[bool, str]:
         script_path = self.workspace / script_name
@@ -17,29 +20,18 @@ class CodeExecutor:
         env = os.environ.copy()
         env["QT_QPA_PLATFORM"] = "offscreen"
 
-        process = subprocess.Popen(
+        # Still running after 3 seconds counts as a successful start; the process group is then killed.
+        result = run_streaming(
             ["python", str(script_path)],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            encoding="utf-8",
-            env=env,
             cwd=str(self.workspace),
+            env=env,
+            timeout_sec=3,
+            sandbox=self.sandbox,
         )
-
-        time.sleep(3)
-        return_code = process.poll()
-
-        if return_code is None:
-            process.terminate()
-            try:
-                process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                process.kill()
+        if result.timed_out:
             return True, "App ran successfully for 3 seconds"
 
-        stdout, stderr = process.communicate()
-        error_message = stderr or stdout or f"Process exited with code {return_code}"
+        error_message = result.stderr.text() or result.stdout.text() or f"Process exited with code {result.return_code}"
         return False, error_message
 
     def package_to_exe(self, script_name: str = "app.py") -> tuple[bool, str]:
@@ -65,14 +57,9 @@ class CodeExecutor:
         ]
 
         try:
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                check=True,
-                encoding="utf-8",
-                cwd=str(self.workspace),
-            )
+            result = run_streaming(command, cwd=str(self.workspace), sandbox=self.sandbox)
+            if result.return_code != 0:
+                return False, f"PyInstaller error:\n{result.stderr.text()}"
 
             exe_name = f"{script_path.stem}.exe" if os.name == "nt" else script_path.stem
             exe_path = dist_path / exe_name
@@ -80,9 +67,7 @@ class CodeExecutor:
             if exe_path.exists():
                 return True, f"Success: {exe_path.absolute()}"
 
-            return False, f"Executable not found\n{result.stdout}\n{result.stderr}"
+            return False, f"Executable not found\n{result.stdout.text()}\n{result.stderr.text()}"
 
-        except subprocess.CalledProcessError as e:
-            return False, f"PyInstaller error:\n{e.stderr}"
         except Exception as e:
             return False, str(e)
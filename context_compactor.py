@@ -0,0 +1,110 @@
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+from response_parser import parse_action
+from tokens import estimate_content_tokens, estimate_tokens
+
+
+@dataclass
+class CompactionPolicy:
+    token_budget: int = 120_000
+    keep_head: int = 2
+    keep_recent: int = 12
+    stub_chars: int = 200
+    compact_assistant: bool = True
+
+
+class ContextCompactor:
+    """Builds the prompt view of a conversation that fits the policy's token budget.
+
+    The stored history is never modified. The system prompt, the task and the
+    most recent messages go out verbatim; older tool results are collapsed to
+    stubs first (oldest first), then long string parameters inside older
+    assistant actions, then older instructions.
+    """
+
+    def __init__(self, policy: Optional[CompactionPolicy] = None):
+        self.policy = policy or CompactionPolicy()
+        self.compactions = 0
+        self.tokens_saved = 0
+
+    def _stub_text(self, text: str, label: str) -> str:
+        head = text[: self.policy.stub_chars]
+        cut = head.rfind("\n")
+        if cut > 0:
+            head = head[:cut]
+        elided = len(text) - len(head)
+        return f"{head}\n[... {elided} chars of an earlier {label} elided]"
+
+    def _stub_content(self, content, label: str):
+        if isinstance(content, str):
+            return self._stub_text(content, label)
+        # Multimodal content: keep the text parts (stubbed) and drop old images.
+        parts = []
+        for part in content or []:
+            if part.get("type") == "text":
+                parts.append({"type": "text", "text": self._stub_text(part.get("text", ""), label)})
+        parts.append({"type": "text", "text": "[earlier screenshot elided]"})
+        return parts
+
+    def _compact_action(self, content) -> Optional[str]:
+        if not isinstance(content, str):
+            return None
+        parsed, _ = parse_action(content)
+        if not parsed:
+            return self._stub_text(content, "reply")
+        limit = self.policy.stub_chars
+
+        def shrink(value):
+            if isinstance(value, str) and len(value) > limit:
+                return f"{value[:limit]}[... {len(value) - limit} chars elided]"
+            if isinstance(value, dict):
+                return {k: shrink(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [shrink(v) for v in value]
+            return value
+
+        return "```json\n" + json.dumps(shrink(parsed), ensure_ascii=False, indent=2) + "\n```"
+
+    def compact(self, messages: list[dict], tool_results: set[int] = frozenset()) -> list[dict]:
+        budget = self.policy.token_budget
+        total = estimate_tokens(messages)
+        if total <= budget:
+            return messages
+
+        start = min(self.policy.keep_head, len(messages))
+        end = max(start, len(messages) - self.policy.keep_recent)
+        out = list(messages)
+        before = total
+
+        def replace(i: int, content) -> None:
+            nonlocal total
+            old = estimate_content_tokens(out[i].get("content"))
+            out[i] = {**out[i], "content": content}
+            total -= old - estimate_content_tokens(content)
+
+        passes = [
+            lambda i, m: i in tool_results,
+            lambda i, m: self.policy.compact_assistant and m["role"] == "assistant",
+            lambda i, m: m["role"] == "user" and i not in tool_results,
+        ]
+        for n, selected in enumerate(passes):
+            for i in range(start, end):
+                if total <= budget:
+                    break
+                m = out[i]
+                if not selected(i, m):
+                    continue
+                if n == 1:
+                    content = self._compact_action(m.get("content"))
+                    if content is None:
+                        continue
+                else:
+                    content = self._stub_content(m.get("content"), "tool result" if n == 0 else "message")
+                if estimate_content_tokens(content) < estimate_content_tokens(m.get("content")):
+                    replace(i, content)
+
+        self.compactions += 1
+        self.tokens_saved += before - total
+        return out
@@ -0,0 +1,106 @@
+import json
+from pathlib import Path
+from typing import Optional
+
+from response_parser import parse_action
+
+Span = Optional[tuple[int, Optional[int]]]
+
+
+def _contains(outer: Span, inner: Span) -> bool:
+    if outer is None:
+        return True
+    if inner is None:
+        return False
+    o_start, o_end = outer
+    i_start, i_end = inner
+    if o_start > i_start:
+        return False
+    if o_end is None:
+        return True
+    return i_end is not None and i_end <= o_end
+
+
+class FileVersionTracker:
+    """Remembers which history messages hold a copy of a workspace file.
+
+    When a newer read or write of the same path lands, older copies are
+    replaced in place with a one-line marker. Reads carry an optional line
+    span; an older read is only superseded by a newer read that covers it.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None):
+        self.root_dir = Path(root_dir) if root_dir else None
+        self._copies: dict[str, list[dict]] = {}
+        self.superseded = 0
+        self.chars_elided = 0
+
+    def _display(self, path: str) -> str:
+        if self.root_dir:
+            try:
+                return str(Path(path).relative_to(self.root_dir))
+            except ValueError:
+                pass
+        return path
+
+    def _marker(self, path: str) -> str:
+        return f"[superseded: older copy of {self._display(path)} removed; a newer read or write of it follows]"
+
+    def _elide(self, messages: list[dict], entry: dict, path: str):
+        i = entry["index"]
+        if i >= len(messages):
+            return
+        old = messages[i].get("content")
+        if entry["kind"] == "create":
+            # Re-read the current message: other copies in the same turn may already be elided.
+            parsed = parse_action(old)[0] if isinstance(old, str) else None
+            if not parsed:
+                return
+            slot = entry["slot"]
+            target = parsed["actions"][slot] if slot is not None else parsed
+            target["params"] = {**target.get("params", {}), "content": self._marker(path)}
+            new = "```json\n" + json.dumps(parsed, ensure_ascii=False, indent=2) + "\n```"
+        else:
+            new = self._marker(path)
+        if isinstance(old, str) and len(new) >= len(old):
+            return
+        messages[i] = {**messages[i], "content": new}
+        self.superseded += 1
+        self.chars_elided += (len(old) if isinstance(old, str) else 0) - len(new)
+
+    def record(
+        self,
+        messages: list[dict],
+        path: str,
+        index: int,
+        kind: str,
+        span: Span = None,
+        slot: Optional[int] = None,
+    ):
+        """kind is "read" (tool result holding content), "create" (assistant message
+        holding the full new content, at position slot of a multi-action turn) or
+        "edit" (a write that holds no copy)."""
+        kept = []
+        for entry in self._copies.get(path, []):
+            if entry["index"] == index and entry["slot"] == slot:
+                kept.append(entry)
+                continue
+            stale = kind in ("create", "edit") or _contains(span, entry["span"])
+            if stale:
+                self._elide(messages, entry, path)
+            else:
+                kept.append(entry)
+        if kind in ("read", "create"):
+            kept.append({"index": index, "kind": kind, "span": span, "slot": slot})
+        self._copies[path] = kept
+
+    def state(self) -> dict:
+        return {"copies": self._copies, "superseded": self.superseded, "chars_elided": self.chars_elided}
+
+    def load_state(self, state: dict):
+        self._copies = {
+            path: [{**e, "span": tuple(e["span"]) if e.get("span") else None} for e in entries]
+            for path, entries in state.get("copies", {}).items()
+        }
+        self.superseded = state.get("superseded", 0)
+        self.chars_elided = state.get("chars_elided", 0)
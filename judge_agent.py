@@ -1,15 +1,24 @@
 import base64
 import json
 import os
-import re
 import subprocess
 import time
 from pathlib import Path
 from typing import Optional, Tuple, Union
 
+from action_api import build_response_schema, object_schema, response_format
 from app_tester import AppTester
 from llm_client import LLMClient
 from log_manager import LogManager
+from response_parser import get_parse_stats, parse_action
+
+JUDGE_TOOL_PARAMS = {
+    "start": object_schema({}),
+    "click": object_schema({"widget_name": {"type": "string"}}, ["widget_name"]),
+    "type_text": object_schema({"text": {"type": "string"}}, ["text"]),
+    "run_command": object_schema({"cmd": {"type": "array", "items": {"type": "string"}}}, ["cmd"]),
+    "finish": object_schema({"score": {"type": "integer"}, "comment": {"type": "string"}}, ["score", "comment"]),
+}
 
 
 class JudgeAgent:
@@ -19,6 +28,7 @@ class JudgeAgent:
         llm_client: LLMClient,
         log_manager: LogManager,
         max_iterations: int = 200,
+        structured_output: bool = False,
     ):
         self.run_path = Path(run_path).resolve()
         self.llm = llm_client
@@ -27,6 +37,11 @@ class JudgeAgent:
         self.tester = AppTester()
         self.messages = []
         self.agent_name = "judge"
+        self.response_format = (
+            response_format(build_response_schema(JUDGE_TOOL_PARAMS, allow_multiple=False))
+            if structured_output
+            else None
+        )
 
     def _get_original_task(self) -> str:
         task_file = self.run_path / "logs" / "metadata" / "original_task"
@@ -80,13 +95,9 @@ Notes:
 """
 
     def _parse_response(self, text: str) -> Optional[dict]:
-        match = re.search(r"```json\s*(\{.*?\})\s*```", text, re.DOTALL)
-        if match:
-            try:
-                return json.loads(match.group(1))
-            except json.JSONDecodeError:
-                return None
-        return None
+        parsed, outcome = parse_action(text)
+        get_parse_stats().record(self.agent_name, self.llm.model, outcome, run=self.log.run_dir.name)
+        return parsed
 
     def _find_executable(self) -> str:
         app_path = self.run_path / "code" / "dist" / "app"
@@ -118,7 +129,11 @@ Notes:
             for iteration in range(self.max_iterations):
                 self.log.info(f"Iteration {iteration + 1}/{self.max_iterations}")
                 
-                response = self.llm.chat(self.messages)
+                response = self.llm.chat(
+                    self.messages,
+                    lane=f"{self.log.run_dir.name}/{self.agent_name}",
+                    response_format=self.response_format,
+                )
                 if not response:
                     self.log.error("Empty LLM response")
                     break
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+CACHE_MODES = ("off", "readwrite", "record", "replay")
+
+
+class CacheMiss(Exception):
+    pass
+
+
+class LLMCache:
+    """On-disk, content-addressed store of chat completions.
+
+    Modes: "readwrite" serves hits and stores misses, "record" always calls the
+    model and stores the answer, "replay" serves hits and raises CacheMiss otherwise.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024, mode: str = "readwrite"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.cache_dir = Path(cache_dir).resolve()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._sizes: dict[Path, int] = {}
+        self._total = 0
+        self._scan()
+
+    def _scan(self):
+        for p in self.cache_dir.glob("*/*.json"):
+            try:
+                size = p.stat().st_size
+            except OSError:
+                continue
+            self._sizes[p] = size
+            self._total += size
+
+    @staticmethod
+    def make_key(model: str, temperature: float, messages: list[dict], response_format: Optional[dict] = None) -> str:
+        request = {"model": model, "temperature": temperature, "messages": messages}
+        if response_format is not None:
+            request["response_format"] = response_format
+        payload = json.dumps(
+            request,
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    @property
+    def reads_enabled(self) -> bool:
+        return self.mode in ("readwrite", "replay")
+
+    @property
+    def writes_enabled(self) -> bool:
+        return self.mode in ("readwrite", "record")
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.reads_enabled:
+            return None
+        p = self._path(key)
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # mtime doubles as the LRU clock
+            os.utime(p)
+        except (OSError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            if self.mode == "replay":
+                raise CacheMiss(f"No cached response for key {key}")
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry["content"]
+
+    def put(self, key: str, content: str, model: str = ""):
+        if not self.writes_enabled or not content:
+            return
+        p = self._path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"model": model, "content": content}, ensure_ascii=False)
+        tmp = p.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, p)
+        size = p.stat().st_size
+        with self._lock:
+            self._total += size - self._sizes.get(p, 0)
+            self._sizes[p] = size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        target = self.max_bytes * 0.9
+        entries = []
+        for p in self._sizes:
+            try:
+                entries.append((p.stat().st_mtime_ns, p))
+            except OSError:
+                entries.append((0, p))
+        entries.sort()
+        for _, p in entries:
+            if self._total <= target:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                pass
+            self._total -= self._sizes.pop(p)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._sizes),
+                "bytes": self._total,
+            }
+
+
+def cache_from_env() -> Optional[LLMCache]:
+    cache_dir = os.environ.get("AEGIS_LLM_CACHE_DIR")
+    if not cache_dir:
+        return None
+    return LLMCache(
+        cache_dir,
+        max_bytes=int(os.environ.get("AEGIS_LLM_CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+        mode=os.environ.get("AEGIS_LLM_CACHE_MODE", "readwrite"),
+    )
@@ -1,23 +1,251 @@
-from openai import OpenAI, OpenAIError
+import asyncio
+import itertools
+import threading
+import time
+import weakref
+from typing import Iterator, Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI, OpenAIError
+
+from llm_cache import LLMCache
+from llm_hedging import Hedger
+from llm_scheduler import RequestScheduler, get_scheduler
+from metrics import MetricsRegistry, get_metrics, payload_bytes
+from tokens import estimate_tokens
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+
+_pool_lock = threading.Lock()
+_sync_pools: dict[tuple[int, int], httpx.Client] = {}
+_async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple[int, int], httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _limits(max_connections: int, max_keepalive: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=30.0,
+    )
+
+
+def shared_http_client(max_connections: int = 100, max_keepalive: int = 20) -> httpx.Client:
+    key = (max_connections, max_keepalive)
+    with _pool_lock:
+        client = _sync_pools.get(key)
+        if client is None or client.is_closed:
+            client = httpx.Client(limits=_limits(*key), timeout=httpx.Timeout(600.0, connect=10.0))
+            _sync_pools[key] = client
+        return client
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """One event loop on a daemon thread, for sync callers that need cancellable requests."""
+    global _loop
+    with _pool_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-async", daemon=True).start()
+        return _loop
+
+
+def shared_async_http_client(max_connections: int = 100, max_keepalive: int = 20) -> httpx.AsyncClient:
+    # httpx async pools are bound to the loop they were first used on, so keep one per loop.
+    loop = asyncio.get_running_loop()
+    key = (max_connections, max_keepalive)
+    with _pool_lock:
+        pools = _async_pools.setdefault(loop, {})
+        client = pools.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(limits=_limits(*key), timeout=httpx.Timeout(600.0, connect=10.0))
+            pools[key] = client
+        return client
 
 
 class LLMClient:
-    def __init__(self, api_key: str, model: str = "gemini-2.5-pro"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gemini-2.5-pro",
+        base_url: str = DEFAULT_BASE_URL,
+        temperature: float = 0.7,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        cache: Optional[LLMCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: int = 20,
+        metrics: Optional[MetricsRegistry] = None,
+    ):
         if not api_key:
             raise ValueError("API key required")
 
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.temperature = temperature
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.cache = cache
+        self.scheduler = scheduler or get_scheduler()
+        self.metrics = metrics or get_metrics()
+        self.hedger = self.stream_hedger = None
+        if hedge_percentile:
+            self.hedger = Hedger(model, percentile=hedge_percentile, min_samples=hedge_min_samples)
+            # Streams are hedged on time to first chunk, which has its own latency distribution.
+            self.stream_hedger = Hedger(f"{model}:first-chunk", percentile=hedge_percentile, min_samples=hedge_min_samples)
+
+        # Retries are owned by the scheduler so they respect the shared rate limits.
         self.client = OpenAI(
             api_key=api_key,
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+            base_url=base_url,
+            max_retries=0,
+            http_client=shared_http_client(max_connections, max_keepalive),
+        )
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+            weakref.WeakKeyDictionary()
         )
-        self.model = model
 
-    def chat(self, messages: list[dict]) -> str:
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model, messages=messages, temperature=0.7
+    def _async_client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,
+                http_client=shared_async_http_client(self.max_connections, self.max_keepalive),
             )
-            return response.choices[0].message.content
+            self._async_clients[loop] = client
+        return client
+
+    def _cache_key(self, messages: list[dict], response_format: Optional[dict] = None, streamed: bool = False) -> Optional[str]:
+        if self.cache is None or self.cache.mode == "off":
+            return None
+        # A stream the caller closed early holds only a prefix, so it must never answer chat().
+        model = f"{self.model}:stream" if streamed else self.model
+        return LLMCache.make_key(model, self.temperature, messages, response_format)
+
+    def _request(self, messages: list[dict], response_format: Optional[dict], **kwargs) -> dict:
+        request = {"model": self.model, "messages": messages, "temperature": self.temperature, **kwargs}
+        if response_format is not None:
+            request["response_format"] = response_format
+        return request
+
+    def _observe(self, lane: str, t0: float, messages: list[dict], content: Optional[str], cached: bool = False):
+        run, _, agent = lane.rpartition("/")
+        self.metrics.observe(
+            "llm",
+            f"{self.model}:cached" if cached else self.model,
+            (time.perf_counter() - t0) * 1000.0,
+            success=bool(content),
+            bytes_in=payload_bytes(messages),
+            bytes_out=payload_bytes(content),
+            agent=agent,
+            run=run,
+        )
+
+    def chat(self, messages: list[dict], lane: str = "default", response_format: Optional[dict] = None) -> str:
+        """Blocking front end for achat(), run on a shared background event loop.
+
+        Going through the loop keeps one request path, and lets a hedge loser be
+        cancelled: a blocking request cannot be stopped once sent, so it would keep
+        its scheduler slot and be billed for its tokens.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.achat(messages, lane, response_format), _background_loop())
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def achat(self, messages: list[dict], lane: str = "default", response_format: Optional[dict] = None) -> str:
+        t0 = time.perf_counter()
+        key = self._cache_key(messages, response_format)
+        if key:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                self._observe(lane, t0, messages, cached, cached=True)
+                return cached
+        client = self._async_client()
+
+        def create():
+            return client.chat.completions.create(**self._request(messages, response_format))
+
+        tokens = estimate_tokens(messages)
+        try:
+            if self.hedger:
+                # Each attempt, the backup included, goes through admission on its own.
+                response = await self.hedger.arun(lambda: self.scheduler.acall(lane, tokens, lambda: self.hedger.atimed(create)))
+            else:
+                response = await self.scheduler.acall(lane, tokens, create)
+            content = response.choices[0].message.content
+        except OpenAIError as e:
+            print(f"API error: {e}")
+            self._observe(lane, t0, messages, None)
+            return ""
+        self._observe(lane, t0, messages, content)
+        if key:
+            await asyncio.to_thread(self.cache.put, key, content, self.model)
+        return content
+
+    def stream_chat(self, messages: list[dict], lane: str = "default", response_format: Optional[dict] = None) -> Iterator[str]:
+        """Yield completion text as it arrives. Closing the generator aborts the request.
+
+        An API error after text was yielded is re-raised so the partial text is not taken as a reply.
+        """
+        t0 = time.perf_counter()
+        key = self._cache_key(messages, response_format, streamed=True)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._observe(lane, t0, messages, cached, cached=True)
+                yield cached
+                return
+        def open_stream():
+            # The first chunk is read here so that hedging covers time to first chunk.
+            stream = self.client.chat.completions.create(**self._request(messages, response_format, stream=True))
+            try:
+                return stream, next(iter(stream), None)
+            except BaseException:
+                stream.close()
+                raise
+
+        def admitted():
+            attempt = (lambda: self.stream_hedger.timed(open_stream)) if self.stream_hedger else open_stream
+            return self.scheduler.call(lane, tokens, attempt)
+
+        tokens = estimate_tokens(messages)
+        parts = []
+        stream = None
+        failed = False
+        try:
+            if self.stream_hedger:
+                stream, first = self.stream_hedger.run(admitted, discard=lambda late: late[0].close())
+            else:
+                stream, first = admitted()
+            for chunk in itertools.chain([first] if first is not None else [], stream):
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
         except OpenAIError as e:
             print(f"API error: {e}")
-            return ""
\ No newline at end of file
+            failed = True
+            if parts:
+                raise
+        finally:
+            if stream is not None:
+                stream.close()
+            self._observe(lane, t0, messages, None if failed else "".join(parts))
+            # An early close still leaves everything the caller consumed, so it is safe to replay to
+            # the same streaming reader; a failed stream is never cached.
+            if key and parts and not failed:
+                self.cache.put(key, "".join(parts), self.model)
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Awaitable, Callable, Optional
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, model: str, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        idx = min(len(samples) - 1, int(round(q * (len(samples) - 1))))
+        return samples[idx]
+
+
+_tracker = LatencyTracker()
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_hedge_pool_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    return _tracker
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+        return _hedge_pool
+
+
+def _discard_late(discard: Callable, future):
+    if future.exception() is None:
+        discard(future.result())
+
+
+class Hedger:
+    """Issues a duplicate request once the first one outlives the model's latency percentile."""
+
+    def __init__(
+        self,
+        model: str,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        min_delay: float = 1.0,
+        tracker: Optional[LatencyTracker] = None,
+    ):
+        self.model = model
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.tracker = tracker or _tracker
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def delay(self) -> Optional[float]:
+        p = self.tracker.percentile(self.model, self.percentile, self.min_samples)
+        if p is None:
+            return None
+        return max(p, self.min_delay)
+
+    def timed(self, fn: Callable):
+        """Run one request attempt, recording its latency."""
+        t0 = time.perf_counter()
+        result = fn()
+        self.tracker.record(self.model, time.perf_counter() - t0)
+        return result
+
+    async def atimed(self, fn: Callable[[], Awaitable]):
+        t0 = time.perf_counter()
+        result = await fn()
+        self.tracker.record(self.model, time.perf_counter() - t0)
+        return result
+
+    def run(self, fn: Callable, discard: Optional[Callable] = None):
+        """Race fn against a second call of fn started after delay().
+
+        fn is a whole attempt, admission included, so the backup is rate
+        limited and settled like any other request; it should time the request
+        itself with timed(). discard receives the loser's result if it still
+        arrives (e.g. to close a stream).
+        """
+        delay = self.delay()
+        if delay is None:
+            return fn()
+
+        pool = _pool()
+        primary = pool.submit(fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        backup = pool.submit(fn)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    if f is backup:
+                        self.hedge_wins += 1
+                    # A blocking request that already started cannot be interrupted;
+                    # its answer is dropped (or discarded) when it arrives.
+                    for p in pending:
+                        if not p.cancel() and discard is not None:
+                            p.add_done_callback(partial(_discard_late, discard))
+                    return f.result()
+                error = f.exception()
+        raise error
+
+    async def arun(self, fn: Callable[[], Awaitable]):
+        delay = self.delay()
+        if delay is None:
+            return await fn()
+
+        primary = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        backup = asyncio.ensure_future(fn())
+        pending = {primary, backup}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if t is backup:
+                            self.hedge_wins += 1
+                        return t.result()
+                    error = t.exception()
+            raise error
+        finally:
+            for t in pending:
+                t.cancel()
@@ -0,0 +1,244 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+
+from openai import APIConnectionError, APIStatusError, OpenAIError
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    def __init__(self, per_minute: Optional[float]):
+        self.capacity = float(per_minute) if per_minute else None
+        self.rate = self.capacity / 60.0 if self.capacity else None
+        self.level = self.capacity or 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if self.rate is None:
+            return
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.rate is None:
+            return 0.0
+        self._refill(now)
+        # Requests larger than the whole bucket only wait for a full bucket.
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, amount: float):
+        if self.rate is not None:
+            self.level -= amount
+
+
+class _Ticket:
+    __slots__ = ("lane", "tokens")
+
+    def __init__(self, lane: str, tokens: int):
+        self.lane = lane
+        self.tokens = tokens
+
+
+class RequestScheduler:
+    """Process-wide admission control for LLM requests.
+
+    Requests wait in per-lane queues that are served round-robin, so one busy
+    agent cannot starve the others, and are admitted only when both the
+    request and token buckets allow it.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._lanes: "OrderedDict[str, deque[_Ticket]]" = OrderedDict()
+        self.retries = 0
+        self.throttled = 0
+
+    def _enqueue(self, lane: str, tokens: int) -> _Ticket:
+        ticket = _Ticket(lane, tokens)
+        with self._cond:
+            self._lanes.setdefault(lane, deque()).append(ticket)
+        return ticket
+
+    def _discard(self, ticket: _Ticket):
+        with self._cond:
+            queue = self._lanes.get(ticket.lane)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._lanes[ticket.lane]
+                self._cond.notify_all()
+
+    def _try_grant(self, ticket: _Ticket) -> float:
+        # Caller holds self._cond. Returns 0 once granted, otherwise how long to wait.
+        head_lane, queue = next(iter(self._lanes.items()))
+        if queue[0] is not ticket:
+            return 0.05
+        now = time.monotonic()
+        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(ticket.tokens, now))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(ticket.tokens)
+        queue.popleft()
+        del self._lanes[head_lane]
+        if queue:
+            self._lanes[head_lane] = queue
+        self._cond.notify_all()
+        return 0.0
+
+    def acquire(self, lane: str, tokens: int):
+        ticket = self._enqueue(lane, tokens)
+        try:
+            with self._cond:
+                while True:
+                    wait = self._try_grant(ticket)
+                    if wait <= 0:
+                        return
+                    self._cond.wait(timeout=wait)
+        except BaseException:
+            self._discard(ticket)
+            raise
+
+    async def aacquire(self, lane: str, tokens: int):
+        ticket = self._enqueue(lane, tokens)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_grant(ticket)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(min(wait, 0.05))
+        except BaseException:
+            self._discard(ticket)
+            raise
+
+    def settle(self, estimated: int, response) -> None:
+        usage = getattr(response, "usage", None)
+        actual = getattr(usage, "total_tokens", None)
+        if actual is None:
+            return
+        with self._cond:
+            self.tokens.take(actual - estimated)
+
+    def retry_delay(self, error: OpenAIError, attempt: int) -> Optional[float]:
+        if isinstance(error, APIStatusError):
+            if error.status_code not in RETRYABLE_STATUS:
+                return None
+            retry_after = _retry_after(error.response)
+            if retry_after is not None:
+                return min(retry_after, self.max_delay) + random.uniform(0, self.base_delay)
+        elif not isinstance(error, APIConnectionError):
+            return None
+        backoff = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(backoff / 2, backoff)
+
+    def call(self, lane: str, tokens: int, fn: Callable):
+        attempt = 0
+        while True:
+            self.acquire(lane, tokens)
+            try:
+                response = fn()
+            except OpenAIError as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                self._record_retry(e)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self.settle(tokens, response)
+            return response
+
+    async def acall(self, lane: str, tokens: int, fn: Callable[[], Awaitable]):
+        attempt = 0
+        while True:
+            await self.aacquire(lane, tokens)
+            try:
+                response = await fn()
+            except OpenAIError as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                self._record_retry(e)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self.settle(tokens, response)
+            return response
+
+    def _record_retry(self, error: OpenAIError):
+        with self._cond:
+            self.retries += 1
+            if isinstance(error, APIStatusError) and error.status_code == 429:
+                self.throttled += 1
+
+
+def _retry_after(response) -> Optional[float]:
+    if response is None:
+        return None
+    headers = response.headers
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
+def get_scheduler() -> RequestScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(
+                requests_per_minute=_env_float("AEGIS_LLM_RPM"),
+                tokens_per_minute=_env_float("AEGIS_LLM_TPM"),
+            )
+        return _scheduler
+
+
+def configure_scheduler(**kwargs) -> RequestScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = RequestScheduler(**kwargs)
+        return _scheduler
@@ -0,0 +1,265 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+AGENT_MARKERS = {
+    "manager": "Project Manager Agent",
+    "coder": "autonomous programmer agent",
+    "judge": "QA Judge",
+}
+
+_APP_CODE = '''import time
+
+
+def main():
+    print("stub app started", flush=True)
+    time.sleep(10)
+
+
+if __name__ == "__main__":
+    main()
+'''
+
+
+def _action(thought: str, action: str, params: dict) -> str:
+    body = json.dumps({"thought": thought, "action": action, "params": params}, ensure_ascii=False, indent=2)
+    return f"```json\n{body}\n```"
+
+
+def default_scripts() -> dict[str, list[str]]:
+    return {
+        "manager": [
+            _action("Send the RPD to the coder.", "run_coder", {"instruction": "Create app.py that starts and stays alive."}),
+            _action("Inspect the result.", "get_project_tree", {}),
+            _action("Look at the symbols.", "get_all_symbols", {"file_path": "app.py"}),
+            _action("Read the implementation.", "open_file", {"file_path": "app.py", "start_line": 1, "end_line": 20}),
+        ],
+        "coder": [
+            _action("Look around first.", "get_file_tree", {"start_path": ".", "max_depth": 2}),
+            _action("Create the entry point.", "create_file", {"path": "app.py", "content": _APP_CODE}),
+            _action("Check what was written.", "read_file", {"path": "app.py"}),
+            _action("Tweak the message.", "edit_file", {"path": "app.py", "old": "stub app started", "new": "stub app running"}),
+            _action("Make sure it compiles.", "run_command", {"cmd": ["python", "-m", "py_compile", "app.py"]}),
+            _action("Try a snippet.", "run_ipython", {"code": "print(sum(range(10)))"}),
+            _action("Done.", "finish_task", {}),
+        ],
+    }
+
+
+def script_from_dataset(path: str) -> list[str]:
+    """Replays the longest recorded conversation of a dataset produced by dataset_collector."""
+    with open(path, "r", encoding="utf-8") as f:
+        examples = json.load(f)
+    if not examples:
+        return []
+    longest = max(examples, key=lambda e: len(e["x"]))
+    script = [m["content"] for m in longest["x"] if m["role"] == "assistant"]
+    y = longest["y_full"]
+    params = y.get("extra", {}).get("params", {})
+    script.append(_action(y.get("thought", ""), y["action"], params))
+    return script
+
+
+def load_scripts(path: str) -> dict[str, list[str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("Script file must map agent names to lists of assistant replies")
+    return {agent: [str(r) for r in replies] for agent, replies in data.items()}
+
+
+def detect_agent(messages: list[dict]) -> Optional[str]:
+    for m in messages:
+        if m.get("role") != "system":
+            continue
+        content = m.get("content")
+        if not isinstance(content, str):
+            continue
+        for agent, marker in AGENT_MARKERS.items():
+            if marker in content:
+                return agent
+    return None
+
+
+class ScriptedLLMServer:
+    """OpenAI-compatible chat completions endpoint that plays back scripted replies.
+
+    The reply for a request is chosen by the agent (detected from its system
+    prompt) and the number of assistant turns already in the conversation, so
+    the server itself is stateless. An exhausted script answers with empty content.
+    """
+
+    def __init__(
+        self,
+        scripts: Optional[dict[str, list[str]]] = None,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.scripts = scripts if scripts is not None else default_scripts()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/"
+
+    def reply_for(self, messages: list[dict]) -> str:
+        agent = detect_agent(messages)
+        script = self.scripts.get(agent or "", [])
+        turn = sum(1 for m in messages if m.get("role") == "assistant")
+        return script[turn] if turn < len(script) else ""
+
+    def _sleep(self):
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                content = server.reply_for(body.get("messages", []))
+                server._sleep()
+                if body.get("stream"):
+                    self._send_stream(body.get("model", "stub"), content)
+                else:
+                    self._send_json(body.get("model", "stub"), content)
+
+            def _send_json(self, model: str, content: str):
+                payload = json.dumps({
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": 0,
+                        "completion_tokens": len(content) // 4,
+                        "total_tokens": len(content) // 4,
+                    },
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_stream(self, model: str, content: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+                step = 64
+                try:
+                    for i in range(0, len(content), step):
+                        self._send_event({
+                            "id": chunk_id,
+                            "object": "chat.completion.chunk",
+                            "created": int(time.time()),
+                            "model": model,
+                            "choices": [{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}],
+                        })
+                    self._send_event({
+                        "id": chunk_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                    })
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client stopped reading early, which is what streaming agents do.
+                    pass
+                self.close_connection = True
+
+            def _send_event(self, event: dict):
+                self.wfile.write(b"data: " + json.dumps(event).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self) -> "ScriptedLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+def build_scripts(
+    script_path: Optional[str] = None,
+    coder_dataset: Optional[str] = None,
+    manager_dataset: Optional[str] = None,
+) -> dict[str, list[str]]:
+    scripts = load_scripts(script_path) if script_path else default_scripts()
+    if coder_dataset:
+        scripts["coder"] = script_from_dataset(coder_dataset)
+    if manager_dataset:
+        scripts["manager"] = script_from_dataset(manager_dataset)
+    return scripts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scripted OpenAI-compatible stand-in for offline runs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--script", help="JSON file mapping agent name to a list of assistant replies")
+    parser.add_argument("--coder-dataset", help="e.g. genered_datasets/coder_dataset.json")
+    parser.add_argument("--manager-dataset", help="e.g. genered_datasets/manager_dataset.json")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ScriptedLLMServer(
+        build_scripts(args.script, args.coder_dataset, args.manager_dataset),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Serving scripted LLM at {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
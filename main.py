@@ -1,74 +1,207 @@
+import argparse
 import os
 import json
 from pathlib import Path
+from typing import Optional
 
-from llm_client import LLMClient
+from checkpoint import CheckpointStore
+from llm_client import DEFAULT_BASE_URL, LLMClient
+from llm_cache import cache_from_env
 from react_agent import ReActAgent
 from manager_agent import ManagerAgent
 from code_executor import CodeExecutor
+from context_compactor import CompactionPolicy
 from log_manager import LogManager
-from action_api import ActionPolicy, PolicyConfig, ActionExecutor, build_registry, build_manager_registry
+from metrics import get_metrics
+from response_parser import get_parse_stats
+from result_renderer import ResultRenderer
+from action_api import ActionPolicy, PolicyConfig, ActionExecutor, PythonKernel, PythonSession, ResultCache, Sandbox, build_registry, build_manager_registry, release_indexes
 
 
-def run_task(task_description: str, workspace: str, log_manager: LogManager) -> bool:
-    workspace_path = Path(workspace).resolve()
-    workspace_path.mkdir(parents=True, exist_ok=True)
-
+def _build_agents(workspace_path: Path, log_manager: LogManager, checkpoints: CheckpointStore):
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         log_manager.error("OPENAI_API_KEY not found")
-        return False
+        return None
 
     policy_config = PolicyConfig(
         root_dir=workspace_path,
-        allowed_commands=["python", "pip"],
+        allowed_commands=[
+            "python", "python3", "pip", "pip3", "pytest", "PyInstaller", "pyinstaller",
+            "ls", "cat", "head", "tail", "wc", "grep", "find", "diff", "echo", "mkdir", "touch", "cp", "mv",
+        ],
         command_timeout_sec=30,
         max_read_bytes=1048576,
         max_write_bytes=1048576,
         allow_shell=False,
         max_output_chars=500000,
+        index_dir=log_manager.run_dir,
     )
 
     policy = ActionPolicy(policy_config)
-    registry = build_registry(policy)
-    executor = ActionExecutor(policy, registry)
-    code_executor = CodeExecutor(str(workspace_path))
-
-    llm_client = LLMClient(api_key=api_key)
+    metrics = get_metrics()
+    run_id = log_manager.run_dir.name
+    sandbox = Sandbox(policy_config.sandbox, name=run_id, metrics=metrics, labels={"run": run_id})
+    if sandbox.cgroup_error:
+        log_manager.warning(f"Sandbox: {sandbox.describe()}; per-run memory and process caps are off")
+    else:
+        log_manager.info(f"Sandbox: {sandbox.describe()}")
+    # One warm Python worker per run serves both agents' `python ...` commands.
+    session = PythonSession(str(workspace_path), sandbox=sandbox)
+    # run_ipython state lives in its own process per run, never in this one.
+    kernel = PythonKernel(str(workspace_path), sandbox=sandbox)
+    registry = build_registry(policy, sandbox=sandbox, session=session, kernel=kernel)
+    # Both agents work on the same files, so they share one read-only result cache.
+    memo = ResultCache()
+    executor = ActionExecutor(
+        policy, registry, metrics=metrics, labels={"agent": "coder", "run": run_id}, memo=memo,
+        on_write=checkpoints.mark_changed,
+    )
+    code_executor = CodeExecutor(str(workspace_path), sandbox=sandbox)
+
+    hedge_percentile = os.environ.get("AEGIS_LLM_HEDGE_PERCENTILE")
+    llm_client = LLMClient(
+        api_key=api_key,
+        base_url=os.environ.get("AEGIS_LLM_BASE_URL", DEFAULT_BASE_URL),
+        cache=cache_from_env(),
+        hedge_percentile=float(hedge_percentile) if hedge_percentile else None,
+        metrics=metrics,
+    )
     
+    renderer = ResultRenderer(str(workspace_path))
+    structured_output = os.environ.get("AEGIS_STRUCTURED_OUTPUT", "") == "1"
+
     coder_agent = ReActAgent(
         llm_client=llm_client,
         executor=executor,
         code_executor=code_executor,
         log_manager=log_manager,
         max_iterations=500,
-        agent_name="coder"
+        agent_name="coder",
+        compaction=CompactionPolicy(token_budget=120_000, keep_recent=16),
+        renderer=renderer,
+        structured_output=structured_output,
+        checkpoints=checkpoints,
     )
 
-    manager_registry = build_manager_registry(policy, coder_agent, code_executor)
-    manager_executor = ActionExecutor(policy, manager_registry)
+    manager_registry = build_manager_registry(policy, coder_agent, code_executor, sandbox=sandbox, session=session)
+    manager_executor = ActionExecutor(
+        policy, manager_registry, metrics=metrics, labels={"agent": "manager", "run": run_id}, memo=memo,
+        on_write=checkpoints.mark_changed,
+    )
 
     manager_agent = ManagerAgent(
         llm_client=llm_client,
         executor=manager_executor,
         log_manager=log_manager,
-        max_iterations=300
+        max_iterations=300,
+        compaction=CompactionPolicy(token_budget=80_000, keep_recent=10),
+        renderer=renderer,
+        structured_output=structured_output,
+        checkpoints=checkpoints,
     )
+    return manager_agent, coder_agent, renderer, sandbox, session, kernel
+
+
+def _release(
+    log_manager: LogManager,
+    workspace_path: Path,
+    renderer: ResultRenderer,
+    sandbox: Sandbox,
+    session: PythonSession,
+    kernel: PythonKernel,
+):
+    """Stop the run's workers, free its per-run state and save its stats; safe whatever state the run ended in."""
+    try:
+        kernel.close()
+        session.close()
+    finally:
+        sandbox.close()
+        release_indexes(str(workspace_path))
+    run_id = log_manager.run_dir.name
+    log_manager.save_metadata({
+        "python_session": {"starts": session.starts, "commands": session.commands},
+        "python_kernel": {"starts": kernel.starts},
+        "result_rendering": renderer.savings(),
+        "parse_outcomes": get_parse_stats().pop(run_id),
+    })
+    metrics = get_metrics()
+    metrics.dump(log_manager.run_dir / "metrics.json", run=run_id)
+    # The run's series live on in metrics.json; the process-wide registry must not grow with every run.
+    metrics.discard(run_id)
+
+
+def _report(log_manager: LogManager, success: bool) -> bool:
+    if not success:
+        log_manager.error("Manager Agent failed")
+        return False
+
+    log_manager.info("Manager Agent completed successfully.")
+    return True
+
+
+def run_task(task_description: str, workspace: str, log_manager: LogManager) -> bool:
+    workspace_path = Path(workspace).resolve()
+    workspace_path.mkdir(parents=True, exist_ok=True)
+
+    checkpoints = CheckpointStore(str(log_manager.run_dir), str(workspace_path))
+    agents = _build_agents(workspace_path, log_manager, checkpoints)
+    if agents is None:
+        return False
+    manager_agent, _, renderer, sandbox, session, kernel = agents
 
     log_manager.info(f"Task: {task_description}")
     log_manager.save_metadata({"original_task": task_description})
     
-    success = manager_agent.run(task_description)
+    try:
+        success = manager_agent.run(task_description)
+    finally:
+        _release(log_manager, workspace_path, renderer, sandbox, session, kernel)
+    return _report(log_manager, success)
+
+
+def resume_run(run_dir: str, log_manager: Optional[LogManager] = None) -> bool:
+    """Continue an interrupted run from the checkpoints in its run directory."""
+    if log_manager is None:
+        log_manager = LogManager(base_dir=str(Path(run_dir).resolve().parent), existing_run_dir=run_dir)
+    workspace_path = log_manager.code_dir.resolve()
+    checkpoints = CheckpointStore(str(log_manager.run_dir), str(workspace_path))
+
+    manager_state = checkpoints.load("manager")
+    if manager_state is None:
+        log_manager.error(f"No manager checkpoint in {run_dir}")
+        return False
 
-    if not success:
-        log_manager.error("Manager Agent failed")
+    agents = _build_agents(workspace_path, log_manager, checkpoints)
+    if agents is None:
         return False
+    manager_agent, coder_agent, renderer, sandbox, session, kernel = agents
 
-    log_manager.info("Manager Agent completed successfully.")
-    return True
+    try:
+        coder_state = checkpoints.load(coder_agent.agent_name)
+        if coder_state is not None:
+            coder_agent.restore(coder_state)
+
+        latest = max(filter(None, (manager_state, coder_state)), key=lambda s: s.get("saved_at", 0))
+        drift = checkpoints.workspace_drift(latest.get("workspace_snapshot", ""))
+        if drift:
+            log_manager.warning(f"Workspace changed since the last checkpoint: {', '.join(drift[:20])}")
+
+        log_manager.info(f"Resuming run {log_manager.run_dir}")
+        success = manager_agent.resume(manager_state)
+    finally:
+        _release(log_manager, workspace_path, renderer, sandbox, session, kernel)
+    return _report(log_manager, success)
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resume", metavar="RUN_DIR", help="continue an interrupted run from its checkpoints")
+    args = parser.parse_args()
+    if args.resume:
+        resume_run(args.resume)
+        return
+
     # dataset_path = Path("datasets/middle.json")
     dataset_path = Path("non_existent_file.json")
 
@@ -1,10 +1,18 @@
 from typing import Optional
 from pathlib import Path
-import json
 
+from openai import OpenAIError
+
+from checkpoint import CheckpointStore
+from context_compactor import CompactionPolicy, ContextCompactor
+from history_elision import FileVersionTracker
 from llm_client import LLMClient
 from log_manager import LogManager
-from action_api import ActionExecutor, ActionCall, ActionResult
+from result_renderer import ResultRenderer
+from action_api import ActionExecutor, ActionCall, ActionResult, describe_actions, registry_response_schema, response_format
+from response_parser import cut_after, get_parse_stats, parse_action, read_until_action, skipped_note, split_actions
+
+MAX_ACTIONS_PER_TURN = 10
 
 
 class ManagerAgent:
@@ -14,13 +22,28 @@ class ManagerAgent:
         executor: ActionExecutor,
         log_manager: LogManager,
         max_iterations: int = 50,
+        stream_responses: bool = True,
+        compaction: Optional[CompactionPolicy] = None,
+        renderer: Optional[ResultRenderer] = None,
+        structured_output: bool = False,
+        checkpoints: Optional[CheckpointStore] = None,
     ):
         self.llm = llm_client
         self.executor = executor
         self.log = log_manager
         self.max_iterations = max_iterations
+        self.stream_responses = stream_responses
+        self.compactor = ContextCompactor(compaction) if compaction else None
+        self.renderer = renderer or ResultRenderer(str(executor.policy.config.root_dir))
+        self.response_format = (
+            response_format(registry_response_schema(executor.registry)) if structured_output else None
+        )
         self.messages = []
+        self._tool_results: set[int] = set()
+        self.file_versions = FileVersionTracker(str(executor.policy.config.root_dir))
         self.agent_name = "manager"
+        self.checkpoints = checkpoints
+        self._request = None
 
     def _build_system_prompt(self) -> str:
         return """You are a Project Manager Agent. Your goal is to oversee the development of a software project.
@@ -37,12 +60,7 @@ Process:
 8. Finish the work.
 
 Available Tools:
-- run_coder: {"instruction": "text"} - Send instructions to the Coder Agent. First call should include the RPD. Subsequent calls should include feedback or new tasks.
-- finish_work: {} - Call this ONLY when the project is fully completed and verified. This will trigger the final build.
-- get_project_tree: {} - Get the file structure of the project.
-- get_all_symbols: {"file_path": "path/to/file.py"} - Get a list of classes and functions in a file with line numbers. 
-- open_file: {"file_path": "path/to/file.py", "start_line": 1, "end_line": 100} - Read file content. Parameters start_line and end_line are optional - use them to read only specific lines (e.g., start_line: 10, end_line: 50). If omitted, reads entire file.
-- terminal_command: {"cmd": ["command", "args"]} - Run a terminal command (use sparingly, e.g., for grep).
+""" + describe_actions(self.executor.registry) + """
 
 Response format (only JSON in ```json block):
 ```json
@@ -53,22 +71,55 @@ Response format (only JSON in ```json block):
 }
 ```
 
+To use several independent tools in one turn, replace "action" and "params" with a list:
+```json
+{
+  "thought": "reasoning",
+  "actions": [
+    {"action": "get_all_symbols", "params": {"file_path": "app.py"}},
+    {"action": "get_all_symbols", "params": {"file_path": "main_window.py"}}
+  ]
+}
+```
+Tools run in the listed order (read-only ones in parallel) and you get every result back in that order.
+
 Important:
 - Don't divide a project into phases. The project should be developed from the first call to the Coder. Your goal is to check if they forgot anything.
 - Use get_all_symbols + open_file with start_line and end_line to look at specific implementations and not clutter up your context.
+- Use project_outline, find_definition, find_references and search_code to see how files connect instead of grepping with terminal_command.
 - Main file MUST be named app.py (entry point)
 - requirements.txt do not needed.
 """
 
     def _parse_response(self, text: str) -> Optional[dict]:
-        import re
-        match = re.search(r"```json\s*(\{.*?\})\s*```", text, re.DOTALL)
-        if match:
+        parsed, outcome = parse_action(text)
+        get_parse_stats().record(self.agent_name, self.llm.model, outcome, run=self.log.run_dir.name)
+        return parsed
+
+    @property
+    def _lane(self) -> str:
+        return f"{self.log.run_dir.name}/{self.agent_name}"
+
+    def _append_tool_result(self, text: str):
+        self._tool_results.add(len(self.messages))
+        self.messages.append({"role": "user", "content": text})
+
+    def _prompt_messages(self) -> list[dict]:
+        if self.compactor is None:
+            return self.messages
+        return self.compactor.compact(self.messages, self._tool_results)
+
+    def _next_response(self) -> str:
+        messages = self._prompt_messages()
+        if self.stream_responses:
+            # Stop generating as soon as the action block is closed.
+            stream = self.llm.stream_chat(messages, lane=self._lane, response_format=self.response_format)
             try:
-                return json.loads(match.group(1))
-            except json.JSONDecodeError:
-                return None
-        return None
+                return read_until_action(stream)
+            except OpenAIError:
+                # The stream broke mid-reply; a partial reply is no reply, as with chat().
+                return ""
+        return self.llm.chat(messages, lane=self._lane, response_format=self.response_format)
 
     def run(self, user_request: str) -> bool:
         self.log.start_chat(self.agent_name)
@@ -78,20 +129,64 @@ Important:
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": f"User Request: {user_request}"},
         ]
+        self._tool_results = set()
+        self.file_versions = FileVersionTracker(str(self.executor.policy.config.root_dir))
         
         self.log.append_chat("system", system_prompt, self.agent_name)
         self.log.append_chat("user", user_request, self.agent_name)
+        self._request = user_request
+        return self._finish(self._loop(0, False))
+
+    def resume(self, state: dict) -> bool:
+        self.log.start_chat(self.agent_name)
+        if not state.get("active"):
+            self.log.info("Manager had already finished before the restart")
+            return bool(state.get("result"))
+        self._request = state["user_request"]
+        self.messages = state["messages"]
+        self._tool_results = set(state.get("tool_results", []))
+        self.file_versions = FileVersionTracker(str(self.executor.policy.config.root_dir))
+        self.file_versions.load_state(state.get("file_versions", {}))
+        self.log.info(f"Resuming manager at iteration {state['iteration'] + 1}")
+        return self._finish(self._loop(state["iteration"], state.get("awaiting", False)))
+
+    def _save_checkpoint(self, iteration: int, active: bool = True, result: Optional[bool] = None):
+        if self.checkpoints is None:
+            return
+        self.checkpoints.save(self.agent_name, {
+            "user_request": self._request,
+            "iteration": iteration,
+            "active": active,
+            "result": result,
+            "messages": self.messages,
+            "tool_results": sorted(self._tool_results),
+            "file_versions": self.file_versions.state(),
+        })
 
-        for iteration in range(self.max_iterations):
+    def _finish(self, success: bool) -> bool:
+        self._save_checkpoint(self.max_iterations, active=False, result=success)
+        return success
+
+    def _loop(self, start: int, awaiting: bool) -> bool:
+        for iteration in range(start, self.max_iterations):
             self.log.info(f"Manager Iteration {iteration + 1}/{self.max_iterations}")
-            
-            response = self.llm.chat(self.messages)
-            if not response:
-                self.log.error("Empty LLM response for Manager")
-                return False
+
+            if awaiting:
+                # The reply arrived before the restart (see CheckpointStore.save_reply); act on it instead of asking again.
+                response = self.messages.pop()["content"]
+                awaiting = False
+            else:
+                self._save_checkpoint(iteration)
+                response = self._next_response()
+                if not response:
+                    self.log.error("Empty LLM response for Manager")
+                    return False
 
             self.log.append_chat("assistant", response, self.agent_name)
             self.messages.append({"role": "assistant", "content": response})
+            if self.checkpoints is not None:
+                # Cheap: only the reply is written, the state was saved before the request.
+                self.checkpoints.save_reply(self.agent_name, iteration, response)
 
             parsed = self._parse_response(response)
             if not parsed:
@@ -102,27 +197,61 @@ Important:
                 continue
 
             thought = parsed.get("thought", "")
-            action_name = parsed.get("action")
-            params = parsed.get("params", {})
+            actions, skipped = self._extract_actions(parsed)
 
             self.log.info(f"Manager Thought: {thought}")
-            self.log.info(f"Manager Action: {action_name}({params})")
+            if not actions:
+                self.log.warning("No Manager action")
+                self.messages.append({"role": "user", "content": "Specify action" + (f". {skipped_note(skipped)}" if skipped else "")})
+                continue
+            for _, action_name, params in actions:
+                self.log.info(f"Manager Action: {action_name}({params})")
 
-            call = ActionCall(name=action_name, params=params)
-            result = self.executor.execute(call)
+            # Nothing listed after finish_work runs, as with the coder's finish_task.
+            requested = len(parsed["actions"]) if isinstance(parsed.get("actions"), list) else 1
+            actions = cut_after(actions, "finish_work", skipped)
 
-            result_text = self._format_result(result)
-            self.log.append_chat("system", result_text, self.agent_name)
-            self.messages.append({"role": "user", "content": result_text})
+            calls = [ActionCall(name=name, params=params) for _, name, params in actions]
+            results = self.executor.execute_many(calls)
+            finished = False
+            for n, ((slot, action_name, params), result) in enumerate(zip(actions, results), start=1):
+                result_text = self._format_result(action_name, result)
+                if requested > 1:
+                    result_text = f"Result {n if slot is None else slot + 1}/{requested} ({action_name}):\n{result_text}"
+                self.log.append_chat("system", result_text, self.agent_name)
+                result_index = len(self.messages)
+                self._append_tool_result(result_text)
+                if result.success:
+                    self._track_file_versions(action_name, params, result_index)
+                    finished = finished or action_name == "finish_work"
+            if skipped:
+                note = skipped_note(skipped)
+                self.log.warning(note)
+                self.log.append_chat("system", note, self.agent_name)
+                self._append_tool_result(note)
 
-            if action_name == "finish_work" and result.success:
+            if finished:
                 return True
 
         self.log.error("Manager max iterations reached")
         return False
 
-    def _format_result(self, result: ActionResult) -> str:
-        if result.success:
-            data_str = json.dumps(result.data, ensure_ascii=False, indent=2)
-            return f"Success:\n{data_str}"
-        return f"Error: {result.error}"
+    def _extract_actions(self, parsed: dict) -> tuple[list[tuple[Optional[int], str, dict]], list[str]]:
+        """(slot, name, params) per action, plus notes on skipped items."""
+        if isinstance(parsed.get("actions"), list):
+            return split_actions(parsed["actions"], MAX_ACTIONS_PER_TURN)
+        if parsed.get("action"):
+            return [(None, parsed["action"], parsed.get("params") or {})], []
+        return [], []
+
+    def _track_file_versions(self, action_name: str, params: dict, result_index: int):
+        if action_name != "open_file" or not params.get("file_path"):
+            return
+        path = str(self.executor.policy.resolve_path(params["file_path"]))
+        start = int(params.get("start_line") or 1)
+        end = params.get("end_line")
+        span = None if start <= 1 and end is None else (start, int(end) if end is not None else None)
+        self.file_versions.record(self.messages, path, result_index, "read", span=span)
+
+    def _format_result(self, action_name: str, result: ActionResult) -> str:
+        return self.renderer.render(action_name, result)
@@ -0,0 +1,225 @@
+import bisect
+import json
+import threading
+from typing import Optional
+
+# Upper bounds in milliseconds; the last bucket is +Inf.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+LABELS = ("kind", "name", "agent", "run")
+
+
+class Histogram:
+    def __init__(self, bounds: tuple = LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Linear interpolation inside the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+
+class Series:
+    def __init__(self):
+        self.latency = Histogram()
+        self.success = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def payload_bytes(value) -> int:
+    """Approximate serialized size without building the JSON string for nested payloads."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode("utf-8", errors="replace"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(k)) + payload_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_bytes(v) for v in value)
+    return len(str(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """Counters and latency histograms keyed by (kind, name, agent, run).
+
+    kind is "llm", "action" or "test_app", so a run's time splits into model
+    latency, tool work and app testing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: dict[tuple, Series] = {}
+
+    def observe(
+        self,
+        kind: str,
+        name: str,
+        duration_ms: float,
+        success: bool = True,
+        bytes_in: int = 0,
+        bytes_out: int = 0,
+        agent: str = "",
+        run: str = "",
+        cache_hit: Optional[bool] = None,
+    ):
+        key = (kind, name, agent, run)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = Series()
+            series.latency.observe(duration_ms)
+            if success:
+                series.success += 1
+            else:
+                series.errors += 1
+            series.bytes_in += bytes_in
+            series.bytes_out += bytes_out
+            if cache_hit is not None:
+                if cache_hit:
+                    series.cache_hits += 1
+                else:
+                    series.cache_misses += 1
+
+    def observe_action(
+        self,
+        name: str,
+        params: dict,
+        result,
+        elapsed_ms: float,
+        cache_hit: Optional[bool] = None,
+        agent: str = "",
+        run: str = "",
+    ):
+        self.observe(
+            "action",
+            name,
+            elapsed_ms,
+            result.success,
+            bytes_in=payload_bytes(params),
+            bytes_out=payload_bytes(result.data) + payload_bytes(result.error),
+            agent=agent,
+            run=run,
+            cache_hit=cache_hit,
+        )
+
+    def snapshot(self, run: Optional[str] = None) -> dict:
+        rows = []
+        by_kind: dict[str, dict] = {}
+        with self._lock:
+            for key, s in sorted(self._series.items()):
+                if run is not None and key[3] != run:
+                    continue
+                h = s.latency
+                rows.append({
+                    **dict(zip(LABELS, key)),
+                    "count": h.count,
+                    "success": s.success,
+                    "errors": s.errors,
+                    "p50_ms": round(h.quantile(0.50), 1),
+                    "p95_ms": round(h.quantile(0.95), 1),
+                    "p99_ms": round(h.quantile(0.99), 1),
+                    "max_ms": round(h.max, 1),
+                    "total_ms": round(h.sum, 1),
+                    "bytes_in": s.bytes_in,
+                    "bytes_out": s.bytes_out,
+                })
+                lookups = s.cache_hits + s.cache_misses
+                if lookups:
+                    rows[-1]["cache_hits"] = s.cache_hits
+                    rows[-1]["cache_hit_rate"] = round(s.cache_hits / lookups, 3)
+                kind = by_kind.setdefault(key[0], {"count": 0, "total_ms": 0.0})
+                kind["count"] += h.count
+                kind["total_ms"] = round(kind["total_ms"] + h.sum, 1)
+        return {"by_kind": by_kind, "series": rows}
+
+    def dump(self, path, run: Optional[str] = None):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(run), f, ensure_ascii=False, indent=2)
+
+    def discard(self, run: str):
+        """Forget a finished run's series so a long-lived process does not keep one set per run."""
+        with self._lock:
+            for key in [k for k in self._series if k[3] == run]:
+                del self._series[key]
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP aegis_calls_total Calls by outcome.",
+            "# TYPE aegis_calls_total counter",
+        ]
+        latency = [
+            "# HELP aegis_latency_ms Call latency in milliseconds.",
+            "# TYPE aegis_latency_ms histogram",
+        ]
+        quantiles = [
+            "# HELP aegis_latency_quantile_ms Latency percentiles estimated from the histogram.",
+            "# TYPE aegis_latency_quantile_ms gauge",
+        ]
+        cache = [
+            "# HELP aegis_cache_lookups_total Result cache lookups of read-only actions.",
+            "# TYPE aegis_cache_lookups_total counter",
+        ]
+        traffic = [
+            "# HELP aegis_bytes_total Payload bytes sent to (in) and returned by (out) a call.",
+            "# TYPE aegis_bytes_total counter",
+        ]
+        with self._lock:
+            for key, s in sorted(self._series.items()):
+                labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(LABELS, key))
+                lines.append(f'aegis_calls_total{{{labels},outcome="success"}} {s.success}')
+                lines.append(f'aegis_calls_total{{{labels},outcome="error"}} {s.errors}')
+                h = s.latency
+                cumulative = 0
+                for bound, n in zip(h.bounds + ("+Inf",), h.buckets):
+                    cumulative += n
+                    latency.append(f'aegis_latency_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+                latency.append(f"aegis_latency_ms_sum{{{labels}}} {h.sum:.3f}")
+                latency.append(f"aegis_latency_ms_count{{{labels}}} {h.count}")
+                for q in (0.5, 0.95, 0.99):
+                    quantiles.append(f'aegis_latency_quantile_ms{{{labels},quantile="{q}"}} {h.quantile(q):.3f}')
+                traffic.append(f'aegis_bytes_total{{{labels},direction="in"}} {s.bytes_in}')
+                traffic.append(f'aegis_bytes_total{{{labels},direction="out"}} {s.bytes_out}')
+                if s.cache_hits or s.cache_misses:
+                    cache.append(f'aegis_cache_lookups_total{{{labels},result="hit"}} {s.cache_hits}')
+                    cache.append(f'aegis_cache_lookups_total{{{labels},result="miss"}} {s.cache_misses}')
+        return "\n".join(lines + latency + quantiles + traffic + cache) + "\n"
+
+
+_metrics: Optional[MetricsRegistry] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+        return _metrics
@@ -1,11 +1,22 @@
-import json
-import re
+import time
 from typing import Optional
 
-from action_api import ActionCall, ActionExecutor, ActionResult
+from openai import OpenAIError
+
+from action_api import ActionCall, ActionExecutor, ActionResult, describe_actions, registry_response_schema, response_format
 from code_executor import CodeExecutor
+from checkpoint import CheckpointStore
+from context_compactor import CompactionPolicy, ContextCompactor
+from history_elision import FileVersionTracker
 from llm_client import LLMClient
 from log_manager import LogManager
+from metrics import get_metrics
+from result_renderer import ResultRenderer
+from response_parser import cut_after, get_parse_stats, parse_action, read_until_action, skipped_note, split_actions
+
+# How each file action leaves a copy of the file in the history.
+FILE_COPY_KINDS = {"read_file": "read", "create_file": "create", "edit_file": "edit"}
+MAX_ACTIONS_PER_TURN = 10
 
 
 class ReActAgent:
@@ -17,6 +28,11 @@ class ReActAgent:
         log_manager: LogManager,
         max_iterations: int = 30,
         agent_name: str = "coder",
+        stream_responses: bool = True,
+        compaction: Optional[CompactionPolicy] = None,
+        renderer: Optional[ResultRenderer] = None,
+        structured_output: bool = False,
+        checkpoints: Optional[CheckpointStore] = None,
     ):
         self.llm = llm_client
         self.executor = executor
@@ -24,19 +40,24 @@ class ReActAgent:
         self.log = log_manager
         self.max_iterations = max_iterations
         self.agent_name = agent_name
+        self.stream_responses = stream_responses
+        self.compactor = ContextCompactor(compaction) if compaction else None
+        self.renderer = renderer or ResultRenderer(str(executor.policy.config.root_dir))
+        self.response_format = (
+            response_format(registry_response_schema(executor.registry)) if structured_output else None
+        )
         self.messages = []
+        self._tool_results: set[int] = set()
+        self.file_versions = FileVersionTracker(str(executor.policy.config.root_dir))
+        self.checkpoints = checkpoints
+        self._task = None
+        self._resume_state: Optional[dict] = None
 
     def _build_system_prompt(self) -> str:
         return """You are an autonomous programmer agent. You create Python programs with GUI (PySide6).
 
 Available actions:
-- read_file: {"path": "file.py"}
-- create_file: {"path": "file.py", "content": "code"}
-- edit_file: {"path": "file.py", "old": "old text", "new": "new text"}
-- get_file_tree: {"start_path": ".", "max_depth": 2} - show file structure
-- run_command: {"cmd": ["command", "args"]} - any terminal command
-- run_ipython: {"code": "print('hello')"} - execute python code in interactive environment (state is preserved)
-- finish_task: {} - finish task execution and run tests
+""" + describe_actions(self.executor.registry) + """
 
 Response format (only JSON in ```json block):
 ```json
@@ -47,12 +68,24 @@ Response format (only JSON in ```json block):
 }
 ```
 
+To run several independent actions in one turn, replace "action" and "params" with a list:
+```json
+{
+  "thought": "what I am doing and why",
+  "actions": [
+    {"action": "read_file", "params": {"path": "a.py"}},
+    {"action": "read_file", "params": {"path": "b.py"}}
+  ]
+}
+```
+Actions run in the listed order (read-only ones in parallel) and you get every result back in that order.
+
 Requirements:
 - Main file MUST be named app.py (entry point)
 - You can create any project structure, as many files as needed
 - Use PySide6 for GUI
 - Main file app.py must contain if __name__ == "__main__": and application launch
-- Only one "action" field per message.
+- Use either a single "action" or an "actions" list per message. Put finish_task last.
 
 Important:
 - DO NOT launch the application manually via run_command
@@ -63,39 +96,104 @@ Important:
 - Do not use placeholders TODO and others, write all the code at once."""
 
     def _parse_response(self, text: str) -> Optional[dict]:
-        match = re.search(r"```json\s*(\{.*?\})\s*```", text, re.DOTALL)
-        if match:
+        parsed, outcome = parse_action(text)
+        get_parse_stats().record(self.agent_name, self.llm.model, outcome, run=self.log.run_dir.name)
+        return parsed
+
+    @property
+    def _lane(self) -> str:
+        return f"{self.log.run_dir.name}/{self.agent_name}"
+
+    def _append_tool_result(self, text: str):
+        self._tool_results.add(len(self.messages))
+        self.messages.append({"role": "user", "content": text})
+
+    def _prompt_messages(self) -> list[dict]:
+        if self.compactor is None:
+            return self.messages
+        return self.compactor.compact(self.messages, self._tool_results)
+
+    def _next_response(self) -> str:
+        messages = self._prompt_messages()
+        if self.stream_responses:
+            # Stop generating as soon as the action block is closed.
+            stream = self.llm.stream_chat(messages, lane=self._lane, response_format=self.response_format)
             try:
-                return json.loads(match.group(1))
-            except json.JSONDecodeError:
-                return None
-        return None
+                return read_until_action(stream)
+            except OpenAIError:
+                # The stream broke mid-reply; a partial reply is no reply, as with chat().
+                return ""
+        return self.llm.chat(messages, lane=self._lane, response_format=self.response_format)
+
+    def _save_checkpoint(self, iteration: int, active: bool = True, result: Optional[bool] = None):
+        if self.checkpoints is None:
+            return
+        self.checkpoints.save(self.agent_name, {
+            "task": self._task,
+            "iteration": iteration,
+            "active": active,
+            "result": result,
+            "messages": self.messages,
+            "tool_results": sorted(self._tool_results),
+            "file_versions": self.file_versions.state(),
+        })
+
+    def restore(self, state: dict):
+        self.messages = state["messages"]
+        self._tool_results = set(state.get("tool_results", []))
+        self.file_versions.load_state(state.get("file_versions", {}))
+        self._resume_state = state
 
     def run(self, task: str) -> bool:
         self.log.start_chat(self.agent_name)
 
-        if not self.messages:
-            system_prompt = self._build_system_prompt()
-            self.messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Task: {task}"},
-            ]
-            self.log.append_chat("system", system_prompt, self.agent_name)
-            self.log.append_chat("user", task, self.agent_name)
+        resume, self._resume_state = self._resume_state, None
+        if resume and resume.get("task") == task:
+            if not resume.get("active"):
+                self.log.info(f"{self.agent_name} had already finished this task before the restart")
+                return bool(resume.get("result"))
+            start, awaiting = resume["iteration"], resume.get("awaiting", False)
+            self.log.info(f"Resuming {self.agent_name} at iteration {start + 1}")
         else:
-            self.messages.append({"role": "user", "content": task})
-            self.log.append_chat("user", task, self.agent_name)
+            if not self.messages:
+                system_prompt = self._build_system_prompt()
+                self.messages = [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"Task: {task}"},
+                ]
+                self.log.append_chat("system", system_prompt, self.agent_name)
+                self.log.append_chat("user", task, self.agent_name)
+            else:
+                self.messages.append({"role": "user", "content": task})
+                self.log.append_chat("user", task, self.agent_name)
+            start, awaiting = 0, False
+
+        self._task = task
+        success = self._loop(start, awaiting)
+        self._save_checkpoint(self.max_iterations, active=False, result=success)
+        return success
 
-        for iteration in range(self.max_iterations):
+    def _loop(self, start: int, awaiting: bool) -> bool:
+        for iteration in range(start, self.max_iterations):
             self.log.info(f"Iteration {iteration + 1}/{self.max_iterations}")
 
-            response = self.llm.chat(self.messages)
-            if not response:
-                self.log.error("Empty LLM response")
-                return False
+            if awaiting:
+                # The reply arrived before the restart (see CheckpointStore.save_reply); act on it instead of asking again.
+                response = self.messages.pop()["content"]
+                awaiting = False
+            else:
+                self._save_checkpoint(iteration)
+                response = self._next_response()
+                if not response:
+                    self.log.error("Empty LLM response")
+                    return False
 
             self.log.append_chat("assistant", response, self.agent_name)
+            assistant_index = len(self.messages)
             self.messages.append({"role": "assistant", "content": response})
+            if self.checkpoints is not None:
+                # Cheap: only the reply is written, the state was saved before the request.
+                self.checkpoints.save_reply(self.agent_name, iteration, response)
 
             parsed = self._parse_response(response)
             if not parsed:
@@ -106,23 +204,57 @@ Important:
                 continue
 
             thought = parsed.get("thought", "")
-            action_name = parsed.get("action")
-            params = parsed.get("params", {})
+            actions, skipped = self._extract_actions(parsed)
 
-            if not action_name:
-                if parsed.get("done"):
-                     action_name = "finish_task"
-                else:
-                    self.log.warning("No action")
-                    self.messages.append({"role": "user", "content": "Specify action"})
-                    continue
+            if not actions:
+                self.log.warning("No action")
+                self.messages.append({"role": "user", "content": "Specify action" + (f". {skipped_note(skipped)}" if skipped else "")})
+                continue
 
             self.log.info(f"Thought: {thought}")
-            self.log.info(f"Action: {action_name}({params})")
+            for _, action_name, params in actions:
+                self.log.info(f"Action: {action_name}({params})")
+
+            requested = len(parsed["actions"]) if isinstance(parsed.get("actions"), list) else 1
+            actions = cut_after(actions, "finish_task", skipped)
+            finishing = actions[-1][1] == "finish_task"
+            batch = actions[:-1] if finishing else actions
+            if batch:
+                calls = [ActionCall(name=name, params=params) for _, name, params in batch]
+                results = self.executor.execute_many(calls)
+                for n, ((slot, action_name, params), result) in enumerate(zip(batch, results), start=1):
+                    result_text = self._format_result(action_name, result)
+                    if requested > 1:
+                        result_text = f"Result {n if slot is None else slot + 1}/{requested} ({action_name}):\n{result_text}"
+                    self.log.append_chat("system", result_text, self.agent_name)
+                    result_index = len(self.messages)
+                    self._append_tool_result(result_text)
+
+                    if not result.success:
+                        self.log.warning(f"Failed: {result.error}")
+                    else:
+                        # slot indexes the raw "actions" list, which history elision rewrites.
+                        self._track_file_versions(action_name, params, result, assistant_index, result_index, slot)
+
+            if skipped:
+                self._report_skipped(skipped)
 
-            if action_name == "finish_task":
+            if finishing:
                 self.log.info("Agent says finish_task, testing app...")
+                t0 = time.perf_counter()
                 test_success, test_message = self.code_executor.test_app("app.py")
+                if self.checkpoints is not None:
+                    # The app may have written files of its own.
+                    self.checkpoints.mark_changed()
+                get_metrics().observe(
+                    "test_app",
+                    "app.py",
+                    (time.perf_counter() - t0) * 1000.0,
+                    test_success,
+                    bytes_out=len(test_message or ""),
+                    agent=self.agent_name,
+                    run=self.log.run_dir.name,
+                )
 
                 if test_success:
                     self.log.info("Test passed")
@@ -130,29 +262,43 @@ Important:
 
                 self.log.warning(f"Test failed: {test_message}")
                 self.log.append_chat("system", f"Test failed:\n{test_message}", self.agent_name)
-                self.messages.append(
-                    {
-                        "role": "user",
-                        "content": f"Application failed. Error:\n{test_message}\n\nFix it.",
-                    }
-                )
-                continue
-            
-            call = ActionCall(name=action_name, params=params)
-            result = self.executor.execute(call)
-
-            result_text = self._format_result(result)
-            self.log.append_chat("system", result_text, self.agent_name)
-            self.messages.append({"role": "user", "content": result_text})
-
-            if not result.success:
-                self.log.warning(f"Failed: {result.error}")
+                self._append_tool_result(f"Application failed. Error:\n{test_message}\n\nFix it.")
 
         self.log.error("Max iterations reached")
         return False
 
-    def _format_result(self, result: ActionResult) -> str:
-        if result.success:
-            data_str = json.dumps(result.data, ensure_ascii=False, indent=2)
-            return f"Success:\n{data_str}"
-        return f"Error: {result.error}"
+    def _extract_actions(self, parsed: dict) -> tuple[list[tuple[Optional[int], str, dict]], list[str]]:
+        """(slot, name, params) per action, plus notes on skipped items.
+
+        slot is the item's index in parsed["actions"], None for a single action.
+        """
+        if isinstance(parsed.get("actions"), list):
+            return split_actions(parsed["actions"], MAX_ACTIONS_PER_TURN)
+        if parsed.get("action"):
+            return [(None, parsed["action"], parsed.get("params") or {})], []
+        if parsed.get("done"):
+            return [(None, "finish_task", {})], []
+        return [], []
+
+    def _report_skipped(self, skipped: list[str]):
+        note = skipped_note(skipped)
+        self.log.warning(note)
+        self.log.append_chat("system", note, self.agent_name)
+        self._append_tool_result(note)
+
+    def _track_file_versions(
+        self, action_name: str, params: dict, result: ActionResult, assistant_index: int, result_index: int, slot: Optional[int]
+    ):
+        if action_name == "apply_patch":
+            for path in (result.data or {}).get("files", {}):
+                self.file_versions.record(self.messages, path, assistant_index, "edit")
+            return
+        kind = FILE_COPY_KINDS.get(action_name)
+        if not kind or not params.get("path"):
+            return
+        path = str(self.executor.policy.resolve_path(params["path"]))
+        index = result_index if kind == "read" else assistant_index
+        self.file_versions.record(self.messages, path, index, kind, slot=slot)
+
+    def _format_result(self, action_name: str, result: ActionResult) -> str:
+        return self.renderer.render(action_name, result)
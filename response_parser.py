@@ -0,0 +1,206 @@
+import json
+import re
+import threading
+from collections import defaultdict
+from typing import Iterator, Optional
+
+from action_api.schema import RESPONSE_KEY
+
+_JSON_BLOCK_RE = re.compile(r"```json\s*(\{.*?\})\s*```", re.DOTALL)
+_ANY_FENCE_RE = re.compile(r"```[A-Za-z]*\s*(\{.*\})\s*```", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_FENCE_OPEN = "```json"
+_FENCE = "```"
+
+
+def parse_json_block(text: str) -> Optional[dict]:
+    match = _JSON_BLOCK_RE.search(text)
+    if match:
+        try:
+            return json.loads(match.group(1))
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+def _loads_object(text: str, lenient: bool = False) -> Optional[dict]:
+    candidates = [text]
+    if lenient:
+        candidates.append(_TRAILING_COMMA_RE.sub(r"\1", text))
+    for candidate in candidates:
+        try:
+            obj = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(obj, dict):
+            return obj
+    return None
+
+
+def _first_object(text: str) -> Optional[dict]:
+    decoder = json.JSONDecoder()
+    idx = text.find("{")
+    while idx >= 0:
+        try:
+            obj, _ = decoder.raw_decode(text, idx)
+        except json.JSONDecodeError:
+            obj = None
+        if isinstance(obj, dict) and ("action" in obj or "actions" in obj or RESPONSE_KEY in obj):
+            return obj
+        idx = text.find("{", idx + 1)
+    return None
+
+
+def _parse(text: str) -> tuple[Optional[dict], str]:
+    parsed = parse_json_block(text)
+    if parsed is not None:
+        return parsed, "strict"
+    stripped = text.strip()
+    parsed = _loads_object(stripped)
+    if parsed is not None:
+        return parsed, "strict"
+
+    match = _ANY_FENCE_RE.search(text)
+    if match:
+        parsed = _loads_object(match.group(1), lenient=True)
+        if parsed is not None:
+            return parsed, "recovered"
+    parsed = _loads_object(stripped, lenient=True) or _first_object(text)
+    if parsed is not None:
+        return parsed, "recovered"
+    return None, "failed"
+
+
+def parse_action(text: str) -> tuple[Optional[dict], str]:
+    """Returns (parsed, outcome) where outcome is "strict", "recovered" or "failed".
+
+    "strict" covers the documented ```json block and a bare JSON object (what
+    structured-output mode returns); "recovered" means a fallback was needed.
+    """
+    parsed, outcome = _parse(text)
+    # Structured-output mode wraps the reply in an envelope object (see build_response_schema).
+    if parsed is not None and set(parsed) == {RESPONSE_KEY} and isinstance(parsed[RESPONSE_KEY], dict):
+        parsed = parsed[RESPONSE_KEY]
+    return parsed, outcome
+
+
+def split_actions(items: list, limit: int) -> tuple[list[tuple[int, str, dict]], list[str]]:
+    """(index, name, params) of the well-formed items among the first `limit`, plus notes on the ones left out."""
+    actions, malformed = [], 0
+    for i, item in enumerate(items[:limit]):
+        if isinstance(item, dict) and item.get("action"):
+            actions.append((i, item["action"], item.get("params") or {}))
+        else:
+            malformed += 1
+    skipped = []
+    if malformed:
+        skipped.append(f'{malformed} malformed item(s) (each needs an "action")')
+    if len(items) > limit:
+        skipped.append(f"{len(items) - limit} action(s) over the {limit}-per-turn limit")
+    return actions, skipped
+
+
+def cut_after(actions: list[tuple], finish: str, skipped: list[str]) -> list[tuple]:
+    """Drop what follows the first `finish` action, noting it in skipped."""
+    names = [a[1] for a in actions]
+    if finish not in names:
+        return actions
+    end = names.index(finish) + 1
+    if end < len(actions):
+        skipped.append(f"{len(actions) - end} action(s) after {finish} ({', '.join(names[end:])})")
+    return actions[:end]
+
+
+def skipped_note(skipped: list[str]) -> str:
+    return f"Skipped {'; '.join(skipped)}. These did not run."
+
+
+class ParseStats:
+    """Parse outcomes per run, agent and model; a run's counts are dropped once reported."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: dict[tuple[str, str, str], dict[str, int]] = defaultdict(
+            lambda: {"strict": 0, "recovered": 0, "failed": 0}
+        )
+
+    def record(self, agent: str, model: str, outcome: str, run: str = ""):
+        with self._lock:
+            self._counts[(run, agent, model)][outcome] += 1
+
+    def snapshot(self, run: Optional[str] = None) -> dict:
+        with self._lock:
+            return {
+                f"{agent}/{model}": dict(c)
+                for (r, agent, model), c in self._counts.items()
+                if run is None or r == run
+            }
+
+    def pop(self, run: str) -> dict:
+        """Snapshot of one run's counts, removing them."""
+        with self._lock:
+            keys = [k for k in self._counts if k[0] == run]
+            return {f"{agent}/{model}": self._counts.pop((r, agent, model)) for r, agent, model in keys}
+
+
+_parse_stats = ParseStats()
+
+
+def get_parse_stats() -> ParseStats:
+    return _parse_stats
+
+
+class JsonBlockExtractor:
+    """Incrementally watches streamed text for the first complete ```json block."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._body_start: Optional[int] = None
+        self._scan_from = 0
+        self.block: Optional[dict] = None
+
+    @property
+    def text(self) -> str:
+        return self._buffer
+
+    def feed(self, chunk: str) -> bool:
+        if self.block is not None:
+            return True
+        self._buffer += chunk
+
+        if self._body_start is None:
+            idx = self._buffer.find(_FENCE_OPEN, self._scan_from)
+            if idx < 0:
+                self._scan_from = max(0, len(self._buffer) - len(_FENCE_OPEN) + 1)
+                return False
+            self._body_start = idx + len(_FENCE_OPEN)
+            self._scan_from = self._body_start
+
+        while True:
+            idx = self._buffer.find(_FENCE, self._scan_from)
+            if idx < 0:
+                self._scan_from = max(self._body_start, len(self._buffer) - len(_FENCE) + 1)
+                return False
+            body = self._buffer[self._body_start:idx].strip()
+            self._scan_from = idx + len(_FENCE)
+            # A fence inside a string value (e.g. file content) is not the end of the block.
+            if body.startswith("{") and body.endswith("}"):
+                try:
+                    self.block = json.loads(body)
+                except json.JSONDecodeError:
+                    continue
+                self._buffer = self._buffer[:idx + len(_FENCE)]
+                return True
+
+
+def read_until_action(stream: Iterator[str]) -> str:
+    extractor = JsonBlockExtractor()
+    try:
+        for chunk in stream:
+            if extractor.feed(chunk):
+                break
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    return extractor.text
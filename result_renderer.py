@@ -0,0 +1,193 @@
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from action_api import ActionResult
+from tokens import estimate_text_tokens
+
+FENCE_LANGS = {".py": "python", ".json": "json", ".md": "markdown", ".toml": "toml", ".txt": "", ".sh": "bash"}
+
+
+def _human_size(n: int) -> str:
+    if n < 1024:
+        return f"{n} B"
+    for unit in ("KB", "MB"):
+        n /= 1024.0
+        if n < 1024 or unit == "MB":
+            return f"{n:.1f} {unit}"
+
+
+class ResultRenderer:
+    """Turns ActionResults into the text the model sees.
+
+    File content goes out raw in fenced blocks, command output is cut to head
+    and tail lines with an elision marker, and trees are printed indented.
+    Actions without a dedicated renderer fall back to compact JSON. Token
+    savings against the old indented-JSON format are tracked per action.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None, head_lines: int = 60, tail_lines: int = 120):
+        self.root_dir = Path(root_dir).resolve() if root_dir else None
+        self.head_lines = head_lines
+        self.tail_lines = tail_lines
+        self._lock = threading.Lock()
+        self.stats: dict[str, dict] = {}
+        self._renderers: dict[str, Callable[[dict], str]] = {
+            "read_file": self._render_file,
+            "open_file": self._render_file,
+            "create_file": self._render_write,
+            "edit_file": self._render_write,
+            "apply_patch": self._render_patch,
+            "run_command": self._render_process,
+            "terminal_command": self._render_process,
+            "run_ipython": self._render_process,
+            "get_file_tree": self._render_tree,
+            "get_project_tree": self._render_tree,
+            "get_all_symbols": lambda data: str(data.get("symbols", "")),
+            "find_definition": lambda data: str(data.get("definitions", "")),
+            "find_references": self._render_references,
+            "project_outline": lambda data: str(data.get("outline", "")),
+            "search_code": self._render_search,
+            "run_coder": self._render_message,
+            "finish_work": self._render_message,
+            "finish_task": self._render_message,
+        }
+
+    def register(self, action_name: str, fn: Callable[[dict], str]):
+        self._renderers[action_name] = fn
+
+    def render(self, action_name: str, result: ActionResult) -> str:
+        data = result.data or {}
+        fn = self._renderers.get(action_name, self._render_json)
+        body = fn(data) if data else ""
+        if result.success:
+            text = f"Success:\n{body}" if body else "Success"
+        else:
+            text = f"Error: {result.error}"
+            if body:
+                text += f"\n{body}"
+        self._record(action_name, result, text)
+        return text
+
+    def _record(self, action_name: str, result: ActionResult, text: str):
+        if result.success:
+            baseline = "Success:\n" + json.dumps(result.data, ensure_ascii=False, indent=2)
+        else:
+            baseline = f"Error: {result.error}"
+        with self._lock:
+            row = self.stats.setdefault(action_name, {"calls": 0, "baseline_tokens": 0, "rendered_tokens": 0})
+            row["calls"] += 1
+            row["baseline_tokens"] += estimate_text_tokens(baseline)
+            row["rendered_tokens"] += estimate_text_tokens(text)
+
+    def savings(self) -> dict:
+        with self._lock:
+            out = {}
+            for name, row in self.stats.items():
+                saved = row["baseline_tokens"] - row["rendered_tokens"]
+                out[name] = {
+                    **row,
+                    "saved_tokens": saved,
+                    "saved_pct": round(100.0 * saved / row["baseline_tokens"], 1) if row["baseline_tokens"] else 0.0,
+                }
+            return out
+
+    def _rel(self, path: str) -> str:
+        if self.root_dir and path:
+            try:
+                return str(Path(path).relative_to(self.root_dir))
+            except ValueError:
+                pass
+        return path
+
+    def _clip(self, text: str) -> str:
+        lines = text.splitlines()
+        if len(lines) <= self.head_lines + self.tail_lines:
+            return text.rstrip("\n")
+        dropped = len(lines) - self.head_lines - self.tail_lines
+        return "\n".join(
+            lines[: self.head_lines]
+            + [f"[... {dropped} lines elided ...]"]
+            + lines[-self.tail_lines:]
+        )
+
+    @staticmethod
+    def _fence(text: str, lang: str = "") -> str:
+        fence = "```"
+        while fence in text:
+            fence += "`"
+        return f"{fence}{lang}\n{text.rstrip(chr(10))}\n{fence}"
+
+    def _render_file(self, data: dict) -> str:
+        path = data.get("path", "")
+        lang = FENCE_LANGS.get(Path(path).suffix, "") if path else ""
+        header = f"{self._rel(path)}\n" if path else ""
+        extra = {k: v for k, v in data.items() if k not in ("path", "content")}
+        if extra:
+            header += json.dumps(extra, ensure_ascii=False) + "\n"
+        return header + self._fence(str(data.get("content", "")), lang)
+
+    def _render_write(self, data: dict) -> str:
+        path = self._rel(data.get("path", ""))
+        if "replaced" in data:
+            return f"{path}: replaced {data['replaced']} occurrence(s)"
+        if "bytes" in data:
+            return f"{path}: wrote {data['bytes']} bytes"
+        return self._render_json(data)
+
+    def _render_patch(self, data: dict) -> str:
+        lines = [f"{self._rel(path)}: {status}" for path, status in data.get("files", {}).items()]
+        hunks = data.get("hunks", [])
+        if not lines or any(h["status"].startswith("failed") for h in hunks):
+            lines += [f"hunk {n} ({self._rel(h['path'])}): {h['status']}" for n, h in enumerate(hunks, start=1)]
+        return "\n".join(lines)
+
+    def _render_process(self, data: dict) -> str:
+        parts = []
+        if "return_code" in data:
+            parts.append(f"exit code: {data['return_code']}")
+        for stream in ("stdout", "stderr"):
+            text = data.get(stream) or ""
+            if text.strip():
+                parts.append(f"{stream}:\n{self._fence(self._clip(text))}")
+        rest = {k: v for k, v in data.items() if k not in ("return_code", "stdout", "stderr")}
+        if rest:
+            parts.append(json.dumps(rest, ensure_ascii=False))
+        return "\n".join(parts) if parts else "(no output)"
+
+    def _render_tree(self, data: dict) -> str:
+        lines = []
+
+        def walk(nodes: list, depth: int):
+            for node in nodes:
+                is_dir = node.get("type") == "dir"
+                size = f" ({_human_size(node['size'])})" if "size" in node else ""
+                lines.append("  " * depth + node.get("name", "") + ("/" if is_dir else "") + size)
+                if node.get("children"):
+                    walk(node["children"], depth + 1)
+
+        walk(data.get("tree", []), 0)
+        return "\n".join(lines) if lines else "(empty)"
+
+    @staticmethod
+    def _render_references(data: dict) -> str:
+        text = str(data.get("references", ""))
+        if data.get("shown"):
+            text += f"\n[showing {data['shown']} references]"
+        return text
+
+    @staticmethod
+    def _render_search(data: dict) -> str:
+        text = str(data.get("matches", ""))
+        if data.get("summary"):
+            text += f"\n[{data['summary']}]"
+        return text
+
+    def _render_message(self, data: dict) -> str:
+        parts = [str(data[k]) for k in ("message", "status", "details") if data.get(k)]
+        return "\n".join(parts) if parts else self._render_json(data)
+
+    @staticmethod
+    def _render_json(data: dict) -> str:
+        return json.dumps(data, ensure_ascii=False, separators=(", ", ": "))
@@ -4,6 +4,7 @@ from pathlib import Path
 
 from judge_agent import JudgeAgent
 from llm_client import LLMClient
+from llm_cache import cache_from_env
 from log_manager import LogManager
 
 
@@ -18,7 +19,7 @@ def main():
         print("Error: OPENAI_API_KEY environment variable not set")
         sys.exit(1)
 
-    llm_client = LLMClient(api_key=api_key)
+    llm_client = LLMClient(api_key=api_key, cache=cache_from_env())
 
     print(f"Scanning runs in {runs_dir}...")
     
@@ -47,6 +48,7 @@ def main():
                 run_path=str(run_dir),
                 llm_client=llm_client,
                 log_manager=log_manager,
+                structured_output=os.environ.get("AEGIS_STRUCTURED_OUTPUT", "") == "1",
             )
 
             log_manager.info("Judge Agent initialized. Starting evaluation...")
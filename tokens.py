@@ -0,0 +1,23 @@
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 1000
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_text_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_content_tokens(content) -> int:
+    if isinstance(content, str):
+        return estimate_text_tokens(content)
+    total = 0
+    for part in content or []:
+        if part.get("type") == "text":
+            total += estimate_text_tokens(part.get("text", ""))
+        else:
+            total += IMAGE_TOKENS
+    return total
+
+
+def estimate_tokens(messages: list[dict]) -> int:
+    return sum(MESSAGE_OVERHEAD_TOKENS + estimate_content_tokens(m.get("content")) for m in messages)
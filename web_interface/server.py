@@ -5,14 +5,15 @@ import shutil
 from pathlib import Path
 from fastapi import FastAPI, BackgroundTasks, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from pydantic import BaseModel
 
 project_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(project_root))
 
-from main import run_task
+from main import resume_run, run_task
 from log_manager import LogManager
+from metrics import get_metrics
 
 app = FastAPI()
 
@@ -50,6 +51,32 @@ async def start_task(request: TaskRequest, background_tasks: BackgroundTasks):
     
     return {"run_id": run_id}
 
+def execute_resume(run_id: str, log_manager: LogManager):
+    try:
+        runs[run_id]["status"] = "running"
+        success = resume_run(str(log_manager.run_dir), log_manager)
+        runs[run_id]["status"] = "completed" if success else "failed"
+    except Exception as e:
+        log_manager.exception(f"Exception while resuming: {e}")
+        runs[run_id]["status"] = "failed"
+
+@app.post("/api/resume/{run_id}")
+async def resume_task(run_id: str, background_tasks: BackgroundTasks):
+    runs_dir = project_root / "runs"
+    run_dir = runs_dir / run_id
+    if not (run_dir / "checkpoints").is_dir():
+        raise HTTPException(status_code=404, detail="No checkpoints for this run")
+    if runs.get(run_id, {}).get("status") in ("pending", "running"):
+        raise HTTPException(status_code=409, detail="Run is still active")
+
+    lm = LogManager(base_dir=str(runs_dir), retention_days=7, existing_run_dir=str(run_dir))
+    runs[run_id] = {
+        "status": "pending",
+        "log_manager": lm
+    }
+    background_tasks.add_task(execute_resume, run_id, lm)
+    return {"run_id": run_id}
+
 @app.get("/api/status/{run_id}")
 async def get_status(run_id: str):
     if run_id not in runs:
@@ -105,6 +132,10 @@ async def download_code(run_id: str):
     
     return FileResponse(f"{zip_path}.zip", media_type='application/zip', filename=f"{run_id}_code.zip")
 
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(get_metrics().render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def read_index():
     return FileResponse(Path(__file__).parent / 'static/index.html')